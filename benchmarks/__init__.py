@@ -0,0 +1 @@
+# gdtree Benchmarks Package
@@ -0,0 +1,248 @@
+"""
+Benchmark runner. Builds synthetic trees, times the traversal, filestring building and end to end
+tree generation over each of them, and saves the results as JSON.
+
+Each measurement runs in a fresh interpreter so that its peak resident set size is its own.
+With --startup, the cold start of the command line is measured instead (see benchmarks.startup).
+"""
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+from time import perf_counter, strftime
+from typing import Dict, List
+
+from benchmarks.startup import IMPORT_BUDGET_MS, check_budget, measure_startup
+from benchmarks.trees import SHAPES, build_tree
+
+# The stages of tree generation that are timed separately
+STAGES = ("traverse", "filestring", "generate_tree")
+# Slowdown (as a fraction of the baseline entries per second) reported as a regression
+REGRESSION_THRESHOLD = 0.1
+
+
+def _measure(stage: str, root: str, repeat: int) -> Dict[str, object]:
+    """
+    Times one stage of tree generation over a tree. Run in a fresh interpreter.
+
+    Args:
+        stage (str): The stage to time, one of STAGES
+        root (str): The root of the tree
+        repeat (int): Number of times to run the stage. The fastest run is reported.
+
+    Returns:
+        Dict[str, object]: The number of entries, fastest time in seconds, entries per second
+        and peak resident set size in bytes
+    """
+    from gdtree.app import generate_tree
+    from gdtree.filestring import create_filestring_builder
+    from gdtree.stats import peak_memory
+    from gdtree.traverse import traverse_directory
+    from gdtree.utils import ExecutableCheck, Settings
+
+    # The settings the command line runs with by default
+    settings = Settings.COLORIZE
+    executable_check = ExecutableCheck.MODE
+    entries = 0
+    best = float("inf")
+    if stage == "filestring":
+        # Only the filestring building is timed, over a traversal collected up front
+        collected = list(traverse_directory(root, executable_check=executable_check))
+        entries = len(collected)
+    for _ in range(repeat):
+        start = perf_counter()
+        if stage == "traverse":
+            entries = sum(
+                1 for _ in traverse_directory(root, executable_check=executable_check)
+            )
+        elif stage == "filestring":
+            builder = create_filestring_builder(settings)
+            for name, type, history in collected:
+                builder(name, type, history)
+        else:
+            # Less the root name and the summary line
+            entries = sum(1 for _ in generate_tree(root, settings)) - 2
+        best = min(best, perf_counter() - start)
+    return {
+        "entries": entries,
+        "seconds": best,
+        "entries_per_second": entries / best if best > 0 else None,
+        "peak_rss": peak_memory(),
+    }
+
+
+def run(shapes: List[str], scale: float, seed: int, repeat: int) -> Dict[str, object]:
+    """
+    Runs the benchmarks
+
+    Args:
+        shapes (List[str]): Names of the tree shapes to benchmark
+        scale (float): Multiplier on the size of each tree
+        seed (int): Seed the trees are generated from
+        repeat (int): Number of times to run each stage
+
+    Returns:
+        Dict[str, object]: The benchmark results, with the parameters they were run with
+    """
+    results = {
+        "time": strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "seed": seed,
+        "repeat": repeat,
+        "results": {},
+    }
+    context = get_context("spawn")
+    for shape in shapes:
+        with TemporaryDirectory(prefix="gdtree-bench-") as root:
+            start = perf_counter()
+            build_tree(shape, root, scale, seed)
+            print("built %s in %.1fs" % (shape, perf_counter() - start), file=sys.stderr)
+            shape_results = {}
+            for stage in STAGES:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(_measure, stage, root, repeat).result()
+                shape_results[stage] = result
+                print(
+                    "  %-13s %9d entries %12.0f entries/s"
+                    % (stage, result["entries"], result["entries_per_second"] or 0),
+                    file=sys.stderr,
+                )
+            results["results"][shape] = shape_results
+    return results
+
+
+def run_startup(repeat: int) -> Dict[str, object]:
+    """
+    Runs the startup benchmark
+
+    Args:
+        repeat (int): Number of times to measure
+
+    Returns:
+        Dict[str, object]: The startup results, with the parameters they were run with
+    """
+    startup = measure_startup(repeat)
+    print(
+        "import %.1fms, interpreter %.1fms, tiny tree %.1fms"
+        % (startup["import_ms"], startup["interpreter_ms"], startup["tiny_tree_ms"]),
+        file=sys.stderr,
+    )
+    return {
+        "time": strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "startup": startup,
+    }
+
+
+def compare(baseline: Dict[str, object], current: Dict[str, object]) -> List[str]:
+    """
+    Compares two sets of results, finding stages that have become slower
+
+    Args:
+        baseline (Dict[str, object]): The results to compare against
+        current (Dict[str, object]): The new results
+
+    Returns:
+        List[str]: A description of each regression found
+    """
+    regressions = []
+    if "startup" in baseline and "startup" in current:
+        before = baseline["startup"]["import_ms"]
+        after = current["startup"]["import_ms"]
+        if after > before * (1 + REGRESSION_THRESHOLD):
+            regressions.append(
+                "startup: import %.1fms -> %.1fms (%.1f%% slower)"
+                % (before, after, 100 * (after / before - 1))
+            )
+    for shape, stages in current.get("results", {}).items():
+        for stage, result in stages.items():
+            try:
+                before = baseline["results"][shape][stage]["entries_per_second"]
+            except KeyError:
+                continue
+            after = result["entries_per_second"]
+            if before and after and after < before * (1 - REGRESSION_THRESHOLD):
+                regressions.append(
+                    "%s/%s: %.0f -> %.0f entries/s (%.1f%% slower)"
+                    % (shape, stage, before, after, 100 * (1 - after / before))
+                )
+    return regressions
+
+
+def main(input_args: List[str] = None) -> int:
+    """
+    Runs the benchmarks from the command line
+
+    Args:
+        input_args (List[str], optional): Arguments to parse. Defaults to None.
+
+    Returns:
+        int: The exit status, nonzero if a regression was found
+    """
+    parser = ArgumentParser(
+        prog="python -m benchmarks", description="Benchmarks gdtree over synthetic trees"
+    )
+    parser.add_argument(
+        "--shape",
+        dest="shapes",
+        help="Tree shape to benchmark. Can be given several times. Defaults to all shapes",
+        choices=sorted(SHAPES),
+        action="append",
+    )
+    parser.add_argument(
+        "--scale", help="Multiplier on the size of each tree", type=float, default=1.0
+    )
+    parser.add_argument("--seed", help="Seed the trees are generated from", type=int, default=0)
+    parser.add_argument(
+        "--repeat", help="Number of times to run each stage", type=int, default=3
+    )
+    parser.add_argument(
+        "-o", "--output", help="File to save the results to as JSON", default=None
+    )
+    parser.add_argument(
+        "--compare", help="Results file to check for regressions against", default=None
+    )
+    parser.add_argument(
+        "--startup",
+        help="Measures the cold start of the command line instead, failing if importing it "
+        "takes longer than the budget",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--import-budget",
+        dest="import_budget",
+        help="Budget for importing the command line in milliseconds, with --startup. "
+        "Defaults to %.0f" % IMPORT_BUDGET_MS,
+        metavar="MS",
+        type=float,
+        default=IMPORT_BUDGET_MS,
+    )
+    args = parser.parse_args(input_args)
+
+    regressions = []
+    if args.startup:
+        results = run_startup(max(args.repeat, 1))
+        regressions.extend(check_budget(results["startup"], args.import_budget))
+    else:
+        results = run(args.shapes or list(SHAPES), args.scale, args.seed, max(args.repeat, 1))
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            regressions.extend(compare(json.load(baseline_file), results))
+    for regression in regressions:
+        print("regression: " + regression, file=sys.stderr)
+    return 1 if regressions else 0
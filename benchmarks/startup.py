@@ -0,0 +1,122 @@
+"""
+Startup benchmark. Measures the cold start of the command line in fresh interpreters: the time to
+import its entry point, from python -X importtime, and the wall clock time of printing a tiny
+tree. Releases are held to a budget on the import time.
+"""
+
+import sys
+from os import environ
+from os.path import join
+from subprocess import DEVNULL, PIPE, run
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+# The module measured: the command line's entry point
+ENTRY_POINT = "gdtree.app"
+# Budget for importing the entry point, in milliseconds
+IMPORT_BUDGET_MS = 35.0
+# Number of modules reported as the slowest to import
+SLOWEST_COUNT = 10
+# Number of files in the tiny tree printed
+TINY_TREE_FILES = 5
+# Environment of the interpreters measured. Bytecode is cached, as it is once gdtree is installed,
+# so that compiling the modules is not measured.
+_ENVIRONMENT = dict(environ)
+_ENVIRONMENT.pop("PYTHONDONTWRITEBYTECODE", None)
+
+
+def import_times(module: str = ENTRY_POINT) -> Dict[str, Tuple[int, int]]:
+    """
+    Imports a module in a fresh interpreter, timing every module imported with it
+
+    Args:
+        module (str, optional): The module to import. Defaults to ENTRY_POINT.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: The time spent importing each module by itself, and with
+        the modules it imported, in microseconds
+    """
+    result = run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stdout=DEVNULL,
+        stderr=PIPE,
+        env=_ENVIRONMENT,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # Lines read "import time: self [us] | cumulative | imported package"
+        fields = line.partition(":")[2].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def _wall_time(args: List[str]) -> float:
+    """
+    Runs a command in a fresh interpreter
+
+    Args:
+        args (List[str]): Arguments to the interpreter
+
+    Returns:
+        float: The wall clock time the command took, in seconds
+    """
+    start = perf_counter()
+    run([sys.executable] + args, stdout=DEVNULL, env=_ENVIRONMENT, check=True)
+    return perf_counter() - start
+
+
+def measure_startup(repeat: int) -> Dict[str, object]:
+    """
+    Measures the cold start of the command line. The first run only fills the bytecode cache,
+    and of the rest the fastest is reported.
+
+    Args:
+        repeat (int): Number of times to measure
+
+    Returns:
+        Dict[str, object]: The time to import the entry point, to start the interpreter alone,
+        and to print a tiny tree, in milliseconds, along with the modules slowest to import
+    """
+    import_times()
+    best: Dict[str, Tuple[int, int]] = {}
+    for _ in range(repeat):
+        times = import_times()
+        if not best or times[ENTRY_POINT][1] < best[ENTRY_POINT][1]:
+            best = times
+    slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:SLOWEST_COUNT]
+    with TemporaryDirectory(prefix="gdtree-bench-") as root:
+        for index in range(TINY_TREE_FILES):
+            open(join(root, "file%d" % index), "w").close()
+        interpreter = min(_wall_time(["-c", "pass"]) for _ in range(repeat + 1))
+        tree = min(_wall_time(["-m", "gdtree", "-n", root]) for _ in range(repeat + 1))
+    return {
+        "import_ms": best[ENTRY_POINT][1] / 1000,
+        "interpreter_ms": interpreter * 1000,
+        "tiny_tree_ms": tree * 1000,
+        "slowest_imports": [[name, times[0] / 1000] for name, times in slowest],
+    }
+
+
+def check_budget(startup: Dict[str, object], budget_ms: float) -> List[str]:
+    """
+    Checks the startup results against the import time budget
+
+    Args:
+        startup (Dict[str, object]): The startup results
+        budget_ms (float): The budget in milliseconds
+
+    Returns:
+        List[str]: A description of the budget being exceeded, if it is
+    """
+    if startup["import_ms"] <= budget_ms:
+        return []
+    slowest = ", ".join("%s %.1fms" % (name, ms) for name, ms in startup["slowest_imports"][:3])
+    return [
+        "startup: importing %s took %.1fms, over the %.1fms budget (slowest: %s)"
+        % (ENTRY_POINT, startup["import_ms"], budget_ms, slowest)
+    ]
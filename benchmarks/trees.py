@@ -0,0 +1,168 @@
+"""
+Synthetic directory tree generators used by the benchmarks. Every tree is generated from a
+seeded random number generator, so the same shape, scale and seed always produce the same tree.
+"""
+
+from os import chmod, makedirs, symlink
+from os.path import join
+from random import Random
+from typing import Callable, Dict
+
+# Base size of each tree shape, multiplied by the scale a tree is built at
+WIDE_FLAT_FILES = 50000
+DEEP_NARROW_DEPTH = 400
+# Depth cap for the deep narrow tree, which keeps its paths below PATH_MAX
+MAX_DEEP_NARROW_DEPTH = 800
+SOURCE_REPO_PACKAGES = 60
+TINY_FILES = 200000
+# Number of files in each directory of the tiny files tree
+TINY_FILES_PER_DIR = 1000
+
+EXTENSIONS = (".py", ".c", ".h", ".txt", ".json", ".md", ".sh", ".yaml", ".rs", ".js")
+
+
+def _touch(path: str, executable: bool = False) -> None:
+    """
+    Creates an empty file
+
+    Args:
+        path (str): Path to the file to create
+        executable (bool, optional): Gives the file execute permissions. Defaults to False.
+    """
+    open(path, "w").close()
+    if executable:
+        chmod(path, 0o755)
+
+
+def _name(rng: Random, length: int = 10) -> str:
+    """
+    Creates a random lowercase name
+
+    Args:
+        rng (Random): The random number generator to draw from
+        length (int, optional): Length of the name. Defaults to 10.
+
+    Returns:
+        str: The name
+    """
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz_") for _ in range(length))
+
+
+def build_wide_flat(root: str, scale: float, rng: Random) -> None:
+    """
+    Builds a single directory holding many files
+
+    Args:
+        root (str): The directory to build the tree in
+        scale (float): Multiplier on the size of the tree
+        rng (Random): The random number generator to draw from
+    """
+    for index in range(int(WIDE_FLAT_FILES * scale)):
+        _touch(join(root, "%s_%d%s" % (_name(rng), index, rng.choice(EXTENSIONS))))
+
+
+def build_deep_narrow(root: str, scale: float, rng: Random) -> None:
+    """
+    Builds a long chain of nested directories with a few files at every level
+
+    Args:
+        root (str): The directory to build the tree in
+        scale (float): Multiplier on the size of the tree
+        rng (Random): The random number generator to draw from
+    """
+    current = root
+    for _ in range(min(int(DEEP_NARROW_DEPTH * scale), MAX_DEEP_NARROW_DEPTH)):
+        for _ in range(rng.randint(0, 3)):
+            _touch(join(current, _name(rng, 6) + rng.choice(EXTENSIONS)))
+        current = join(current, _name(rng, 3))
+        makedirs(current)
+
+
+def build_source_repo(root: str, scale: float, rng: Random) -> None:
+    """
+    Builds a tree shaped like a source repository: packages of nested modules, a few scripts,
+    symbolic links, hidden directories and a dependency directory with many small packages
+
+    Args:
+        root (str): The directory to build the tree in
+        scale (float): Multiplier on the size of the tree
+        rng (Random): The random number generator to draw from
+    """
+    for name in ("README.md", "LICENSE", "setup.cfg", "pyproject.toml"):
+        _touch(join(root, name))
+    makedirs(join(root, ".git", "objects"))
+    for _ in range(200):
+        _touch(join(root, ".git", "objects", "%038x" % rng.getrandbits(152)))
+
+    scripts = join(root, "scripts")
+    makedirs(scripts)
+    for _ in range(10):
+        _touch(join(scripts, _name(rng, 8) + ".sh"), executable=True)
+
+    for index in range(int(SOURCE_REPO_PACKAGES * scale)):
+        package = join(root, "src", "%s%d" % (_name(rng, 8), index))
+        stack = [(package, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            makedirs(directory, exist_ok=True)
+            _touch(join(directory, "__init__.py"))
+            for _ in range(rng.randint(3, 25)):
+                _touch(join(directory, _name(rng) + rng.choice(EXTENSIONS)))
+            if depth < 4:
+                for _ in range(rng.randint(0, 4)):
+                    stack.append((join(directory, _name(rng, 7)), depth + 1))
+        symlink(package, join(root, "link_%d" % index))
+
+    modules = join(root, "node_modules")
+    for index in range(int(SOURCE_REPO_PACKAGES * 5 * scale)):
+        module = join(modules, "%s%d" % (_name(rng, 9), index))
+        makedirs(join(module, "lib"))
+        _touch(join(module, "package.json"))
+        for _ in range(rng.randint(1, 8)):
+            _touch(join(module, "lib", _name(rng) + ".js"))
+
+
+def build_tiny_files(root: str, scale: float, rng: Random) -> None:
+    """
+    Builds a very large number of empty files spread over directories of equal size
+
+    Args:
+        root (str): The directory to build the tree in
+        scale (float): Multiplier on the size of the tree
+        rng (Random): The random number generator to draw from
+    """
+    total = int(TINY_FILES * scale)
+    for start in range(0, total, TINY_FILES_PER_DIR):
+        directory = join(root, "d%06d" % (start // TINY_FILES_PER_DIR))
+        makedirs(directory)
+        for index in range(start, min(start + TINY_FILES_PER_DIR, total)):
+            _touch(join(directory, "f%08d" % index))
+
+
+# Map of tree shape names to the functions that build them
+SHAPES: Dict[str, Callable[[str, float, Random], None]] = {
+    "wide_flat": build_wide_flat,
+    "deep_narrow": build_deep_narrow,
+    "source_repo": build_source_repo,
+    "tiny_files": build_tiny_files,
+}
+
+
+def build_tree(shape: str, root: str, scale: float = 1.0, seed: int = 0) -> None:
+    """
+    Builds a synthetic tree of the given shape
+
+    Args:
+        shape (str): Name of the tree shape, one of SHAPES
+        root (str): The existing, empty directory to build the tree in
+        scale (float, optional): Multiplier on the size of the tree. Defaults to 1.0.
+        seed (int, optional): Seed for the random number generator. Defaults to 0.
+
+    Raises:
+        ValueError: Raises if the shape is unknown
+    """
+    try:
+        builder = SHAPES[shape]
+    except KeyError as err:
+        raise ValueError("Unknown tree shape %r" % shape) from err
+    builder(root, scale, Random(seed))
@@ -1,24 +1,274 @@
-from os.path import basename, abspath
-from typing import Generator, Tuple, List
-from gdtree.traverse import reverse_traverse_directory, traverse_directory
-from colorama import init
-from gdtree.filestring import create_filestring_builder, type_colorize
-from gdtree.utils import EntryType, Settings
-from argparse import Namespace, ArgumentParser
+import sys
+from os import devnull, dup2, environ, lstat, open as os_open, O_WRONLY
+from os.path import basename, abspath, isfile
+from typing import Callable, Generator, Optional, Tuple, List
+from gdtree.traverse import RetainedListings, reverse_traverse_directory, traverse_directory
+from gdtree.end_state_history import EndStateHistory
+from gdtree.filestring import (
+    build_fancy_prefix,
+    build_prefix,
+    color_scheme,
+    create_filestring_builder,
+    create_name_formatter,
+)
+from gdtree.formats import OUTPUT_FORMATS, json_lines, ndjson_lines
+from gdtree.output import DEFAULT_BUFFER_SIZE, LineWriter, write_lines
+from gdtree.stats import Stats
+from gdtree.utils import (
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_SPILL_SIZE,
+    EntryType,
+    ExecutableCheck,
+    Options,
+    Settings,
+    default_cache_path,
+)
+from argparse import ArgumentTypeError, Namespace, ArgumentParser
 
 
 def start():
     """
-    The starting function for the tree generation.
+    The starting function for the tree generation. Modules only some runs need (ex. for
+    comparisons, watching, caching or colors on Windows) are imported as they are needed, so
+    that printing small trees starts quickly.
     """
-    init()
-    start_dir, settings = parse_settings()
-    gen = generate_tree(start_dir, settings)
-    print("\n".join(gen))
+    if sys.argv[1:2] == ["diff"]:
+        start_diff(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["snapshot"]:
+        start_snapshot(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["render"]:
+        start_render(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["batch"]:
+        # Imported here, since batch mode builds on this module
+        from gdtree.batch import start_batch
+
+        try:
+            failures = start_batch(sys.argv[2:])
+        except BrokenPipeError:
+            _stop_writing()
+        sys.exit(1 if failures else 0)
+    start_dir, settings, options = parse_settings()
+    settings = init_colors(settings)
+    if settings & Settings.WATCH:
+        from gdtree.watch import watch
+
+        try:
+            watch(
+                start_dir,
+                lambda retained: generate_output(start_dir, settings, options, None, retained),
+                with_contents=bool(settings & Settings.DU),
+                follow_symlinks=bool(settings & Settings.FOLLOW),
+                buffer_size=options.buffer_size,
+            )
+        except BrokenPipeError:
+            _stop_writing()
+        return
+    stats = Stats() if options.stats else None
+    writer = LineWriter(buffer_size=options.buffer_size, stats=stats)
+    # Lines waiting in the buffer are written before the traversal blocks on a directory
+    gen = generate_output(start_dir, settings, options, stats, before_scan=writer.flush)
+    try:
+        writer.write_lines(gen)
+        if stats is not None:
+            stats.report()
+    except BrokenPipeError:
+        gen.close()
+        _stop_writing()
+
+
+def start_diff(input_args: List[str] = None) -> None:
+    """
+    The starting function for the comparison of two trees (gdtree diff A B). Each tree is a
+    directory, or a snapshot file saved by gdtree snapshot.
+
+    Args:
+        input_args (List[str], optional): Arguments to parse, after "diff". Defaults to None.
+    """
+    parser = setup_diff_parser()
+    args = parser.parse_args(input_args)
+    settings = Settings(0)
+    if args.colorize:
+        settings |= Settings.COLORIZE
+    if args.fancy:
+        settings |= Settings.FANCY
+    settings = init_colors(settings)
+    from gdtree.diff import DirectoryTree, SnapshotTree, diff_lines
+    from gdtree.patterns import EntryFilter
+
+    trees = []
+    for tree in (args.first, args.second):
+        if isfile(tree):
+            from gdtree.snapshot import TreeSnapshot
+
+            try:
+                trees.append(SnapshotTree(TreeSnapshot.load(tree)))
+            except (OSError, ValueError) as err:
+                parser.error(str(err))
+            continue
+        entry_filter = EntryFilter(
+            show_hidden=args.all,
+            ignore=tuple(args.ignore or ()),
+            pattern=tuple(args.pattern or ()),
+            gitignore=args.gitignore,
+        )
+        trees.append(DirectoryTree(abspath(tree), entry_filter, args.trust_mtime))
+    gen = diff_lines(trees[0], trees[1], settings, color_scheme(environ.get("LS_COLORS")))
+    try:
+        write_lines(gen)
+    except BrokenPipeError:
+        gen.close()
+        _stop_writing()
+
+
+def start_snapshot(input_args: List[str] = None) -> None:
+    """
+    The starting function for taking a snapshot of a tree (gdtree snapshot ROOT -o FILE)
+
+    Args:
+        input_args (List[str], optional): Arguments to parse, after "snapshot".
+        Defaults to None.
+    """
+    parser = setup_snapshot_parser()
+    args = parser.parse_args(input_args)
+    settings = process_settings_from_args(args)
+    options = process_options_from_args(args)
+    directory = abspath(args.directory)
+    from gdtree.snapshot import TreeSnapshot
+
+    root_size = 0
+    if settings & Settings.DU:
+        try:
+            root_size = lstat(directory).st_size
+        except OSError:
+            pass
+    # Types are data in a snapshot, so executables are always told apart
+    entries = walk_tree(
+        directory, settings, options, None, ExecutableCheck.MODE, bool(settings & Settings.DU)
+    )
+    snapshot = TreeSnapshot.from_traversal(basename(directory), entries, root_size)
+    try:
+        snapshot.save(args.output)
+    except OSError as err:
+        parser.error(str(err))
+
+
+def start_render(input_args: List[str] = None) -> None:
+    """
+    The starting function for printing the tree held in a snapshot file (gdtree render FILE)
+
+    Args:
+        input_args (List[str], optional): Arguments to parse, after "render". Defaults to None.
+    """
+    parser = setup_render_parser()
+    args = parser.parse_args(input_args)
+    settings = Settings(0)
+    if args.colorize:
+        settings |= Settings.COLORIZE
+    if args.fancy:
+        settings |= Settings.FANCY
+    if args.du:
+        settings |= Settings.DU
+    settings = init_colors(settings)
+    from gdtree.snapshot import TreeSnapshot
+
+    try:
+        snapshot = TreeSnapshot.load(args.snapshot)
+    except (OSError, ValueError) as err:
+        parser.error(str(err))
+    if args.output_format == "ndjson":
+        gen = ndjson_lines(snapshot.entries())
+    elif args.output_format == "json":
+        gen = json_lines(snapshot.root_name, snapshot.entries())
+    else:
+        gen = snapshot.render(settings, color_scheme(environ.get("LS_COLORS")))
+    try:
+        write_lines(gen, buffer_size=args.buffer_size)
+    except BrokenPipeError:
+        gen.close()
+        _stop_writing()
+
+
+def init_colors(settings: Settings) -> Settings:
+    """
+    Prepares stdout for colored output. Colors are only written to terminals, and on Windows
+    colorama is loaded to translate them for the console.
+
+    Args:
+        settings (Settings): Print settings
+
+    Returns:
+        Settings: The settings, without colors if stdout is not a terminal
+    """
+    if not settings & Settings.COLORIZE:
+        return settings
+    if sys.platform == "win32":
+        from colorama import init
+
+        # colorama also strips colors from output that is not a terminal
+        init()
+        return settings
+    if not sys.stdout.isatty():
+        return settings & ~Settings.COLORIZE
+    return settings
+
+
+def _stop_writing() -> None:
+    """
+    Exits once the reader of the output has gone away (ex. output piped into head), pointing
+    stdout at devnull so the interpreter's final flush does not fail again
+    """
+    dup2(os_open(devnull, O_WRONLY), sys.__stdout__.fileno())
+    sys.exit(1)
+
+
+def generate_output(
+    directory: str,
+    settings: Settings,
+    options: Options = None,
+    stats: Optional[Stats] = None,
+    retained: Optional[RetainedListings] = None,
+    before_scan: Optional[Callable[[], None]] = None,
+) -> Generator[str, None, None]:
+    """
+    Generates the lines of output in the output format chosen
+
+    Args:
+        directory (str): The directory for which to print the tree for
+        settings (Settings): Print settings
+        options (Options, optional): Traversal options. Defaults to None.
+        stats (Optional[Stats], optional): Records the time spent in each phase of the
+        generation, if given. Defaults to None.
+        retained (Optional[RetainedListings], optional): Listings kept between generations of
+        the same tree, if given. Defaults to None.
+        before_scan (Optional[Callable[[], None]], optional): Called before the traversal waits
+        for a directory to be listed, if given. Defaults to None.
+
+    Returns:
+        Generator[str, None, None]: Generator of output lines
+    """
+    if options is None:
+        options = Options()
+    if options.output_format == "tree":
+        return generate_tree(directory, settings, options, stats, retained, before_scan)
+    # Types are data in machine-readable output, so executables are always told apart
+    entries = walk_tree(
+        directory, settings, options, stats, ExecutableCheck.MODE, False, retained, before_scan
+    )
+    if options.output_format == "ndjson":
+        return ndjson_lines(entries)
+    return json_lines(basename(directory), entries)
 
 
 def generate_tree(
-    directory: str, settings: Settings
+    directory: str,
+    settings: Settings,
+    options: Options = None,
+    stats: Optional[Stats] = None,
+    retained: Optional[RetainedListings] = None,
+    before_scan: Optional[Callable[[], None]] = None,
 ) -> Generator[str, None, None]:
     """
     Generates the pretty-printed tree
@@ -26,35 +276,153 @@ def generate_tree(
     Args:
         directory (str): The directory for which to print the tree for
         settings (Settings): Print settings
+        options (Options, optional): Traversal options. Defaults to None.
+        stats (Optional[Stats], optional): Records the time spent in each phase of the
+        generation, if given. Defaults to None.
+        retained (Optional[RetainedListings], optional): Listings kept between generations of
+        the same tree, if given. Defaults to None.
+        before_scan (Optional[Callable[[], None]], optional): Called before the traversal waits
+        for a directory to be listed, if given. Defaults to None.
 
     Yields:
         Generator[str, None, None]: Generator of pretty-printed tree strings.
     """
     num_dir, num_files = 0, 0
-
-    filestring_builder = create_filestring_builder(settings)
-    if settings & Settings.REVERSE:
-        traverse = reverse_traverse_directory
+    colors = color_scheme(options.ls_colors if options is not None else None)
+    filestring_builder = create_filestring_builder(settings, stats, colors)
+    # Executables only differ from other files in their color
+    if settings & Settings.COLORIZE:
+        executable_check = ExecutableCheck.MODE
     else:
-        traverse = traverse_directory
+        executable_check = ExecutableCheck.NONE
 
     dir_name = basename(directory)
     if settings & Settings.COLORIZE:
-        formatted_name = type_colorize(dir_name, EntryType.DIRECTORY)
+        formatted_name = colors.colorize(dir_name, EntryType.DIRECTORY)
     else:
         formatted_name = dir_name
+
+    if settings & Settings.DU:
+        try:
+            root_size = lstat(directory).st_size
+        except OSError:
+            root_size = 0
+        from gdtree.du import du_lines
+
+        entries = walk_tree(
+            directory, settings, options, stats, executable_check, True, retained, before_scan
+        )
+        yield from du_lines(
+            formatted_name,
+            entries,
+            build_fancy_prefix if settings & Settings.FANCY else build_prefix,
+            create_name_formatter(settings, colors),
+            root_size,
+        )
+        return
+
     yield formatted_name
 
-    for path, type, history in traverse(directory):
+    for path, type, history in walk_tree(
+        directory, settings, options, stats, executable_check, False, retained, before_scan
+    ):
         if type == EntryType.DIRECTORY:
             num_dir += 1
-        else:
+        elif type != EntryType.TRUNCATED:
             num_files += 1
         yield filestring_builder(path, type, history)
     yield "%d directories, %d files" % (num_dir, num_files)
 
 
-def parse_settings(input_args: List[str] = None) -> Tuple[str, Settings]:
+def walk_tree(
+    directory: str,
+    settings: Settings,
+    options: Options = None,
+    stats: Optional[Stats] = None,
+    executable_check: ExecutableCheck = ExecutableCheck.MODE,
+    with_status: bool = False,
+    retained: Optional[RetainedListings] = None,
+    before_scan: Optional[Callable[[], None]] = None,
+) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
+    """
+    Traverses the tree with the settings and options given. Every output format is built on
+    this traversal.
+
+    Args:
+        directory (str): The directory to traverse
+        settings (Settings): Print settings
+        options (Options, optional): Traversal options. Defaults to None.
+        stats (Optional[Stats], optional): Records the time spent scanning directories, if
+        given. Defaults to None.
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.MODE.
+        with_status (bool, optional): Yields each entry's lstat() result after its history.
+        Defaults to False.
+        retained (Optional[RetainedListings], optional): Reuses the listings kept from an
+        earlier traversal of the tree, and keeps the listings of the directories scanned, if
+        given. The entry filter is kept with them. Defaults to None.
+        before_scan (Optional[Callable[[], None]], optional): Called before the traversal waits
+        for a directory to be listed (ex. to write the output generated so far), if given.
+        Defaults to None.
+
+    Yields:
+        Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the names,
+        types, and end state histories of the entries traversed
+    """
+    if options is None:
+        options = Options()
+    if retained is not None and retained.entry_filter is not None:
+        entry_filter = retained.entry_filter
+    elif settings & (Settings.ALL | Settings.GITIGNORE) or options.ignore or options.pattern:
+        # Imported here, as the traversal only filters out hidden entries unless asked to
+        from gdtree.patterns import EntryFilter
+
+        entry_filter = EntryFilter(
+            show_hidden=bool(settings & Settings.ALL),
+            ignore=options.ignore,
+            pattern=options.pattern,
+            gitignore=bool(settings & Settings.GITIGNORE),
+        )
+        if retained is not None:
+            retained.entry_filter = entry_filter
+    else:
+        entry_filter = None
+    if settings & Settings.REVERSE and not settings & Settings.UNSORTED:
+        traverse = reverse_traverse_directory
+    else:
+        traverse = traverse_directory
+
+    cache = None
+    if options.cache is not None:
+        from gdtree.cache import ScanCache
+
+        cache = ScanCache(options.cache, options.cache_size)
+    try:
+        yield from traverse(
+            directory,
+            jobs=options.jobs,
+            max_depth=options.max_depth,
+            executable_check=executable_check,
+            stats=stats,
+            entry_limit=options.entry_limit,
+            entry_filter=entry_filter,
+            cache=cache,
+            with_status=with_status,
+            spill_size=options.spill_size,
+            unsorted=bool(settings & Settings.UNSORTED),
+            retained=retained,
+            follow_symlinks=bool(settings & Settings.FOLLOW),
+            one_file_system=bool(settings & Settings.ONE_FILE_SYSTEM),
+            before_scan=before_scan,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def parse_settings(
+    input_args: List[str] = None,
+) -> Tuple[str, Settings, Options]:
     """
     Parses settings from command line.
 
@@ -62,8 +430,8 @@ def parse_settings(input_args: List[str] = None) -> Tuple[str, Settings]:
         input_args (List[str], optional): Arguments to parse. Defaults to None.
 
     Returns:
-        Tuple[str, Settings]: The start directory for the tree generation and
-        the generation settings object
+        Tuple[str, Settings, Options]: The start directory for the tree generation,
+        the generation settings object and the traversal options
     """
     parser = setup_parser()
     if input_args is not None:
@@ -71,8 +439,9 @@ def parse_settings(input_args: List[str] = None) -> Tuple[str, Settings]:
     else:
         args = parser.parse_args()
     settings = process_settings_from_args(args)
+    options = process_options_from_args(args)
     directory = abspath(args.directory)
-    return directory, settings
+    return directory, settings, options
 
 
 def process_settings_from_args(args: Namespace) -> Settings:
@@ -92,9 +461,71 @@ def process_settings_from_args(args: Namespace) -> Settings:
         settings |= Settings.FANCY
     if args.reverse:
         settings |= Settings.REVERSE
+    if args.all:
+        settings |= Settings.ALL
+    if args.gitignore:
+        settings |= Settings.GITIGNORE
+    if args.du:
+        settings |= Settings.DU
+    if args.unsorted:
+        settings |= Settings.UNSORTED
+    if args.watch:
+        settings |= Settings.WATCH
+    if args.follow:
+        settings |= Settings.FOLLOW
+    if args.one_file_system:
+        settings |= Settings.ONE_FILE_SYSTEM
     return settings
 
 
+def process_options_from_args(args: Namespace) -> Options:
+    """
+    Return an Options object from the arguments given from argparse.
+
+    Args:
+        args (Namespace): The arguments returned from ArgumentParser.parse_args()
+
+    Returns:
+        Options: The corresponding options
+    """
+    return Options(
+        jobs=max(args.jobs, 1),
+        buffer_size=max(args.buffer_size, 1),
+        max_depth=args.max_depth,
+        stats=args.stats,
+        entry_limit=args.entry_limit,
+        ignore=tuple(args.ignore or ()),
+        pattern=tuple(args.pattern or ()),
+        cache=args.cache,
+        cache_size=args.cache_size << 20,
+        output_format=args.output_format,
+        spill_size=None if args.spill_size is None else args.spill_size << 20,
+        ls_colors=environ.get("LS_COLORS") or None,
+    )
+
+
+def positive_int(value: str) -> int:
+    """
+    Parses a strictly positive integer from a command line argument
+
+    Args:
+        value (str): The argument to parse
+
+    Raises:
+        ArgumentTypeError: Raises if the argument is not a positive integer
+
+    Returns:
+        int: The parsed integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError("%r is not a positive integer" % value)
+    return number
+
+
 def setup_parser() -> ArgumentParser:
     """
     Initializes an ArgumentParser to correctly parse user options for this application
@@ -110,6 +541,17 @@ def setup_parser() -> ArgumentParser:
         help="Path to the top-level directory to generate a tree from. Can be absolute or relative",
         type=str,
     )
+    add_tree_arguments(parser)
+    return parser
+
+
+def add_tree_arguments(parser: ArgumentParser) -> None:
+    """
+    Adds the options controlling how trees are traversed and printed to an ArgumentParser
+
+    Args:
+        parser (ArgumentParser): The argument parser object
+    """
     parser.add_argument(
         "-n",
         "--dncolorize",
@@ -124,6 +566,91 @@ def setup_parser() -> ArgumentParser:
         help="Prints tree with fancy box chars (ex. ╠══ instead of ├── )",
         action="store_true",
     )
+    add_capture_arguments(parser)
+    parser.add_argument(
+        "-U",
+        "--unsorted",
+        dest="unsorted",
+        help="Prints entries in directory order rather than sorted, as they are read. Useful on "
+        "enormous directories, whose first entries are printed without reading them whole",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        dest="buffer_size",
+        help="Number of characters of output to buffer between writes",
+        metavar="CHARS",
+        type=int,
+        default=DEFAULT_BUFFER_SIZE,
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        help="Caches directory listings in FILE, and reuses the listings of directories left "
+        "unchanged since they were cached. Defaults to a file in the user's cache directory",
+        metavar="FILE",
+        nargs="?",
+        const=default_cache_path(),
+        default=None,
+    )
+    parser.add_argument(
+        "--cache-size",
+        dest="cache_size",
+        help="Maximum size of the listing cache in MiB. Least recently used listings are evicted",
+        metavar="MIB",
+        type=positive_int,
+        default=DEFAULT_CACHE_SIZE >> 20,
+    )
+    parser.add_argument(
+        "--low-memory",
+        dest="spill_size",
+        help="Keeps only the name and type of each entry of a directory, and sorts a "
+        "directory's entries on disk once they take more than MIB MiB of memory (default %d)"
+        % (DEFAULT_SPILL_SIZE >> 20),
+        metavar="MIB",
+        type=positive_int,
+        nargs="?",
+        const=DEFAULT_SPILL_SIZE >> 20,
+        default=None,
+    )
+    parser.add_argument(
+        "--du",
+        dest="du",
+        help="Prints the size of every entry, with each directory's size being the total of "
+        "everything below it. Hard linked files are counted once",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        dest="watch",
+        help="Keeps running, and prints the tree again whenever it changes. Only the "
+        "directories that changed are scanned again",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--output-format",
+        dest="output_format",
+        help="Prints the tree as text (tree), a single nested JSON object (json), or a JSON "
+        "object per entry, one per line (ndjson). Defaults to tree",
+        choices=OUTPUT_FORMATS,
+        default=OUTPUT_FORMATS[0],
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        help="Reports time spent in each phase, system calls and memory use to stderr",
+        action="store_true",
+    )
+
+
+def add_capture_arguments(parser: ArgumentParser) -> None:
+    """
+    Adds the options controlling which entries a tree holds, and how it is traversed, to an
+    ArgumentParser
+
+    Args:
+        parser (ArgumentParser): The argument parser object
+    """
     parser.add_argument(
         "-r",
         "--reverse",
@@ -131,4 +658,245 @@ def setup_parser() -> ArgumentParser:
         help="Reverses alphabetical order of print",
         action="store_true",
     )
+    parser.add_argument(
+        "-l",
+        "--follow",
+        dest="follow",
+        help="Descends into symbolic links to directories. Each directory is listed once: "
+        "links leading back to a directory already listed are marked, and not followed",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-x",
+        "--one-file-system",
+        dest="one_file_system",
+        help="Stays on the file system of the directory given: directories on other file "
+        "systems (ex. /proc, network mounts) are printed, but not descended into",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        dest="all",
+        help="Prints hidden entries (names starting with a dot)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-I",
+        "--ignore",
+        dest="ignore",
+        help="Does not print entries matching the glob PATTERN. Alternatives may be separated by "
+        "'|'. Can be given several times. Ignored directories are not scanned",
+        metavar="PATTERN",
+        action="append",
+    )
+    parser.add_argument(
+        "-P",
+        "--pattern",
+        dest="pattern",
+        help="Prints only files matching the glob PATTERN. Directories are always printed. "
+        "Alternatives may be separated by '|'. Can be given several times",
+        metavar="PATTERN",
+        action="append",
+    )
+    parser.add_argument(
+        "--gitignore",
+        dest="gitignore",
+        help="Does not print entries ignored by .gitignore files, nor the .git directory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        help="Scans up to N directories concurrently (useful on network filesystems)",
+        metavar="N",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-L",
+        "--max-depth",
+        dest="max_depth",
+        help="Descends at most LEVEL directories deep. Deeper directories are not scanned",
+        metavar="LEVEL",
+        type=positive_int,
+        default=None,
+    )
+    parser.add_argument(
+        "--filelimit",
+        "--max-entries-per-dir",
+        dest="entry_limit",
+        help="Prints at most K entries per directory, followed by a count of the rest",
+        metavar="K",
+        type=positive_int,
+        default=None,
+    )
+
+
+def setup_diff_parser() -> ArgumentParser:
+    """
+    Initializes an ArgumentParser to correctly parse user options for gdtree diff
+
+    Returns:
+        ArgumentParser: The argument parser object
+    """
+    parser = ArgumentParser(
+        prog="gdtree diff",
+        description="Prints the entries added, removed or changed in type between two trees",
+    )
+    parser.add_argument("first", help="Path to the directory to compare from", type=str)
+    parser.add_argument("second", help="Path to the directory to compare to", type=str)
+    parser.add_argument(
+        "-n",
+        "--dncolorize",
+        dest="colorize",
+        help="Disables output colorization",
+        action="store_false",
+    )
+    parser.add_argument(
+        "-f",
+        "--fancy",
+        dest="fancy",
+        help="Prints tree with fancy box chars (ex. ╠══ instead of ├── )",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        dest="all",
+        help="Compares hidden entries (names starting with a dot)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-I",
+        "--ignore",
+        dest="ignore",
+        help="Does not compare entries matching the glob PATTERN. Can be given several times",
+        metavar="PATTERN",
+        action="append",
+    )
+    parser.add_argument(
+        "-P",
+        "--pattern",
+        dest="pattern",
+        help="Compares only files matching the glob PATTERN. Can be given several times",
+        metavar="PATTERN",
+        action="append",
+    )
+    parser.add_argument(
+        "--gitignore",
+        dest="gitignore",
+        help="Does not compare entries ignored by .gitignore files, nor the .git directory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trust-mtime",
+        dest="trust_mtime",
+        help="Skips directories with the same modification time in both trees. Faster, but "
+        "misses changes below a directory whose own entries are unchanged. Without it, every "
+        "directory in both trees is listed, unless the trees are snapshot files, which skip "
+        "identical subtrees by their digests",
+        action="store_true",
+    )
+    return parser
+
+
+def setup_snapshot_parser() -> ArgumentParser:
+    """
+    Initializes an ArgumentParser to correctly parse user options for gdtree snapshot
+
+    Returns:
+        ArgumentParser: The argument parser object
+    """
+    parser = ArgumentParser(
+        prog="gdtree snapshot",
+        description="Saves a tree to a binary snapshot file, which gdtree render prints and "
+        "gdtree diff compares without reading the file system",
+    )
+    parser.add_argument(
+        "directory",
+        help="Path to the top-level directory to take a snapshot of",
+        type=str,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        help="Path to the snapshot file to write",
+        metavar="FILE",
+        required=True,
+    )
+    add_capture_arguments(parser)
+    parser.add_argument(
+        "--du",
+        dest="du",
+        help="Records the size of every entry, which gdtree render --du prints",
+        action="store_true",
+    )
+    # The options only affecting how a tree is printed keep their defaults
+    parser.set_defaults(
+        colorize=False,
+        fancy=False,
+        unsorted=False,
+        watch=False,
+        stats=False,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+        cache=None,
+        cache_size=DEFAULT_CACHE_SIZE >> 20,
+        spill_size=None,
+        output_format=OUTPUT_FORMATS[0],
+    )
+    return parser
+
+
+def setup_render_parser() -> ArgumentParser:
+    """
+    Initializes an ArgumentParser to correctly parse user options for gdtree render
+
+    Returns:
+        ArgumentParser: The argument parser object
+    """
+    parser = ArgumentParser(
+        prog="gdtree render",
+        description="Prints the tree held in a snapshot file saved by gdtree snapshot",
+    )
+    parser.add_argument("snapshot", help="Path to the snapshot file", metavar="FILE")
+    parser.add_argument(
+        "-n",
+        "--dncolorize",
+        dest="colorize",
+        help="Disables output colorization",
+        action="store_false",
+    )
+    parser.add_argument(
+        "-f",
+        "--fancy",
+        dest="fancy",
+        help="Prints tree with fancy box chars (ex. ╠══ instead of ├── )",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--du",
+        dest="du",
+        help="Prints the size of every entry, and the total size of every directory, as "
+        "recorded by gdtree snapshot --du",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        dest="buffer_size",
+        help="Number of characters of output to buffer between writes",
+        metavar="CHARS",
+        type=int,
+        default=DEFAULT_BUFFER_SIZE,
+    )
+    parser.add_argument(
+        "--output-format",
+        dest="output_format",
+        help="Prints the tree as text (tree), a single nested JSON object (json), or a JSON "
+        "object per entry, one per line (ndjson). Defaults to tree",
+        choices=OUTPUT_FORMATS,
+        default=OUTPUT_FORMATS[0],
+    )
     return parser
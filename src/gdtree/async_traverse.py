@@ -0,0 +1,374 @@
+"""
+Directory tree traversal for asyncio applications. Directories are listed on an executor, so the
+event loop is never blocked on the file system.
+"""
+
+import asyncio
+import sys
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncGenerator, Deque, Dict, Iterator, List, Optional, Tuple
+from gdtree.end_state_history import EndStateHistory
+from gdtree.patterns import EntryFilter
+from gdtree.stats import Stats
+from gdtree.traverse import (
+    PREFETCH_PER_WORKER,
+    AnyListing,
+    Record,
+    Scanner,
+    TraversalStack,
+    subdirectories,
+)
+from gdtree.utils import EntryType, ExecutableCheck
+
+# Default maximum number of directories listed concurrently
+DEFAULT_ASYNC_JOBS = 4
+# Number of records read at a time from listings that read the file system as they are
+# iterated
+CHUNK_SIZE = 256
+
+
+class _ChunkedRecords:
+    """
+    Iterates a listing that reads the file system as it is iterated (a compact listing reading
+    spilled runs back, or taking the status of its entries), reading it a chunk at a time on an
+    executor. The traversal fills the chunk before stepping, so iterating never blocks.
+    """
+
+    __slots__ = ("records", "chunk", "exhausted")
+
+    def __init__(self, listing: AnyListing):
+        """
+        Initializes the iterator, with no records read yet.
+
+        Args:
+            listing (AnyListing): The listing
+        """
+        self.records: Iterator[Record] = iter(listing)
+        self.chunk: Deque[Record] = deque()
+        self.exhausted = False
+
+    def __iter__(self) -> "_ChunkedRecords":
+        """
+        Gets the iterator itself
+
+        Returns:
+            _ChunkedRecords: This iterator
+        """
+        return self
+
+    def __next__(self) -> Record:
+        """
+        Gets the next record of the chunk read
+
+        Raises:
+            StopIteration: Raises once every record has been read
+            RuntimeError: Raises if the chunk is empty, but the listing is not
+
+        Returns:
+            Record: The record
+        """
+        if self.chunk:
+            return self.chunk.popleft()
+        if self.exhausted:
+            raise StopIteration
+        raise RuntimeError("Listing iterated before its next chunk was read")
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the next record can be taken without reading the listing
+
+        Returns:
+            bool: Whether a record is held, or every record has been read
+        """
+        return bool(self.chunk) or self.exhausted
+
+    async def fill(self, executor: Executor) -> None:
+        """
+        Reads the next chunk of records on an executor
+
+        Args:
+            executor (Executor): Reads the chunk
+        """
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(executor, list, islice(self.records, CHUNK_SIZE))
+        if len(chunk) < CHUNK_SIZE:
+            self.exhausted = True
+        self.chunk.extend(chunk)
+
+
+class _AsyncPrefetcher:
+    """
+    Lists directories on an executor ahead of the traversal, in the order the traversal will
+    visit them. At most jobs directories are listed at once, and the number of listings held is
+    bounded, so a consumer that stops pulling entries stops the scanning too.
+    """
+
+    def __init__(self, jobs: int, scanner: Scanner, executor: Executor):
+        """
+        Initializes the prefetcher.
+
+        Args:
+            jobs (int): Maximum number of directories listed concurrently
+            scanner (Scanner): Lists the directories
+            executor (Executor): Runs the listings
+        """
+        self.scanner = scanner
+        self.jobs = jobs
+        self.capacity = jobs * PREFETCH_PER_WORKER
+        self.executor = executor
+        self.loop = asyncio.get_running_loop()
+        # Directories waiting to be prefetched, in traversal order
+        self.queue: Deque[str] = deque()
+        # Prefetched (or in flight) listings, by directory path
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def schedule(self, paths: List[str]) -> None:
+        """
+        Queues directories for prefetching. The directories must be the next ones the traversal
+        descends into, given in the order it descends into them.
+
+        Args:
+            paths (List[str]): The directories to prefetch
+        """
+        self.queue.extendleft(reversed(paths))
+        self._fill()
+
+    async def take(self, path: str) -> Optional[AnyListing]:
+        """
+        Gets the listing of a directory, waiting for its prefetch if it is in flight. Errors are
+        reported rather than raised.
+
+        Args:
+            path (str): The directory to list
+
+        Returns:
+            Optional[AnyListing]: The (name, path, type, status) records of the directory's
+            entries, or None if the directory could not be listed
+        """
+        future = self.pending.pop(path, None)
+        if future is None:
+            if self.queue and self.queue[0] == path:
+                self.queue.popleft()
+            future = self._submit(path)
+        result, _ = await future
+        self._fill()
+        if isinstance(result, NotADirectoryError):
+            return None
+        if isinstance(result, OSError):
+            # We don't want to fail the entire traversal if something fails on OS call
+            print(result, file=sys.stderr)
+            return None
+        return result
+
+    def close(self) -> None:
+        """
+        Cancels outstanding prefetches. Listings already running on the executor finish, but
+        their results are dropped.
+        """
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.queue.clear()
+
+    def _submit(self, path: str) -> asyncio.Future:
+        """
+        Starts listing a directory on the executor
+
+        Args:
+            path (str): The directory to list
+
+        Returns:
+            asyncio.Future: Resolves to the listing (or the OSError raised while listing) and
+            the time in seconds the listing took
+        """
+        return self.loop.run_in_executor(self.executor, self.scanner.timed_scan, path)
+
+    def _fill(self) -> None:
+        """
+        Submits queued directories while there are free jobs and buffer space
+        """
+        in_flight = sum(1 for future in self.pending.values() if not future.done())
+        while self.queue and in_flight < self.jobs and len(self.pending) < self.capacity:
+            path = self.queue.popleft()
+            self.pending[path] = self._submit(path)
+            in_flight += 1
+
+
+async def _async_walk(
+    start_dir: str,
+    scanner: Scanner,
+    jobs: int,
+    max_depth: Optional[int],
+    executor: Optional[Executor],
+) -> AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]:
+    """
+    Traverses the directory given, in the same order as the synchronous traversal
+
+    Args:
+        start_dir (str): Absolute path to the directory to traverse
+        scanner (Scanner): Lists the directories traversed
+        jobs (int): Maximum number of directories listed concurrently
+        max_depth (Optional[int]): Maximum depth of entries to yield. Unbounded if None.
+        executor (Optional[Executor]): Runs the listings. A thread pool of jobs threads is used
+        if None.
+
+    Yields:
+        AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]: Generates the paths,
+        types, and end state histories of the entries traversed
+    """
+    if max_depth is not None and max_depth < 1:
+        return
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+    prefetcher = _AsyncPrefetcher(jobs, scanner, executor)
+    with_status = scanner.keep_status
+    try:
+        listing = await prefetcher.take(start_dir)
+        if not listing:
+            return
+        stack = TraversalStack(max_depth)
+
+        async def push(listing: AnyListing, history: EndStateHistory) -> None:
+            if stack.descends(history):
+                prefetcher.schedule(subdirectories(listing))
+            if not isinstance(listing, list):
+                listing = _ChunkedRecords(listing)
+                await listing.fill(executor)
+            stack.push(listing, history)
+
+        await push(listing, EndStateHistory())
+        while True:
+            records = stack.listing
+            if isinstance(records, _ChunkedRecords) and not records.ready:
+                await records.fill(executor)
+            step = stack.step()
+            if step is None:
+                break
+            (name, entry_path, type, status), subentry_history, descend = step
+            if with_status:
+                yield name, type, subentry_history, status
+            else:
+                yield name, type, subentry_history
+            if type == EntryType.DIRECTORY and descend:
+                sublisting = await prefetcher.take(entry_path)
+                if sublisting:
+                    await push(sublisting, subentry_history)
+    finally:
+        prefetcher.close()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+def async_reverse_traverse_directory(
+    start_dir: str,
+    jobs: int = DEFAULT_ASYNC_JOBS,
+    max_depth: Optional[int] = None,
+    executable_check: ExecutableCheck = ExecutableCheck.ACCESS,
+    stats: Optional[Stats] = None,
+    entry_limit: Optional[int] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    with_status: bool = False,
+    spill_size: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]:
+    """
+    Traverses the directory given and yields the entries found in reverse lexicographical
+    order, as reverse_traverse_directory does, without blocking the event loop
+
+    Args:
+        start_dir (str): Absolute path to the directory to traverse
+        jobs (int, optional): Maximum number of directories listed concurrently.
+        Defaults to DEFAULT_ASYNC_JOBS.
+        max_depth (Optional[int], optional): Maximum depth of entries to yield. Directories at
+        this depth are not scanned. Unbounded if None. Defaults to None.
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.ACCESS.
+        stats (Optional[Stats], optional): Records the time spent scanning directories, if given.
+        Defaults to None.
+        entry_limit (Optional[int], optional): Maximum number of entries yielded per directory.
+        Unbounded if None. Defaults to None.
+        entry_filter (Optional[EntryFilter], optional): Filters the entries of each directory.
+        Only hidden entries are filtered out if None. Defaults to None.
+        with_status (bool, optional): Yields each entry's lstat() result after its history.
+        Defaults to False.
+        spill_size (Optional[int], optional): Keeps only a (name, type) record per entry of a
+        directory, and sorts a directory's records on disk once they take more than this many
+        bytes. Not used with an entry limit. Directories are held in memory whole if None.
+        Defaults to None.
+        executor (Optional[Executor], optional): Runs the directory listings. A thread pool of
+        jobs threads, shut down with the traversal, is used if None. Defaults to None.
+
+    Yields:
+        AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]: Generates the paths,
+        types, and end state histories of the entries traversed
+    """
+    scanner = Scanner(
+        True,
+        executable_check,
+        stats,
+        entry_limit,
+        entry_filter,
+        keep_status=with_status,
+        spill_size=spill_size,
+    )
+    return _async_walk(start_dir, scanner, max(jobs, 1), max_depth, executor)
+
+
+def async_traverse_directory(
+    start_dir: str,
+    jobs: int = DEFAULT_ASYNC_JOBS,
+    max_depth: Optional[int] = None,
+    executable_check: ExecutableCheck = ExecutableCheck.ACCESS,
+    stats: Optional[Stats] = None,
+    entry_limit: Optional[int] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    with_status: bool = False,
+    spill_size: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]:
+    """
+    Traverses the directory given and yields the entries found, as traverse_directory does,
+    without blocking the event loop. Entries are generated in the same order. Closing the
+    generator, or cancelling the task iterating it, cancels the outstanding listings.
+
+    Args:
+        start_dir (str): Absolute path to the directory to traverse
+        jobs (int, optional): Maximum number of directories listed concurrently.
+        Defaults to DEFAULT_ASYNC_JOBS.
+        max_depth (Optional[int], optional): Maximum depth of entries to yield. Directories at
+        this depth are not scanned. Unbounded if None. Defaults to None.
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.ACCESS.
+        stats (Optional[Stats], optional): Records the time spent scanning directories, if given.
+        Defaults to None.
+        entry_limit (Optional[int], optional): Maximum number of entries yielded per directory.
+        Unbounded if None. Defaults to None.
+        entry_filter (Optional[EntryFilter], optional): Filters the entries of each directory.
+        Only hidden entries are filtered out if None. Defaults to None.
+        with_status (bool, optional): Yields each entry's lstat() result after its history.
+        Defaults to False.
+        spill_size (Optional[int], optional): Keeps only a (name, type) record per entry of a
+        directory, and sorts a directory's records on disk once they take more than this many
+        bytes. Not used with an entry limit. Directories are held in memory whole if None.
+        Defaults to None.
+        executor (Optional[Executor], optional): Runs the directory listings. A thread pool of
+        jobs threads, shut down with the traversal, is used if None. Defaults to None.
+
+    Yields:
+        AsyncGenerator[Tuple[str, EntryType, EndStateHistory], None]: Generates the paths,
+        types, and end state histories of the entries traversed
+    """
+    scanner = Scanner(
+        False,
+        executable_check,
+        stats,
+        entry_limit,
+        entry_filter,
+        keep_status=with_status,
+        spill_size=spill_size,
+    )
+    return _async_walk(start_dir, scanner, max(jobs, 1), max_depth, executor)
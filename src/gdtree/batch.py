@@ -0,0 +1,255 @@
+"""
+Batch mode: prints the trees of many directories in one run, on a pool of worker processes, so
+that interpreter startup is paid once rather than once per directory
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import redirect_stdout
+from os.path import abspath, dirname, join, sep
+from typing import Deque, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+from gdtree.app import (
+    add_tree_arguments,
+    generate_output,
+    init_colors,
+    process_options_from_args,
+    process_settings_from_args,
+    positive_int,
+)
+from gdtree.output import write_lines
+from gdtree.utils import Options, Settings
+
+# Extension of the file each root's output is written to, by output format
+OUTPUT_EXTENSIONS = {"tree": ".txt", "json": ".json", "ndjson": ".ndjson"}
+# Number of roots each worker may have printed ahead of the output
+PENDING_PER_WORKER = 4
+# Separates the trees of the roots in a combined stream, naming each root
+HEADER_FORMAT = "==> %s <=="
+
+
+def read_roots(stream: TextIO) -> Iterator[str]:
+    """
+    Reads the directories to print, one per line. Blank lines are skipped.
+
+    Args:
+        stream (TextIO): The stream to read
+
+    Yields:
+        Iterator[str]: The absolute paths of the directories, in order
+    """
+    for line in stream:
+        line = line.rstrip("\n")
+        if line.strip():
+            yield abspath(line)
+
+
+def output_path(
+    output_dir: str, root: str, output_format: str, taken: Optional[Set[str]] = None
+) -> str:
+    """
+    Gets the path of the file a root's output is written to. The root's path is mirrored below
+    the output directory (ex. /srv/app is written to OUTPUT_DIR/srv/app.txt). A root whose path
+    is already taken, such as one listed twice, is numbered (ex. OUTPUT_DIR/srv/app.2.txt).
+
+    Args:
+        output_dir (str): The output directory
+        root (str): Absolute path to the root
+        output_format (str): The output format
+        taken (Optional[Set[str]], optional): The paths already given to other roots, which
+        the path returned is added to. Defaults to None.
+
+    Returns:
+        str: The path of the file
+    """
+    base = join(output_dir, root.lstrip(sep) or "root")
+    extension = OUTPUT_EXTENSIONS[output_format]
+    path = base + extension
+    if taken is not None:
+        copy = 1
+        while path in taken:
+            copy += 1
+            path = "%s.%d%s" % (base, copy, extension)
+        taken.add(path)
+    return path
+
+
+def render_root(
+    root: str, settings: Settings, options: Options, destination: Optional[str] = None
+) -> Optional[str]:
+    """
+    Prints the tree of a root, on a worker process. Errors met while traversing are reported
+    on stderr, but a root that cannot be read at all raises.
+
+    Args:
+        root (str): Absolute path to the root
+        settings (Settings): Print settings
+        options (Options): Traversal options
+        destination (Optional[str], optional): Path of the file to write the tree to. The tree
+        is returned if None. Defaults to None.
+
+    Returns:
+        Optional[str]: The lines of the tree, each ending in a newline, if no destination is
+        given
+
+    Raises:
+        OSError: Raises if the root is missing, is not a directory or cannot be read
+    """
+    # The traversal only reports errors, so the root is opened first to count it as failed
+    with os.scandir(root):
+        pass
+    with redirect_stdout(sys.stderr):
+        lines = generate_output(root, settings, options)
+        if destination is None:
+            return "".join(line + "\n" for line in lines)
+        os.makedirs(dirname(destination), exist_ok=True)
+        with open(destination, "w", encoding="utf-8", errors="surrogateescape") as file:
+            write_lines(lines, file, options.buffer_size)
+    return None
+
+
+def run_batch(
+    roots: Iterable[str],
+    settings: Settings,
+    options: Options,
+    workers: int,
+    output_dir: Optional[str] = None,
+    stream: TextIO = None,
+) -> int:
+    """
+    Prints the trees of many roots on a pool of worker processes. Trees are written to a file
+    per root, or to a single stream in the order the roots are given, each after a header
+    naming its root (for the tree format). Only a bounded number of trees are held while
+    earlier ones are still being printed.
+
+    Args:
+        roots (Iterable[str]): Absolute paths to the roots
+        settings (Settings): Print settings
+        options (Options): Traversal options
+        workers (int): Number of worker processes
+        output_dir (Optional[str], optional): Directory to write each root's tree to a file
+        in. Trees are written to stream if None. Defaults to None.
+        stream (TextIO, optional): The stream trees are written to. Defaults to sys.stdout.
+
+    Raises:
+        BrokenPipeError: Raises if the reading end of the stream is closed
+
+    Returns:
+        int: The number of roots whose tree could not be written
+    """
+    if stream is None:
+        stream = sys.stdout
+    failures = 0
+    count = 0
+    # Roots submitted to the workers, in order, with their trees to come
+    pending: Deque[Tuple[str, Future]] = deque()
+    # Files already written to, so that a root listed twice does not overwrite itself
+    taken: Set[str] = set()
+    roots = iter(roots)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                while len(pending) < workers * PENDING_PER_WORKER:
+                    root = next(roots, None)
+                    if root is None:
+                        break
+                    destination = None
+                    if output_dir is not None:
+                        destination = output_path(output_dir, root, options.output_format, taken)
+                    future = executor.submit(render_root, root, settings, options, destination)
+                    pending.append((root, future))
+                if not pending:
+                    break
+                root, future = pending.popleft()
+                try:
+                    text = future.result()
+                except Exception as err:
+                    print("%s: %s" % (root, err), file=sys.stderr)
+                    failures += 1
+                    continue
+                if text is not None:
+                    if options.output_format == "tree":
+                        header = HEADER_FORMAT % root
+                        text = ("\n" if count else "") + header + "\n" + text
+                    stream.write(text)
+                    stream.flush()
+                count += 1
+        finally:
+            for _, future in pending:
+                future.cancel()
+    return failures
+
+
+def setup_batch_parser() -> ArgumentParser:
+    """
+    Initializes an ArgumentParser to correctly parse user options for gdtree batch
+
+    Returns:
+        ArgumentParser: The argument parser object
+    """
+    parser = ArgumentParser(
+        prog="gdtree batch",
+        description="Prints the trees of many directories, read one per line from a file",
+    )
+    parser.add_argument(
+        "roots",
+        help="File listing the directories to print, one per line. Read from stdin if '-' or "
+        "not given",
+        metavar="FILE",
+        nargs="?",
+        default="-",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        dest="output_dir",
+        help="Writes each directory's tree to a file in DIR, at the directory's path below DIR, "
+        "rather than all trees to stdout",
+        metavar="DIR",
+        default=None,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        help="Number of worker processes. Defaults to the number of CPUs",
+        metavar="N",
+        type=positive_int,
+        default=os.cpu_count() or 1,
+    )
+    add_tree_arguments(parser)
+    return parser
+
+
+def start_batch(input_args: List[str] = None) -> int:
+    """
+    The starting function for batch mode (gdtree batch)
+
+    Args:
+        input_args (List[str], optional): Arguments to parse, after "batch". Defaults to None.
+
+    Returns:
+        int: The number of roots whose tree could not be written
+    """
+    parser = setup_batch_parser()
+    args = parser.parse_args(input_args)
+    if args.watch or args.stats:
+        parser.error("--watch and --stats print a single tree, so cannot be used in batch mode")
+    settings = process_settings_from_args(args)
+    options = process_options_from_args(args)
+    if args.output_dir is None:
+        settings = init_colors(settings)
+    else:
+        # Files are never terminals, so are written without colors
+        settings &= ~Settings.COLORIZE
+    if args.roots == "-":
+        roots = list(read_roots(sys.stdin))
+    else:
+        try:
+            with open(args.roots, encoding="utf-8", errors="surrogateescape") as file:
+                roots = list(read_roots(file))
+        except OSError as err:
+            parser.error(str(err))
+    return run_batch(roots, settings, options, args.workers, args.output_dir)
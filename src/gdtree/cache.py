@@ -0,0 +1,308 @@
+"""
+Persistent cache of directory listings, shared between runs and between processes
+"""
+
+import sqlite3
+from os import makedirs, stat_result
+from os.path import dirname, join
+from threading import Lock, local
+from time import time_ns
+from typing import List, Optional, Tuple
+from gdtree.traverse import Listing
+from gdtree.utils import DEFAULT_CACHE_SIZE, EntryType
+
+# Number of listings held in memory before they are written to the cache
+WRITE_BATCH = 512
+# Listings of directories modified less than this many nanoseconds before they were scanned are
+# not cached, since a change made within the same timestamp tick would go unnoticed
+RACY_INTERVAL = 2_000_000_000
+# Milliseconds to wait on another process holding a lock on the cache
+BUSY_TIMEOUT = 5000
+# Version of the cache's schema. Caches of other versions are discarded.
+SCHEMA_VERSION = 1
+# Separates the names of a listing's entries, which cannot hold it
+NAME_SEPARATOR = "\0"
+
+# A row of the listings table
+_Row = Tuple[str, str, int, int, int, bytes, bytes, int, int]
+
+
+def _encode(listing: Listing) -> Tuple[bytes, bytes]:
+    """
+    Encodes a listing. Paths are not stored, since they are rebuilt from the directory's path,
+    and neither are statuses.
+
+    Args:
+        listing (Listing): The listing
+
+    Returns:
+        Tuple[bytes, bytes]: The names of the entries and their types
+    """
+    names = NAME_SEPARATOR.join(name for name, _, _, _ in listing)
+    return (
+        names.encode("utf-8", "surrogateescape"),
+        bytes(type.value for _, _, type, _ in listing),
+    )
+
+
+def _decode(path: str, names: bytes, types: bytes) -> Listing:
+    """
+    Decodes a listing
+
+    Args:
+        path (str): The directory listed
+        names (bytes): The names of the entries
+        types (bytes): The types of the entries
+
+    Returns:
+        Listing: The listing
+    """
+    prefix = join(path, "")
+    return [
+        (
+            name,
+            "" if type == EntryType.TRUNCATED.value else prefix + name,
+            EntryType(type),
+            None,
+        )
+        for name, type in zip(
+            names.decode("utf-8", "surrogateescape").split(NAME_SEPARATOR), types
+        )
+    ]
+
+
+def _storable(path: str) -> bool:
+    """
+    Checks whether a path can be stored in the database, which holds text as UTF-8. Paths holding
+    undecodable bytes cannot.
+
+    Args:
+        path (str): The path
+
+    Returns:
+        bool: Whether the path can be stored
+    """
+    try:
+        path.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+class ScanCache:
+    """
+    Caches directory listings in an SQLite database. A listing is keyed by the directory's path
+    and a variant naming the scanner options it was made with, and is only reused while the
+    directory's device, inode and modification time are unchanged. Changes that leave the
+    directory's modification time alone, such as a file being made executable, are not seen.
+
+    Listings may be looked up from several threads. Each thread has its own connection, and new
+    listings are written in batches. The database is in write-ahead logging mode so that several
+    processes may use it at once. Any error from the database disables the cache rather than
+    failing the traversal.
+    """
+
+    def __init__(self, filename: str, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Initializes the cache, creating the database if it does not exist.
+
+        Args:
+            filename (str): Path to the database
+            max_size (int, optional): Maximum size of the cached listings in bytes. The least
+            recently used listings are evicted past it. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._local = local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = Lock()
+        self._pending: List[_Row] = []
+        self._used: List[Tuple[str, str]] = []
+        self._run = time_ns()
+        self._enabled = True
+        try:
+            makedirs(dirname(filename) or ".", exist_ok=True)
+            self._setup(self._connection())
+        except (OSError, sqlite3.Error):
+            self._enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Gets the calling thread's connection to the database, opening it if needed
+
+        Returns:
+            sqlite3.Connection: The connection
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.filename, timeout=BUSY_TIMEOUT / 1000, check_same_thread=False
+            )
+            connection.execute("PRAGMA busy_timeout = %d" % BUSY_TIMEOUT)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _setup(connection: sqlite3.Connection) -> None:
+        """
+        Creates the database's schema, discarding caches of other schema versions
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database
+        """
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        with connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS listings")
+                connection.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "path TEXT NOT NULL, variant TEXT NOT NULL, "
+                "dev INTEGER NOT NULL, ino INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "names BLOB NOT NULL, types BLOB NOT NULL, "
+                "size INTEGER NOT NULL, used INTEGER NOT NULL, "
+                "PRIMARY KEY (path, variant))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS listings_used ON listings (used)")
+
+    def get(self, path: str, variant: str, status: stat_result) -> Optional[Listing]:
+        """
+        Looks up the listing of a directory
+
+        Args:
+            path (str): The directory
+            variant (str): Names the options the listing was made with
+            status (stat_result): The directory's current status
+
+        Returns:
+            Optional[Listing]: The cached listing, or None if it is missing or out of date
+        """
+        if not self._enabled or not _storable(path):
+            return None
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT names, types FROM listings WHERE path = ? AND variant = ? "
+                    "AND dev = ? AND ino = ? AND mtime_ns = ?",
+                    (path, variant, status.st_dev, status.st_ino, status.st_mtime_ns),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            self._enabled = False
+            return None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used.append((path, variant))
+        return _decode(path, *row)
+
+    def put(self, path: str, variant: str, status: stat_result, listing: Listing) -> None:
+        """
+        Caches the listing of a directory
+
+        Args:
+            path (str): The directory
+            variant (str): Names the options the listing was made with
+            status (stat_result): The directory's status, taken before it was listed
+            listing (Listing): The listing
+        """
+        if (
+            not self._enabled
+            or not _storable(path)
+            or time_ns() - status.st_mtime_ns < RACY_INTERVAL
+        ):
+            return
+        names, types = _encode(listing)
+        row = (
+            path,
+            variant,
+            status.st_dev,
+            status.st_ino,
+            status.st_mtime_ns,
+            names,
+            types,
+            len(path) + len(names) + len(types),
+            self._run,
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) < WRITE_BATCH:
+                return
+            pending, self._pending = self._pending, []
+        self._write(pending)
+
+    def _write(self, rows: List[_Row]) -> None:
+        """
+        Writes listings to the database in a single transaction
+
+        Args:
+            rows (List[_Row]): The listings
+        """
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO listings "
+                    "(path, variant, dev, ino, mtime_ns, names, types, size, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error:
+            self._enabled = False
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Evicts the least recently used listings until the cache is within its maximum size
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database
+        """
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM listings").fetchone()[0]
+        excess = total - self.max_size
+        if excess <= 0:
+            return
+        evicted = []
+        for rowid, size in connection.execute(
+            "SELECT rowid, size FROM listings ORDER BY used, rowid"
+        ):
+            evicted.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM listings WHERE rowid = ?", evicted)
+
+    def close(self) -> None:
+        """
+        Writes the remaining listings, marks the listings used by this run as recently used,
+        evicts listings past the maximum size and closes all connections.
+        """
+        if self._enabled:
+            try:
+                with self._lock:
+                    pending, self._pending = self._pending, []
+                    used, self._used = self._used, []
+                if pending:
+                    self._write(pending)
+                with self._connection() as connection:
+                    connection.executemany(
+                        "UPDATE listings SET used = %d WHERE path = ? AND variant = ?"
+                        % self._run,
+                        used,
+                    )
+                    self._evict(connection)
+            except sqlite3.Error:
+                self._enabled = False
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = local()
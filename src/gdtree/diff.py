@@ -0,0 +1,334 @@
+"""
+Differences between two directory trees. Both trees are walked together, a directory at a time,
+merging their sorted listings like a merge join, and only the entries that differ (and the
+directories holding them) are printed.
+"""
+
+from enum import Enum
+from os import stat
+from os.path import basename
+from typing import Generator, Hashable, Iterator, List, Optional, Tuple, Union
+from gdtree.end_state_history import EndStateHistory
+from gdtree.filestring import (
+    DEFAULT_COLOR,
+    DEFAULT_COLORS,
+    GREEN,
+    RED,
+    YELLOW,
+    ColorScheme,
+    build_fancy_prefix,
+    build_prefix,
+)
+from gdtree.patterns import EntryFilter
+from gdtree.snapshot import ROOT, TreeSnapshot
+from gdtree.traverse import Scanner, list_directory
+from gdtree.utils import EntryType, ExecutableCheck, Settings
+
+# A directory's entries, as (name, type, node) triples sorted by name. A node is what a tree
+# needs to find an entry again (ex. its path).
+Children = List[Tuple[str, EntryType, Hashable]]
+
+
+class Change(Enum):
+    """
+    Enum type consisting of the ways an entry can differ between two trees
+    """
+
+    ADDED = "+"
+    REMOVED = "-"
+    # The entry is of another type in the second tree (ex. a file replaced by a directory)
+    TYPE_CHANGED = "~"
+    # A directory in both trees, holding entries that differ
+    CONTAINS_CHANGES = " "
+
+
+# Colors of the marker printed before each kind of change
+CHANGE_COLORS = {
+    Change.ADDED: GREEN,
+    Change.REMOVED: RED,
+    Change.TYPE_CHANGED: YELLOW,
+}
+
+
+class DirectoryTree:
+    """
+    A tree read from the file system, a directory at a time as the comparison reaches it.
+    Directories only have cheap keys (their identity, or their modification time if trusted),
+    so unless modification times are trusted, every directory in both trees is listed: only a
+    directory compared with itself is skipped.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        entry_filter: Optional[EntryFilter] = None,
+        trust_mtime: bool = False,
+    ):
+        """
+        Initializes the tree.
+
+        Args:
+            root (str): Absolute path to the top level directory
+            entry_filter (Optional[EntryFilter], optional): Filters the entries of each
+            directory. Only hidden entries are filtered out if None. Defaults to None.
+            trust_mtime (bool, optional): Takes directories with the same modification time in
+            both trees to hold identical subtrees. A directory's modification time only changes
+            when its own entries do, so changes deeper down are missed unless every directory
+            above them was touched too. Defaults to False.
+        """
+        self.name = basename(root)
+        self.root = root
+        self.trust_mtime = trust_mtime
+        self.scanner = Scanner(False, ExecutableCheck.NONE, entry_filter=entry_filter)
+
+    def children(self, node: Hashable) -> Children:
+        """
+        Lists a directory of the tree
+
+        Args:
+            node (Hashable): The directory's path
+
+        Returns:
+            Children: The directory's entries, with their paths as nodes
+        """
+        listing = list_directory(node, self.scanner)
+        if listing is None:
+            return []
+        return [(name, type, path) for name, path, type, _ in listing]
+
+    def key(self, node: Hashable) -> Optional[Hashable]:
+        """
+        Gets what identifies a directory's subtree. Directories with equal keys in two trees
+        hold identical subtrees.
+
+        Args:
+            node (Hashable): The directory's path
+
+        Returns:
+            Optional[Hashable]: The directory's device and inode (so that a directory is never
+            compared with itself), or its modification time if it is trusted. None if the
+            directory cannot be stat()ed.
+        """
+        try:
+            status = stat(node)
+        except OSError:
+            return None
+        if self.trust_mtime:
+            return "mtime", status.st_mtime_ns
+        return "inode", status.st_dev, status.st_ino
+
+
+class SnapshotTree:
+    """
+    A tree read from a TreeSnapshot. Subtrees are identified by their digests, so identical
+    subtrees of two snapshots are skipped without being walked.
+    """
+
+    def __init__(self, snapshot: TreeSnapshot):
+        """
+        Initializes the tree.
+
+        Args:
+            snapshot (TreeSnapshot): The snapshot
+        """
+        self.name = snapshot.root_name
+        self.root = ROOT
+        self.snapshot = snapshot
+        self.digests = snapshot.digests()
+
+    def children(self, node: Hashable) -> Children:
+        """
+        Lists a directory of the snapshot
+
+        Args:
+            node (Hashable): The directory's index
+
+        Returns:
+            Children: The directory's entries, with their indices as nodes
+        """
+        snapshot = self.snapshot
+        children = [
+            (snapshot.name(index), snapshot.type(index), index)
+            for index in snapshot.children(node)
+            if snapshot.types[index] != EntryType.TRUNCATED.value
+        ]
+        # Snapshots of reverse traversals hold their entries in reverse order
+        children.sort(key=lambda child: child[0])
+        return children
+
+    def key(self, node: Hashable) -> Optional[Hashable]:
+        """
+        Gets what identifies a directory's subtree. Directories with equal keys in two trees
+        hold identical subtrees.
+
+        Args:
+            node (Hashable): The directory's index
+
+        Returns:
+            Optional[Hashable]: The digest of the directory's subtree
+        """
+        if node == ROOT:
+            return None
+        return "digest", self.digests[node]
+
+
+Tree = Union[DirectoryTree, SnapshotTree]
+
+
+class DiffNode:
+    """
+    An entry that differs between two trees. Directories holding changes list the entries that
+    differ below them.
+    """
+
+    __slots__ = ("name", "change", "type", "old_type", "children")
+
+    def __init__(self, name: str, change: Change, type: EntryType, old_type: EntryType = None):
+        """
+        Initializes the node.
+
+        Args:
+            name (str): The entry's name
+            change (Change): How the entry differs
+            type (EntryType): The entry's type, in the second tree unless it was removed
+            old_type (EntryType, optional): The entry's type in the first tree, if it changed.
+            Defaults to None.
+        """
+        self.name = name
+        self.change = change
+        self.type = type
+        self.old_type = old_type
+        self.children: List["DiffNode"] = []
+
+
+def _merge(left: Children, right: Children) -> Iterator[Tuple]:
+    """
+    Pairs the entries of a directory in two trees by name, in one pass over both sorted listings
+
+    Args:
+        left (Children): The directory's entries in the first tree
+        right (Children): The directory's entries in the second tree
+
+    Yields:
+        Iterator[Tuple]: (name, left type, left node, right type, right node) for every name in
+        either listing, in order. The type and node of a side missing the name are None.
+    """
+    left_index, right_index = 0, 0
+    while left_index < len(left) and right_index < len(right):
+        left_name, left_type, left_node = left[left_index]
+        right_name, right_type, right_node = right[right_index]
+        if left_name == right_name:
+            yield left_name, left_type, left_node, right_type, right_node
+            left_index += 1
+            right_index += 1
+        elif left_name < right_name:
+            yield left_name, left_type, left_node, None, None
+            left_index += 1
+        else:
+            yield right_name, None, None, right_type, right_node
+            right_index += 1
+    for name, type, node in left[left_index:]:
+        yield name, type, node, None, None
+    for name, type, node in right[right_index:]:
+        yield name, None, None, type, node
+
+
+def diff_trees(left: Tree, right: Tree) -> List[DiffNode]:
+    """
+    Compares two trees. Added and removed directories are not walked, and directories holding
+    identical subtrees in both trees (by their keys) are skipped.
+
+    Args:
+        left (Tree): The first tree
+        right (Tree): The second tree
+
+    Returns:
+        List[DiffNode]: The entries at the top of the trees that differ, in order
+    """
+    top: List[DiffNode] = []
+    # Each frame holds the pairs of a directory's entries still to compare, the list its
+    # differing entries are added to, and its node in the parent directory's list (if any)
+    stack = [(_merge(left.children(left.root), right.children(right.root)), top, None)]
+    while stack:
+        pairs, differing, node = stack[-1]
+        pair = next(pairs, None)
+        if pair is None:
+            stack.pop()
+            if node is not None and node.children:
+                stack[-1][1].append(node)
+            continue
+        name, left_type, left_node, right_type, right_node = pair
+        if right_type is None:
+            differing.append(DiffNode(name, Change.REMOVED, left_type))
+        elif left_type is None:
+            differing.append(DiffNode(name, Change.ADDED, right_type))
+        elif left_type != right_type:
+            differing.append(DiffNode(name, Change.TYPE_CHANGED, right_type, left_type))
+        elif left_type == EntryType.DIRECTORY:
+            left_key = left.key(left_node)
+            if left_key is not None and left_key == right.key(right_node):
+                continue
+            directory = DiffNode(name, Change.CONTAINS_CHANGES, EntryType.DIRECTORY)
+            children = _merge(left.children(left_node), right.children(right_node))
+            stack.append((children, directory.children, directory))
+    return top
+
+
+def diff_lines(
+    left: Tree, right: Tree, settings: Settings, colors: Optional[ColorScheme] = None
+) -> Generator[str, None, None]:
+    """
+    Generates the pretty-printed differences between two trees. Every entry that differs is
+    printed with its marker (+ added, - removed, ~ of another type), under the directories
+    holding it.
+
+    Args:
+        left (Tree): The first tree
+        right (Tree): The second tree
+        settings (Settings): Print settings
+        colors (Optional[ColorScheme], optional): The colors names are printed in, when
+        colorizing. Defaults to DEFAULT_COLORS.
+
+    Yields:
+        Generator[str, None, None]: The lines of the differences
+    """
+    colorize = bool(settings & Settings.COLORIZE)
+    prefix_builder = build_fancy_prefix if settings & Settings.FANCY else build_prefix
+    counts = {Change.ADDED: 0, Change.REMOVED: 0, Change.TYPE_CHANGED: 0}
+
+    colorize_name = (colors or DEFAULT_COLORS).colorize
+
+    def format_name(name: str, type: EntryType) -> str:
+        return colorize_name(name, type) if colorize else name
+
+    yield "%s -> %s" % (
+        format_name(left.name, EntryType.DIRECTORY),
+        format_name(right.name, EntryType.DIRECTORY),
+    )
+    top = diff_trees(left, right)
+    stack: List[Tuple[List[DiffNode], int, EndStateHistory]] = [(top, 0, EndStateHistory())]
+    while stack:
+        nodes, index, history = stack.pop()
+        if index == len(nodes):
+            continue
+        stack.append((nodes, index + 1, history))
+        node = nodes[index]
+        node_history = history.child(index == len(nodes) - 1)
+        line = prefix_builder(node_history)
+        if node.change == Change.CONTAINS_CHANGES:
+            yield line + format_name(node.name, node.type)
+            stack.append((node.children, 0, node_history))
+            continue
+        counts[node.change] += 1
+        marker = node.change.value
+        if colorize:
+            marker = CHANGE_COLORS[node.change] + marker + DEFAULT_COLOR
+        line += "%s %s" % (marker, format_name(node.name, node.type))
+        if node.change == Change.TYPE_CHANGED:
+            line += " (%s -> %s)" % (node.old_type.name.lower(), node.type.name.lower())
+        yield line
+    yield "%d added, %d removed, %d changed type" % (
+        counts[Change.ADDED],
+        counts[Change.REMOVED],
+        counts[Change.TYPE_CHANGED],
+    )
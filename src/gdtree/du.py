@@ -0,0 +1,242 @@
+"""
+Disk usage mode: prints the size of every entry, with each directory's size being the total of
+its subtree
+"""
+
+from os import stat_result
+from stat import S_ISDIR
+from tempfile import TemporaryFile
+from typing import BinaryIO, Callable, Generator, Iterable, List, Optional, Set, Tuple
+from gdtree.end_state_history import EndStateHistory
+from gdtree.utils import EntryType
+
+# Width of the size column
+SIZE_WIDTH = 5
+# Units sizes are printed in, each 1024 times the previous
+SIZE_UNITS = ("", "K", "M", "G", "T", "P", "E")
+# Encoding of the lines held back on disk. Undecodable names round trip through it unchanged.
+ENCODING = "utf-8"
+ENCODING_ERRORS = "surrogateescape"
+
+
+def format_size(size: int) -> str:
+    """
+    Formats a size in bytes in at most SIZE_WIDTH characters (ex. 512, 4.0K, 12M)
+
+    Args:
+        size (int): The size in bytes
+
+    Returns:
+        str: The formatted size
+    """
+    value = float(size)
+    for unit in SIZE_UNITS:
+        if value < 1024 or unit == SIZE_UNITS[-1]:
+            break
+        value /= 1024
+    if not unit:
+        return str(size)
+    if value < 9.95:
+        return "%.1f%s" % (value, unit)
+    if value < 1023.5:
+        return "%.0f%s" % (value, unit)
+    # Rounds up to the next unit
+    return "1.0%s" % SIZE_UNITS[SIZE_UNITS.index(unit) + 1]
+
+
+def du_line(prefix: str, name: str, size: Optional[int] = None) -> str:
+    """
+    Builds the line of an entry, with its size between its prefix and its name
+
+    Args:
+        prefix (str): The entry's prefix
+        name (str): The entry's formatted name
+        size (Optional[int], optional): The size in bytes. The size column is left blank, to
+        be written in later, if None. Defaults to None.
+
+    Returns:
+        str: The line
+    """
+    column = " " * SIZE_WIDTH if size is None else format_size(size).rjust(SIZE_WIDTH)
+    return "%s[%s]  %s" % (prefix, column, name)
+
+
+def du_footer(total: int, num_dir: int, num_files: int) -> str:
+    """
+    Builds the line ending the tree, with the total size and the number of entries
+
+    Args:
+        total (int): The total size in bytes, of the start directory and everything below it
+        num_dir (int): Number of directories
+        num_files (int): Number of files
+
+    Returns:
+        str: The line
+    """
+    return "%s used in %d directories, %d files" % (format_size(total), num_dir, num_files)
+
+
+def entry_size(status: Optional[stat_result], linked: Set[Tuple[int, int]]) -> int:
+    """
+    Gets the size an entry adds to the total of its directory. A file with several hard links
+    only adds its size the first time it is seen.
+
+    Args:
+        status (Optional[stat_result]): The entry's lstat() result, or None if it is unknown
+        linked (Set[Tuple[int, int]]): The (st_dev, st_ino) of the files with several hard links
+        seen so far. Updated with this entry.
+
+    Returns:
+        int: The entry's size in bytes
+    """
+    if status is None:
+        return 0
+    if status.st_nlink > 1 and not S_ISDIR(status.st_mode):
+        key = (status.st_dev, status.st_ino)
+        if key in linked:
+            return 0
+        linked.add(key)
+    return status.st_size
+
+
+class _HeldLines:
+    """
+    Lines held back on disk while a directory line above them waits for its size. Only the
+    offsets of the waiting sizes are held in memory.
+    """
+
+    def __init__(self):
+        """
+        Initializes the held lines, with no file until a line is held.
+        """
+        self.file: Optional[BinaryIO] = None
+
+    def hold(self, line: str) -> int:
+        """
+        Holds a line
+
+        Args:
+            line (str): The line, without a trailing newline
+
+        Returns:
+            int: Offset of the line in the file
+        """
+        if self.file is None:
+            self.file = TemporaryFile()
+        offset = self.file.tell()
+        self.file.write(line.encode(ENCODING, ENCODING_ERRORS) + b"\n")
+        return offset
+
+    def patch(self, offset: int, text: str) -> None:
+        """
+        Overwrites held text in place
+
+        Args:
+            offset (int): Offset of the text in the file
+            text (str): The ASCII text to write, of the same length as the text it replaces
+        """
+        self.file.seek(offset)
+        self.file.write(text.encode("ascii"))
+        self.file.seek(0, 2)
+
+    def release(self) -> Generator[str, None, None]:
+        """
+        Releases the lines held, in the order they were held
+
+        Yields:
+            Generator[str, None, None]: The lines, without trailing newlines
+        """
+        if self.file is None:
+            return
+        self.file.seek(0)
+        for line in self.file:
+            yield line[:-1].decode(ENCODING, ENCODING_ERRORS)
+        self.file.seek(0)
+        self.file.truncate()
+
+    def close(self) -> None:
+        """
+        Removes the file holding the lines
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def du_lines(
+    root_line: str,
+    entries: Iterable[Tuple[str, EntryType, EndStateHistory, Optional[stat_result]]],
+    build_prefix: Callable[[EndStateHistory], str],
+    format_name: Callable[[str, EntryType], str],
+    root_size: int = 0,
+) -> Generator[str, None, None]:
+    """
+    Generates the tree with the size of every entry. A directory's size is the total size of the
+    entries below it, and the directory itself, counting each hard linked file once.
+
+    A directory's line comes before the entries below it, but its size is only known once they
+    have all been traversed. Lines are therefore held back on disk from the first directory line
+    still waiting for its size, and each directory's size is written into its held line once the
+    directory ends. Only a running total and the offset of the held line are kept in memory for
+    each open directory, so memory is bounded by the depth of the tree rather than by its size.
+
+    Args:
+        root_line (str): The line naming the start directory
+        entries (Iterable[Tuple[str, EntryType, EndStateHistory, Optional[stat_result]]]): The
+        traversal, with the lstat() result of every entry
+        build_prefix (Callable[[EndStateHistory], str]): Builds the prefix of an entry's line
+        format_name (Callable[[str, EntryType], str]): Formats an entry's name
+        root_size (int, optional): Size of the start directory itself. Defaults to 0.
+
+    Yields:
+        Generator[str, None, None]: The lines of the tree
+    """
+    num_dir, num_files = 0, 0
+    # (depth, total size, offset of the held line) of each open directory
+    open_directories: List[List[int]] = []
+    # The start directory, which the entries at the top level add to
+    root_total = [0, root_size, 0]
+    # Files with several hard links already counted
+    linked: Set[Tuple[int, int]] = set()
+    held = _HeldLines()
+
+    def close_directory() -> None:
+        depth, total, offset = open_directories.pop()
+        (open_directories[-1] if open_directories else root_total)[1] += total
+        held.patch(offset, format_size(total).rjust(SIZE_WIDTH))
+
+    yield root_line
+    try:
+        for name, type, history, status in entries:
+            depth = len(history)
+            while open_directories and open_directories[-1][0] >= depth:
+                close_directory()
+                if not open_directories:
+                    yield from held.release()
+
+            size = entry_size(status, linked)
+
+            prefix = build_prefix(history)
+            if type == EntryType.TRUNCATED:
+                # The entries left out were never stat()ed, so have no size
+                line = prefix + format_name(name, type)
+            elif type == EntryType.DIRECTORY:
+                num_dir += 1
+                line = du_line(prefix, format_name(name, type))
+                offset = held.hold(line) + len(prefix.encode(ENCODING, ENCODING_ERRORS)) + 1
+                open_directories.append([depth, size, offset])
+                continue
+            else:
+                num_files += 1
+                line = du_line(prefix, format_name(name, type), size)
+                (open_directories[-1] if open_directories else root_total)[1] += size
+            if open_directories:
+                held.hold(line)
+            else:
+                yield line
+        while open_directories:
+            close_directory()
+        yield from held.release()
+    finally:
+        held.close()
+    yield du_footer(root_total[1], num_dir, num_files)
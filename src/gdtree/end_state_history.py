@@ -1,5 +1,4 @@
 from typing import List
-from gdtree.utils import MAX_DEPTH
 
 
 class EndStateHistory:
@@ -7,9 +6,12 @@ class EndStateHistory:
     A container that holds the end state history as encountered during traversal. An end state is a boolean values
     storeing if this entry exists as the last element in an lexicographical ordering
     of the directory tree. EndStateHistory is a container of these values for each level of the directory tree
-    traversed for a given entry.
+    traversed for a given entry. The history is stored as the bits of an integer, so it can grow to
+    any depth.
     """
 
+    __slots__ = ("history", "depth")
+
     def __init__(self, input_history: List[bool] = None):
         """
         Initializes the EndStateHistory container.
@@ -17,21 +19,30 @@ class EndStateHistory:
         Args:
             input_history (List[bool], optional): An boolean list holding the sequential end state history.
             The order of the array is read from least depth in tree to greatest depth in tree. Defaults to None.
-
-        Raises:
-            ValueError: Raises if the input end state history list length exceeds the maximum allowed depth
         """
         self.history = 0
         self.depth = 0
         if input_history is not None and len(input_history) > 0:
-            if len(input_history) > MAX_DEPTH:
-                raise ValueError(
-                    "Input list has too many values (greater than maximum allowed depth)"
-                )
             self.depth = len(input_history)
             for index, state in enumerate(input_history):
                 self.history |= state << index
 
+    def child(self, is_end: bool) -> "EndStateHistory":
+        """
+        Creates the history of an entry one level below this one, in constant time. This instance
+        is not mutated.
+
+        Args:
+            is_end (bool): The end state of the new entry
+
+        Returns:
+            EndStateHistory: This history with the new end state appended
+        """
+        new_history = object.__new__(EndStateHistory)
+        new_history.history = self.history | (is_end << self.depth)
+        new_history.depth = self.depth + 1
+        return new_history
+
     def __len__(self) -> int:
         """
         Gets the length of the history stored, corresponding to the depth of the traversal history up to that point.
@@ -84,14 +95,7 @@ class EndStateHistory:
 
         Args:
             value (bool): The new end state value to append
-
-        Raises:
-            DepthError: Raises if attempt is made to extend end state beyond maximum depth
         """
-        if self.depth == MAX_DEPTH:
-            raise DepthError(
-                "Attempted to extend state history beyond maximum allowed traversal depth"
-            )
         prev_depth = self.depth
         self.depth += 1
         self[prev_depth] = value
@@ -113,14 +117,7 @@ class EndStateHistory:
 
         Args:
             other (EndStateHistory): The other EndStateHistory whose values will be extended
-
-        Raises:
-            DepthError: Raises if extension by other history will exceed maximum allowed traversal depth
         """
-        if (self.depth + other.depth) > MAX_DEPTH:
-            raise DepthError(
-                "Attempted to extend state history beyond maximum allowed traversal depth"
-            )
         other_history = other.history
         other_history <<= self.depth
         self.history |= other_history
@@ -148,12 +145,3 @@ class _StateHistoryIterator:
         else:
             raise StopIteration
 
-
-class DepthError(Exception):
-    """
-    An error called when a DirectoryTreeEntry or traversal function attempts
-    to exceed the maximum program depth
-    """
-
-    def __init__(self, message: str):
-        self.message = message
@@ -2,11 +2,13 @@
 A set of filestring generating utilities.
 """
 
-from sys import prefix
 from gdtree.end_state_history import EndStateHistory
+from gdtree.stats import Stats
 from gdtree.utils import EntryType, Settings
-from typing import Callable, Dict
-from colorama import Fore
+from collections import OrderedDict
+from functools import lru_cache
+from time import perf_counter
+from typing import Callable, Dict, Optional, Tuple
 
 
 # =====Prefixes=====
@@ -47,17 +49,54 @@ FILE_FANCY = {
 PREFIX_REGULAR = {True: FILE_EXT, False: EXT}
 PREFIX_FANCY = {True: FILE_FANCY, False: FANCY}
 
+# Maximum number of rendered indentations cached per prefix set
+PREFIX_CACHE_SIZE = 4096
+
+# =====Colors=====
+# ANSI escape sequences setting the foreground color, the same as colorama's Fore
+RED = "\x1b[31m"
+GREEN = "\x1b[32m"
+YELLOW = "\x1b[33m"
+CYAN = "\x1b[36m"
+WHITE = "\x1b[37m"
+
 # The default color to be printed
-DEFAULT_COLOR = Fore.WHITE
+DEFAULT_COLOR = WHITE
 
 # Mapping directory entry types to colors in terminal
 COLORMAP = {
-    EntryType.EXECUTABLE: Fore.RED,
+    EntryType.EXECUTABLE: RED,
     EntryType.FILE: DEFAULT_COLOR,
-    EntryType.SYMLINK: Fore.GREEN,
-    EntryType.DIRECTORY: Fore.CYAN,
+    EntryType.SYMLINK: GREEN,
+    EntryType.DIRECTORY: CYAN,
+    EntryType.TRUNCATED: DEFAULT_COLOR,
+    EntryType.LOOP: CYAN,
+    EntryType.REPEAT: CYAN,
+}
+# Marks printed after the names of directories reached again when following symlinks, which
+# are not descended into
+NOT_FOLLOWED_FORMATS = {
+    EntryType.LOOP: "%s [recursive, not followed]",
+    EntryType.REPEAT: "%s [already listed, not followed]",
 }
 
+# Resets every attribute an LS_COLORS color may set
+RESET = "\x1b[0m"
+# LS_COLORS keys of the colors of each entry type
+LS_COLORS_TYPES = {
+    "di": EntryType.DIRECTORY,
+    "ln": EntryType.SYMLINK,
+    "ex": EntryType.EXECUTABLE,
+    "fi": EntryType.FILE,
+}
+# The colors GNU ls gives the entry types LS_COLORS leaves out
+LS_COLORS_DEFAULTS = {"di": "01;34", "ln": "01;36", "ex": "01;32", "fi": ""}
+
+# The escape sequences written before and after a colored name
+Fragments = Tuple[str, str]
+# Looked up once, rather than on the enum for every name colored
+_FILE = EntryType.FILE
+
 
 def _get_prefix(end_state: bool, prefix_subset: Dict[bool, str]) -> str:
     """
@@ -80,16 +119,90 @@ def _get_prefix(end_state: bool, prefix_subset: Dict[bool, str]) -> str:
     return output_prefix
 
 
-def _build_prefix(
-    history: EndStateHistory, prefix_set: Dict[bool, Dict[bool, str]]
-) -> str:
-    last_index = len(history) - 1
-    prefixes = [None] * (last_index + 1)
-    for index, state in enumerate(history):
-        prefix_subset = prefix_set[index == last_index]
-        prefix = _get_prefix(state, prefix_subset)
-        prefixes[index] = prefix
-    return "".join(prefixes)
+class _PrefixRenderer:
+    """
+    Renders prefixes from end state histories using one prefix set. The indentation rendered for
+    each (history bits, depth) is kept in a bounded LRU cache, so an entry's prefix is its
+    parent's cached indentation plus a single segment. The last prefix rendered is also kept,
+    as the entries of a directory mostly share their histories.
+    """
+
+    def __init__(
+        self, prefix_set: Dict[bool, Dict[bool, str]], maxsize: int = PREFIX_CACHE_SIZE
+    ):
+        """
+        Initializes the renderer.
+
+        Args:
+            prefix_set (Dict[bool, Dict[bool, str]]): The prefix set to render with
+            maxsize (int, optional): Maximum number of indentations to cache.
+            Defaults to PREFIX_CACHE_SIZE.
+        """
+        self.file_prefixes = prefix_set[True]
+        self.ext_prefixes = prefix_set[False]
+        self.maxsize = maxsize
+        self.indentations: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        # (history bits, depth, prefix) of the last prefix rendered
+        self.last: Tuple[int, int, str] = (0, 0, "")
+
+    def __call__(self, history: EndStateHistory) -> str:
+        """
+        Renders the prefix for an entry
+
+        Args:
+            history (EndStateHistory): History of the end states for this entry
+
+        Returns:
+            str: The corresponding prefix
+        """
+        bits = history.history
+        depth = history.depth
+        last_bits, last_depth, prefix = self.last
+        if bits == last_bits and depth == last_depth:
+            return prefix
+        if depth == 0:
+            return ""
+        last_index = depth - 1
+        indentation = self._indentation(bits & ((1 << last_index) - 1), last_index)
+        prefix = indentation + self.file_prefixes[bool(bits >> last_index & 1)]
+        self.last = (bits, depth, prefix)
+        return prefix
+
+    def _indentation(self, bits: int, depth: int) -> str:
+        """
+        Gets the indentation for the first depth levels of a history, rendering it from the
+        deepest cached ancestor indentation on a miss
+
+        Args:
+            bits (int): The end state bits of the first depth levels
+            depth (int): Number of levels of indentation
+
+        Returns:
+            str: The rendered indentation
+        """
+        if depth == 0:
+            return ""
+        indentations = self.indentations
+        key = (bits, depth)
+        indentation = indentations.get(key)
+        if indentation is not None:
+            indentations.move_to_end(key)
+            return indentation
+
+        level = depth - 1
+        while level > 0 and (bits & ((1 << level) - 1), level) not in indentations:
+            level -= 1
+        indentation = indentations.get((bits & ((1 << level) - 1), level), "")
+        for index in range(level, depth):
+            indentation += _get_prefix(bool(bits >> index & 1), self.ext_prefixes)
+            indentations[(bits & ((1 << (index + 1)) - 1), index + 1)] = indentation
+        while len(indentations) > self.maxsize:
+            indentations.popitem(last=False)
+        return indentation
+
+
+_regular_prefix = _PrefixRenderer(PREFIX_REGULAR)
+_fancy_prefix = _PrefixRenderer(PREFIX_FANCY)
 
 
 def build_prefix(history: EndStateHistory) -> str:
@@ -102,7 +215,7 @@ def build_prefix(history: EndStateHistory) -> str:
     Returns:
         str: The corresponding prefix
     """
-    return _build_prefix(history, PREFIX_REGULAR)
+    return _regular_prefix(history)
 
 
 def build_fancy_prefix(history: EndStateHistory) -> str:
@@ -115,7 +228,7 @@ def build_fancy_prefix(history: EndStateHistory) -> str:
     Returns:
         str: The corresponding prefix
     """
-    return _build_prefix(history, PREFIX_FANCY)
+    return _fancy_prefix(history)
 
 
 def get_filestring_color(type: EntryType) -> str:
@@ -141,9 +254,184 @@ def get_filestring_color(type: EntryType) -> str:
     return color
 
 
+def _ls_fragments(code: str) -> Fragments:
+    """
+    Gets the escape sequences coloring a name with a color of LS_COLORS
+
+    Args:
+        code (str): The color, as the parameters of an SGR sequence (ex. 01;34)
+
+    Returns:
+        Fragments: The sequences written before and after the name. Both are empty if the
+        color leaves names uncolored.
+    """
+    if code in ("", "0", "00"):
+        return "", ""
+    return "\x1b[%sm" % code, RESET
+
+
+class ColorScheme:
+    """
+    The colors names are printed in, as the escape sequences written before and after a name of
+    each entry type, built once. Files can also be colored by the suffix of their names (ex.
+    LS_COLORS's *.tar=01;31), looked up by extension in a hash table, so coloring a name costs
+    the same however many colors there are.
+    """
+
+    __slots__ = (
+        "fragments",
+        "file_fragments",
+        "extensions",
+        "suffixes",
+        "suffix_tuple",
+        "by_name",
+    )
+
+    def __init__(
+        self,
+        fragments: Dict[EntryType, Fragments],
+        extensions: Optional[Dict[str, Fragments]] = None,
+        suffixes: Optional[Dict[str, Fragments]] = None,
+    ):
+        """
+        Initializes the scheme.
+
+        Args:
+            fragments (Dict[EntryType, Fragments]): The sequences written around the names of
+            each entry type
+            extensions (Optional[Dict[str, Fragments]], optional): The sequences written around
+            the names of files, by their extensions (ex. ".tar"). Defaults to None.
+            suffixes (Optional[Dict[str, Fragments]], optional): The sequences written around
+            the names of files ending in other suffixes (ex. ".tar.gz", "~"). The longest
+            suffix or extension matching a name is used. Defaults to None.
+        """
+        self.fragments = fragments
+        self.file_fragments = fragments[EntryType.FILE]
+        self.extensions = extensions or {}
+        self.suffixes = suffixes or {}
+        self.suffix_tuple = tuple(self.suffixes)
+        # Whether files are colored by their names rather than only their type
+        self.by_name = bool(self.extensions or self.suffixes)
+
+    @classmethod
+    def parse(cls, ls_colors: str) -> "ColorScheme":
+        """
+        Builds a scheme from an LS_COLORS specification, as GNU ls reads it. Entry types it
+        leaves out have the colors of GNU ls, and keys gdtree has no use for (ex. colors of
+        sockets and devices) are ignored.
+
+        Args:
+            ls_colors (str): The specification (ex. "di=01;34:ln=01;36:*.tar=01;31")
+
+        Returns:
+            ColorScheme: The scheme
+        """
+        codes = dict(LS_COLORS_DEFAULTS)
+        extensions: Dict[str, Fragments] = {}
+        suffixes: Dict[str, Fragments] = {}
+        for field in ls_colors.split(":"):
+            key, separator, code = field.partition("=")
+            if not separator:
+                continue
+            if key.startswith("*"):
+                suffix = key[1:]
+                if not suffix:
+                    continue
+                if suffix.startswith(".") and "." not in suffix[1:]:
+                    extensions[suffix] = _ls_fragments(code)
+                else:
+                    suffixes[suffix] = _ls_fragments(code)
+            elif key in codes and code != "target":
+                # Symlinks colored like their targets are given the usual symlink color
+                codes[key] = code
+        # GNU ls matches extensions without regard to case, unless their case tells them apart
+        for extension, fragments in list(extensions.items()):
+            extensions.setdefault(extension.lower(), fragments)
+        fragments = {type: _ls_fragments(codes[key]) for key, type in LS_COLORS_TYPES.items()}
+        fragments[EntryType.TRUNCATED] = ("", "")
+        # Directories not followed are still directories
+        fragments[EntryType.LOOP] = fragments[EntryType.REPEAT] = fragments[EntryType.DIRECTORY]
+        return cls(fragments, extensions, suffixes)
+
+    def _fragments_for_file(self, name: str) -> Fragments:
+        """
+        Gets the sequences written around the name of a file, by the suffix of its name
+
+        Args:
+            name (str): The file's name
+
+        Returns:
+            Fragments: The sequences written before and after the name
+        """
+        fragments = self.file_fragments
+        matched = 0
+        dot = name.rfind(".")
+        if dot >= 0:
+            extension = name[dot:]
+            found = self.extensions.get(extension) or self.extensions.get(extension.lower())
+            if found is not None:
+                fragments, matched = found, len(extension)
+        if self.suffix_tuple and name.endswith(self.suffix_tuple):
+            for suffix, found in self.suffixes.items():
+                if len(suffix) > matched and name.endswith(suffix):
+                    fragments, matched = found, len(suffix)
+        return fragments
+
+    def colorize(self, name: str, type: EntryType) -> str:
+        """
+        Colorizes a name depending on the entry's type (and, for files, on its suffix)
+
+        Args:
+            name (str): The name to colorize
+            type (EntryType): The entry's type
+
+        Raises:
+            ValueError: Raises if an invalid type is given
+
+        Returns:
+            str: The colorized name
+        """
+        if self.by_name and type is _FILE:
+            opening, closing = self._fragments_for_file(name)
+        else:
+            try:
+                opening, closing = self.fragments[type]
+            except (KeyError, TypeError):
+                raise ValueError(type) from None
+        if not opening:
+            return name
+        return opening + name + closing
+
+
+# The colors used unless LS_COLORS gives others. Files are left uncolored.
+DEFAULT_COLORS = ColorScheme(
+    {
+        type: ("", "") if type == EntryType.FILE else (color, DEFAULT_COLOR)
+        for type, color in COLORMAP.items()
+    }
+)
+
+
+@lru_cache(maxsize=None)
+def color_scheme(ls_colors: Optional[str] = None) -> ColorScheme:
+    """
+    Gets the colors names are printed in. Each specification is only parsed once.
+
+    Args:
+        ls_colors (Optional[str], optional): An LS_COLORS specification. The default colors
+        are used if None or empty. Defaults to None.
+
+    Returns:
+        ColorScheme: The colors
+    """
+    if not ls_colors:
+        return DEFAULT_COLORS
+    return ColorScheme.parse(ls_colors)
+
+
 def type_colorize(text: str, type: EntryType) -> str:
     """
-    Colorizes the text given depending on the type
+    Colorizes the text given depending on the type, in the default colors
 
     Args:
         text (str): The text to colorize
@@ -155,21 +443,59 @@ def type_colorize(text: str, type: EntryType) -> str:
     Returns:
         str: The colorized text
     """
-    if type == EntryType.FILE:
-        # Files have no special colors - so don't even perform any colorization
-        return text
-    color_escape_seq = get_filestring_color(type)
-    return "".join([color_escape_seq, text, DEFAULT_COLOR])
+    return DEFAULT_COLORS.colorize(text, type)
+
+
+def create_name_formatter(
+    settings: Settings, colors: Optional[ColorScheme] = None
+) -> Callable[[str, EntryType], str]:
+    """
+    Generates a function formatting entry names as filestring builders do, for output laid out
+    differently (ex. with sizes)
+
+    Args:
+        settings (Settings): User defined settings, specified at command line
+        colors (Optional[ColorScheme], optional): The colors names are printed in, when
+        colorizing. Defaults to DEFAULT_COLORS.
+
+    Returns:
+        Callable[[str, EntryType], str]: The name formatter function
+    """
+    colorize = bool(settings & Settings.COLORIZE)
+    colorize_name = (colors or DEFAULT_COLORS).colorize
+
+    def format_name(name: str, type: EntryType) -> str:
+        """
+        Formats the name of a directory entry
+
+        Args:
+            name (str): The entry's name
+            type (EntryType): The type of entry
+
+        Returns:
+            str: The formatted name
+        """
+        if colorize:
+            name = colorize_name(name, type)
+        if type in NOT_FOLLOWED_FORMATS:
+            name = NOT_FOLLOWED_FORMATS[type] % name
+        return name
+
+    return format_name
 
 
 def create_filestring_builder(
-    settings: Settings,
+    settings: Settings, stats: Optional[Stats] = None, colors: Optional[ColorScheme] = None
 ) -> Callable[[str, EntryType, EndStateHistory], str]:
     """
     Generates a filestring builder function from user settings
 
     Args:
         settings (Settings): User defined settings, specified at command line
+        stats (Optional[Stats], optional): Records the time spent building prefixes and
+        colorizing, if given. Defaults to None.
+        colors (Optional[ColorScheme], optional): The colors names are printed in, when
+        colorizing. Defaults to DEFAULT_COLORS.
 
     Returns:
         Callable[[str, EntryType, EndStateHistory], str]: The filestring builder function
@@ -178,7 +504,8 @@ def create_filestring_builder(
     colorize = bool(settings & Settings.COLORIZE)
     fancy = bool(settings & Settings.FANCY)
 
-    prefix_function = build_fancy_prefix if fancy else build_prefix
+    prefix_function = _fancy_prefix if fancy else _regular_prefix
+    colorize_name = (colors or DEFAULT_COLORS).colorize
 
     def build_filestring(
         name: str, type: EntryType, history: EndStateHistory
@@ -194,9 +521,40 @@ def create_filestring_builder(
         Returns:
             str: The properly formatted filestring
         """
-        prefix = prefix_function(history)
         if colorize:
-            name = type_colorize(name, type)
-        return "".join((prefix, name))
+            name = colorize_name(name, type)
+        if type in NOT_FOLLOWED_FORMATS:
+            name = NOT_FOLLOWED_FORMATS[type] % name
+        return prefix_function(history) + name
+
+    if stats is None:
+        return build_filestring
+
+    phases = stats.phases
+
+    def build_filestring_timed(
+        name: str, type: EntryType, history: EndStateHistory
+    ) -> str:
+        """
+        Builds a filestring for a directory entry, timing the prefix building and colorization
 
-    return build_filestring
+        Args:
+            path (str): The path to the entry
+            type (EntryType): The type of entry
+            history (EndStateHistory): End state history of this entry's location
+
+        Returns:
+            str: The properly formatted filestring
+        """
+        start = perf_counter()
+        prefix = prefix_function(history)
+        prefixed = perf_counter()
+        if colorize:
+            name = colorize_name(name, type)
+        if type in NOT_FOLLOWED_FORMATS:
+            name = NOT_FOLLOWED_FORMATS[type] % name
+        phases["prefix"] += prefixed - start
+        phases["colorize"] += perf_counter() - prefixed
+        return prefix + name
+
+    return build_filestring_timed
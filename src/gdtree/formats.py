@@ -0,0 +1,100 @@
+"""
+Machine-readable output formats for the generated tree. Every format is written line by line as
+the tree is traversed, so memory use does not grow with the size of the tree.
+"""
+
+from typing import Generator, Iterable, List, Tuple
+from gdtree.end_state_history import EndStateHistory
+from gdtree.utils import EntryType
+
+# The output formats, the first being the default
+OUTPUT_FORMATS = ("tree", "json", "ndjson")
+# Indentation added per level of nested JSON output
+JSON_INDENT = "  "
+
+
+def ndjson_lines(
+    entries: Iterable[Tuple[str, EntryType, EndStateHistory]]
+) -> Generator[str, None, None]:
+    """
+    Generates a JSON object per entry of a traversal, one per line. Each object holds the entry's
+    name, path relative to the start directory (separated by "/"), type, depth and whether it is
+    the last entry of its directory.
+
+    Args:
+        entries (Iterable[Tuple[str, EntryType, EndStateHistory]]): The traversal
+
+    Yields:
+        Generator[str, None, None]: The JSON lines
+    """
+    # Imported here, so that printing trees does not load json
+    from json import dumps
+
+    # Names of the directories above the current entry
+    parents: List[str] = []
+    for name, type, history in entries:
+        depth = len(history)
+        del parents[depth - 1 :]
+        relative = "/".join(parents + [name])
+        yield '{"name": %s, "path": %s, "type": "%s", "depth": %d, "is_last": %s}' % (
+            dumps(name),
+            dumps(relative),
+            type.name,
+            depth,
+            "true" if history[depth - 1] else "false",
+        )
+        if type == EntryType.DIRECTORY:
+            parents.append(name)
+
+
+def json_lines(
+    root_name: str, entries: Iterable[Tuple[str, EntryType, EndStateHistory]]
+) -> Generator[str, None, None]:
+    """
+    Generates a single JSON object nesting the entries of a traversal, a line per entry.
+    Directories hold their entries in a "contents" list, and the start directory also holds the
+    number of directories and files found. A directory is only opened once its first entry
+    arrives, so no more than the open directories are held in memory.
+
+    Args:
+        root_name (str): Name of the start directory
+        entries (Iterable[Tuple[str, EntryType, EndStateHistory]]): The traversal
+
+    Yields:
+        Generator[str, None, None]: The lines of the JSON document
+    """
+    from json import dumps
+
+    num_dir, num_files = 0, 0
+    yield '{"name": %s, "type": "DIRECTORY", "contents": [' % dumps(root_name)
+    # Whether each open directory below the start directory is the last of its own directory
+    open_last: List[bool] = []
+    # The last directory seen, held back until it is known whether it has any entries
+    pending = None
+    for name, type, history in entries:
+        depth = len(history)
+        if pending is not None:
+            pending_line, pending_depth, pending_last = pending
+            pending = None
+            if depth > pending_depth:
+                yield pending_line + ', "contents": ['
+                open_last.append(pending_last)
+            else:
+                yield pending_line + ', "contents": []}' + ("" if pending_last else ",")
+        while len(open_last) >= depth:
+            yield JSON_INDENT * len(open_last) + "]}" + ("" if open_last.pop() else ",")
+        is_last = history[depth - 1]
+        line = '%s{"name": %s, "type": "%s"' % (JSON_INDENT * depth, dumps(name), type.name)
+        if type == EntryType.DIRECTORY:
+            num_dir += 1
+            pending = line, depth, is_last
+            continue
+        if type != EntryType.TRUNCATED:
+            num_files += 1
+        yield line + ("}" if is_last else "},")
+    if pending is not None:
+        pending_line, _, pending_last = pending
+        yield pending_line + ', "contents": []}' + ("" if pending_last else ",")
+    while open_last:
+        yield JSON_INDENT * len(open_last) + "]}" + ("" if open_last.pop() else ",")
+    yield '], "directories": %d, "files": %d}' % (num_dir, num_files)
@@ -0,0 +1,126 @@
+"""
+Output utilities for writing the generated tree
+"""
+
+import sys
+from time import monotonic, perf_counter
+from typing import Iterable, List, Optional, TextIO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gdtree.stats import Stats
+
+# Default number of characters buffered before a chunk is written
+DEFAULT_BUFFER_SIZE = 1 << 16
+# Maximum number of seconds lines may sit in the buffer before a write is forced
+FLUSH_INTERVAL = 0.1
+
+
+class LineWriter:
+    """
+    Writes lines to a stream in large chunks as they are generated. A chunk is written once the
+    buffered text reaches buffer_size characters, or once lines have been buffered for longer than
+    FLUSH_INTERVAL, so that slow traversals still show progress. The stream is flushed after every
+    chunk. Producers about to block (ex. before reading a directory) can write the lines buffered
+    so far with flush().
+    """
+
+    def __init__(
+        self,
+        stream: TextIO = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        stats: Optional["Stats"] = None,
+    ):
+        """
+        Initializes the writer.
+
+        Args:
+            stream (TextIO, optional): The stream to write to. Defaults to sys.stdout.
+            buffer_size (int, optional): Number of characters to buffer before writing a chunk.
+            Defaults to DEFAULT_BUFFER_SIZE.
+            stats (Optional[Stats], optional): Records the time spent writing, if given.
+            Defaults to None.
+        """
+        self.stream = sys.stdout if stream is None else stream
+        self.buffer_size = buffer_size
+        self.stats = stats
+        self.buffer: List[str] = []
+        self.buffered = 0
+        self.last_write = monotonic()
+
+    def write_lines(self, lines: Iterable[str]) -> None:
+        """
+        Writes lines as they are generated, then writes any still buffered
+
+        Args:
+            lines (Iterable[str]): The lines to write, without trailing newlines
+
+        Raises:
+            BrokenPipeError: Raises if the reading end of the stream is closed
+        """
+        buffer = self.buffer
+        buffer_size = self.buffer_size
+        for line in lines:
+            buffer.append(line)
+            self.buffered += len(line) + 1
+            # The clock is read for every line, so that lines generated slowly are never held
+            # back for longer than FLUSH_INTERVAL
+            if self.buffered >= buffer_size or monotonic() - self.last_write >= FLUSH_INTERVAL:
+                self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered lines, if any, as a single chunk
+
+        Raises:
+            BrokenPipeError: Raises if the reading end of the stream is closed
+        """
+        if self.buffer:
+            _write_chunk(self.buffer, self.stream, self.stats)
+            self.buffer.clear()
+            self.buffered = 0
+        self.last_write = monotonic()
+
+
+def write_lines(
+    lines: Iterable[str],
+    stream: TextIO = None,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    stats: Optional["Stats"] = None,
+) -> None:
+    """
+    Writes lines to a stream in large chunks as they are generated, with a LineWriter
+
+    Args:
+        lines (Iterable[str]): The lines to write, without trailing newlines
+        stream (TextIO, optional): The stream to write to. Defaults to sys.stdout.
+        buffer_size (int, optional): Number of characters to buffer before writing a chunk.
+        Defaults to DEFAULT_BUFFER_SIZE.
+        stats (Optional[Stats], optional): Records the time spent writing, if given.
+        Defaults to None.
+
+    Raises:
+        BrokenPipeError: Raises if the reading end of the stream is closed
+    """
+    LineWriter(stream, buffer_size, stats).write_lines(lines)
+
+
+def _write_chunk(
+    buffer: Iterable[str], stream: TextIO, stats: Optional["Stats"] = None
+) -> None:
+    """
+    Writes the buffered lines to the stream as a single chunk and flushes it
+
+    Args:
+        buffer (Iterable[str]): The lines to write
+        stream (TextIO): The stream to write to
+        stats (Optional[Stats], optional): Records the time spent writing, if given.
+        Defaults to None.
+    """
+    if stats is not None:
+        start = perf_counter()
+    stream.write("\n".join(buffer))
+    stream.write("\n")
+    stream.flush()
+    if stats is not None:
+        stats.add_time("write", perf_counter() - start)
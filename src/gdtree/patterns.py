@@ -0,0 +1,382 @@
+"""
+Filtering of directory entries by name: hidden entries, -I/-P glob patterns and .gitignore files
+"""
+
+import re
+from fnmatch import translate
+from os import DirEntry, sep
+from os.path import dirname, exists, join
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+# Separates alternative globs given in a single pattern argument (ex. "*.pyc|__pycache__")
+PATTERN_SEPARATOR = "|"
+# Name of the files holding ignore rules
+GITIGNORE = ".gitignore"
+# Name of the directory git keeps its repository in, which git always ignores
+GIT_DIR = ".git"
+
+
+def compile_globs(patterns: Iterable[str]) -> Optional[Pattern]:
+    """
+    Compiles glob patterns into a single regular expression matching a name against any of them
+
+    Args:
+        patterns (Iterable[str]): The glob patterns. Each may hold several alternatives separated
+        by PATTERN_SEPARATOR.
+
+    Returns:
+        Optional[Pattern]: The compiled expression, or None if no patterns are given
+    """
+    globs = [
+        glob
+        for pattern in patterns
+        for glob in pattern.split(PATTERN_SEPARATOR)
+        if glob
+    ]
+    if not globs:
+        return None
+    return re.compile("|".join(translate(glob) for glob in globs))
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """
+    Translates a gitignore pattern into a regular expression matching paths relative to the
+    directory holding the .gitignore file. The expression holds no capturing groups.
+
+    Args:
+        pattern (str): The pattern, without its negation or trailing slash
+
+    Returns:
+        str: The regular expression
+    """
+    # Patterns without a slash match at any level, others are anchored to the .gitignore
+    if "/" not in pattern:
+        regex = "(?:.*/)?"
+    else:
+        regex = ""
+        pattern = pattern.lstrip("/")
+    index, length = 0, len(pattern)
+    while index < length:
+        char = pattern[index]
+        index += 1
+        if char == "\\" and index < length:
+            regex += re.escape(pattern[index])
+            index += 1
+        elif char == "*":
+            if index < length and pattern[index] == "*":
+                index += 1
+                if index < length and pattern[index] == "/":
+                    # "**/" matches any number of leading directories, including none
+                    index += 1
+                    regex += "(?:.*/)?"
+                else:
+                    regex += ".*"
+            else:
+                regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                members = pattern[index:end].replace("\\", "\\\\")
+                if members.startswith("!"):
+                    members = "^" + members[1:]
+                regex += "[%s]" % members
+                index = end + 1
+        else:
+            regex += re.escape(char)
+    return regex
+
+
+class GitIgnore:
+    """
+    The rules of a single .gitignore file. The rules are compiled into one regular expression
+    per kind of entry, with the rules in reverse order so that the first alternative matching is
+    the last rule matching, which is the one git applies.
+    """
+
+    __slots__ = ("prefix", "_directory_rules", "_file_rules")
+
+    def __init__(self, directory: str, lines: Iterable[str]):
+        """
+        Initializes the rules.
+
+        Args:
+            directory (str): The directory holding the .gitignore file
+            lines (Iterable[str]): The lines of the .gitignore file
+        """
+        self.prefix = directory if directory.endswith(sep) else directory + sep
+        rules = []
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\"):
+                # Escaped leading "!" or "#"
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line:
+                rules.append((_translate_gitignore(line), negated, directory_only))
+        self._directory_rules = self._compile(rules)
+        self._file_rules = self._compile(
+            [rule for rule in rules if not rule[2]]
+        )
+
+    @staticmethod
+    def _compile(
+        rules: List[Tuple[str, bool, bool]]
+    ) -> Optional[Tuple[Pattern, Tuple[bool, ...]]]:
+        """
+        Compiles rules into a single expression
+
+        Args:
+            rules (List[Tuple[str, bool, bool]]): The (regex, negated, directory only) rules, in
+            the order they appear
+
+        Returns:
+            Optional[Tuple[Pattern, Tuple[bool, ...]]]: The expression, with a group per rule,
+            and whether each group's rule is negated. None if there are no rules.
+        """
+        if not rules:
+            return None
+        rules = rules[::-1]
+        expression = re.compile("|".join("(%s)\\Z" % regex for regex, _, _ in rules), re.S)
+        # Groups are numbered from one
+        return expression, (False,) + tuple(negated for _, negated, _ in rules)
+
+    def __bool__(self) -> bool:
+        return self._directory_rules is not None
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Matches an entry against the rules
+
+        Args:
+            path (str): Path to the entry, under the directory holding the .gitignore file
+            is_dir (bool): Whether the entry is a directory
+
+        Returns:
+            Optional[bool]: True if the entry is ignored, False if it is explicitly kept, and None
+            if no rule matches it
+        """
+        compiled = self._directory_rules if is_dir else self._file_rules
+        if compiled is None:
+            return None
+        expression, negated = compiled
+        relative = path[len(self.prefix) :]
+        if sep != "/":
+            relative = relative.replace(sep, "/")
+        found = expression.match(relative)
+        if found is None:
+            return None
+        return not negated[found.lastindex]
+
+
+def _is_dir(entry: DirEntry) -> bool:
+    """
+    Checks whether an entry is a directory, without following symbolic links
+
+    Args:
+        entry (DirEntry): The entry to check
+
+    Returns:
+        bool: Whether the entry is a directory
+    """
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+
+class EntryFilter:
+    """
+    Filters the entries of each directory scanned. All patterns are compiled once, up front, and
+    entries are matched by name before they are sorted or typed. Directories filtered out are
+    never scanned.
+    """
+
+    def __init__(
+        self,
+        show_hidden: bool = False,
+        ignore: Sequence[str] = (),
+        pattern: Sequence[str] = (),
+        gitignore: bool = False,
+    ):
+        """
+        Initializes the filter.
+
+        Args:
+            show_hidden (bool, optional): Keeps entries whose name starts with a dot.
+            Defaults to False.
+            ignore (Sequence[str], optional): Globs of the names of entries to filter out.
+            Defaults to ().
+            pattern (Sequence[str], optional): Globs of the names of files to keep. Files matching
+            none of them are filtered out, while directories are always kept. Keeps all files if
+            empty. Defaults to ().
+            gitignore (bool, optional): Filters out entries ignored by the .gitignore files of the
+            directories scanned, and the .git directory. Defaults to False.
+        """
+        self.show_hidden = show_hidden
+        # Names the filter in the keys of cached listings. Listings filtered by .gitignore files
+        # depend on the .gitignore files of parent directories, so they are not cached.
+        if gitignore:
+            self.cache_key = None
+        else:
+            self.cache_key = repr((show_hidden, tuple(ignore), tuple(pattern)))
+        self.ignore = compile_globs(ignore)
+        self.pattern = compile_globs(pattern)
+        self.gitignore = gitignore
+        # The .gitignore file of each directory holding one, among the directories scanned and
+        # the directories above the first one scanned in its git repository
+        self._gitignores: Dict[str, GitIgnore] = {}
+        self._seeded = False
+
+    def __call__(self, directory: str, entries: Iterable[DirEntry]) -> Iterator[DirEntry]:
+        """
+        Filters the entries of a directory
+
+        Args:
+            directory (str): The directory the entries were listed from
+            entries (Iterable[DirEntry]): The entries of the directory, from os.scandir()
+
+        Returns:
+            Iterator[DirEntry]: The entries kept
+        """
+        if not self.show_hidden:
+            entries = (entry for entry in entries if not entry.name.startswith("."))
+        if self.ignore is not None:
+            ignored = self.ignore.match
+            entries = (entry for entry in entries if ignored(entry.name) is None)
+        if self.gitignore:
+            entries = self._filter_gitignored(directory, entries)
+        if self.pattern is not None:
+            matched = self.pattern.match
+            entries = (
+                entry
+                for entry in entries
+                if matched(entry.name) is not None or _is_dir(entry)
+            )
+        return iter(entries)
+
+    def _filter_gitignored(
+        self, directory: str, entries: Iterable[DirEntry]
+    ) -> Iterator[DirEntry]:
+        """
+        Filters out the entries of a directory ignored by .gitignore files
+
+        Args:
+            directory (str): The directory the entries were listed from
+            entries (Iterable[DirEntry]): The entries of the directory
+
+        Returns:
+            Iterator[DirEntry]: The entries kept, filtered as they are read
+        """
+        if not self._seeded:
+            # The first directory scanned is the top of the traversal
+            self._seeded = True
+            self._seed(directory)
+        # The directory's own .gitignore is opened rather than looked for among its entries, so
+        # that the entries are filtered as they are read
+        own = _read_gitignore(directory)
+        if own:
+            # Parents are always scanned before their children, so the traversal's worker
+            # threads only ever look up entries that are already set
+            self._gitignores[directory] = own
+        else:
+            # A directory scanned again may have lost its .gitignore file since
+            self._gitignores.pop(directory, None)
+        entries = (entry for entry in entries if entry.name != GIT_DIR)
+        gitignores = self._applying(directory)
+        if not gitignores:
+            return entries
+        return (entry for entry in entries if not _is_ignored(entry, gitignores))
+
+    def _seed(self, start: str) -> None:
+        """
+        Reads the .gitignore files of the directories above start, up to the root of the git
+        repository holding it. Nothing is read if start is not inside a repository.
+
+        Args:
+            start (str): The first directory scanned
+        """
+        ancestors = []
+        directory = start
+        while not exists(join(directory, GIT_DIR)):
+            parent = dirname(directory)
+            if parent == directory:
+                return
+            directory = parent
+            ancestors.append(directory)
+        for ancestor in ancestors:
+            gitignore = _read_gitignore(ancestor)
+            if gitignore:
+                self._gitignores[ancestor] = gitignore
+
+    def _applying(self, directory: str) -> Tuple[GitIgnore, ...]:
+        """
+        Gets the .gitignore files applying to the entries of a directory: its own and those of
+        the directories above it
+
+        Args:
+            directory (str): The directory
+
+        Returns:
+            Tuple[GitIgnore, ...]: The .gitignore files, outermost first
+        """
+        gitignores = self._gitignores
+        if not gitignores:
+            return ()
+        found = []
+        while True:
+            gitignore = gitignores.get(directory)
+            if gitignore is not None:
+                found.append(gitignore)
+            parent = dirname(directory)
+            if parent == directory:
+                return tuple(reversed(found))
+            directory = parent
+
+
+def _read_gitignore(directory: str) -> Optional[GitIgnore]:
+    """
+    Reads the .gitignore file of a directory
+
+    Args:
+        directory (str): The directory
+
+    Returns:
+        Optional[GitIgnore]: The rules of the file, or None if it cannot be read
+    """
+    try:
+        with open(join(directory, GITIGNORE), encoding="utf-8", errors="replace") as file:
+            return GitIgnore(directory, file)
+    except OSError:
+        return None
+
+
+def _is_ignored(entry: DirEntry, gitignores: Tuple[GitIgnore, ...]) -> bool:
+    """
+    Checks whether an entry is ignored by .gitignore files. Rules of inner files take precedence
+    over rules of outer files.
+
+    Args:
+        entry (DirEntry): The entry to check
+        gitignores (Tuple[GitIgnore, ...]): The .gitignore files applying, outermost first
+
+    Returns:
+        bool: Whether the entry is ignored
+    """
+    is_dir = _is_dir(entry)
+    for gitignore in reversed(gitignores):
+        ignored = gitignore.match(entry.path, is_dir)
+        if ignored is not None:
+            return ignored
+    return False
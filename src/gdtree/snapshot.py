@@ -0,0 +1,612 @@
+"""
+Compact in-memory snapshot of a directory tree, built from a single traversal and walked as many
+times as needed. Snapshots can be saved to a binary file, and loaded back by mapping the file
+into memory.
+"""
+
+import re
+import sys
+from array import array
+from fnmatch import translate
+from hashlib import blake2b
+from mmap import ACCESS_READ, mmap
+from os import lstat
+from os.path import basename
+from struct import Struct
+from typing import (
+    BinaryIO,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from gdtree.du import du_footer, du_line, entry_size
+from gdtree.end_state_history import EndStateHistory
+from gdtree.filestring import (
+    DEFAULT_COLORS,
+    ColorScheme,
+    build_fancy_prefix,
+    build_prefix,
+    create_filestring_builder,
+    create_name_formatter,
+)
+from gdtree.traverse import reverse_traverse_directory, traverse_directory
+from gdtree.utils import EntryType, ExecutableCheck, Settings
+
+# Parent index of the entries directly below the start directory
+ROOT = -1
+# Marks a missing first entry or next sibling
+_NO_ENTRY = -2
+# Entry types by their codes in the type column
+_ENTRY_TYPES = {type.value: type for type in EntryType}
+# The codes of the type column, as bytes
+_TYPE_CODES = bytes(_ENTRY_TYPES)
+# Size in bytes of the digests of subtrees
+DIGEST_SIZE = 16
+
+# Identifies snapshot files
+SNAPSHOT_MAGIC = b"GDTSNAP\0"
+# Version of the snapshot file format
+SNAPSHOT_VERSION = 2
+# Header of a snapshot file: magic, version, whether the columns are big-endian, number of
+# entries, number of names, length of the start directory's name and size of the start
+# directory itself. The name follows the header, then the columns, each starting on an 8 byte
+# boundary: the offsets of the names in the name data, the sizes, name indices, parents, types
+# and last flags, and the name data itself.
+_HEADER = Struct("<8sIIQQQq")
+# Columns in the order they are stored, by type code
+_COLUMN_TYPECODES = ("Q", "q", "I", "i", "B", "B")
+# Boundary columns start on
+_ALIGNMENT = 8
+
+
+class _NameTable:
+    """
+    The table of unique names of a loaded snapshot. Names are kept encoded, in the memory the
+    snapshot file is mapped to, and only decoded as they are read.
+    """
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: Sequence[int], data: memoryview):
+        """
+        Initializes the table.
+
+        Args:
+            offsets (Sequence[int]): Offset of each name in data, followed by the length of data
+            data (memoryview): The names, encoded as UTF-8 one after another
+        """
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        """
+        Gets the number of names in the table
+
+        Returns:
+            int: The number of names
+        """
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        """
+        Gets a name from the table
+
+        Args:
+            index (int): The name's index
+
+        Returns:
+            str: The name
+        """
+        offsets = self.offsets
+        return str(self.data[offsets[index] : offsets[index + 1]], "utf-8", "surrogateescape")
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over the names in the table
+
+        Yields:
+            Iterator[str]: The names, in order
+        """
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _pad(file: BinaryIO) -> None:
+    """
+    Pads a file with zeros up to the next column boundary
+
+    Args:
+        file (BinaryIO): The file
+    """
+    file.write(b"\0" * (-file.tell() % _ALIGNMENT))
+
+
+class TreeSnapshot:
+    """
+    A directory tree held as parallel columns rather than an object per entry. Entries are
+    numbered in traversal order, and each column holds one value per entry: the index of its
+    name in a table of unique names, the index of its parent directory, its type, whether it is
+    the last entry of its directory, and its size. Names repeated across the tree (ex.
+    __init__.py, package.json) are stored once.
+
+    Walking the snapshot with entries() regenerates the traversal it was built from, so the
+    tree can be rendered, filtered and counted any number of times without scanning it again.
+    """
+
+    __slots__ = (
+        "root_name",
+        "root_size",
+        "names",
+        "name_ids",
+        "parents",
+        "types",
+        "last",
+        "sizes",
+        "_first_children",
+        "_next_siblings",
+    )
+
+    def __init__(self, root_name: str, root_size: int = 0):
+        """
+        Initializes an empty snapshot.
+
+        Args:
+            root_name (str): Name of the start directory
+            root_size (int, optional): Size of the start directory itself. Defaults to 0.
+        """
+        self.root_name = root_name
+        self.root_size = root_size
+        # Table of unique names
+        self.names: List[str] = []
+        self.name_ids = array("I")
+        self.parents = array("i")
+        self.types = array("B")
+        self.last = array("B")
+        self.sizes = array("q")
+        # Links between the entries of each directory, built the first time children() is called
+        self._first_children: Optional[array] = None
+        self._next_siblings: Optional[array] = None
+
+    @classmethod
+    def from_traversal(
+        cls, root_name: str, entries: Iterable[Tuple], root_size: int = 0
+    ) -> "TreeSnapshot":
+        """
+        Builds a snapshot from a traversal
+
+        Args:
+            root_name (str): Name of the start directory
+            entries (Iterable[Tuple]): The (name, type, history) entries of the traversal, or
+            (name, type, history, status) entries to record sizes. Hard linked files are only
+            given their size the first time they are seen.
+            root_size (int, optional): Size of the start directory itself. Defaults to 0.
+
+        Returns:
+            TreeSnapshot: The snapshot
+        """
+        snapshot = cls(root_name, root_size)
+        names = snapshot.names
+        name_ids = snapshot.name_ids
+        parents = snapshot.parents
+        types = snapshot.types
+        last = snapshot.last
+        sizes = snapshot.sizes
+        interned: Dict[str, int] = {}
+        linked: Set[Tuple[int, int]] = set()
+        # Indices of the directories above the current entry
+        directories: List[int] = []
+        for index, entry in enumerate(entries):
+            name, type, history = entry[0], entry[1], entry[2]
+            depth = len(history)
+            del directories[depth - 1 :]
+            name_id = interned.get(name)
+            if name_id is None:
+                name_id = interned[name] = len(names)
+                names.append(name)
+            name_ids.append(name_id)
+            parents.append(directories[-1] if directories else ROOT)
+            types.append(type.value)
+            last.append(history[depth - 1])
+            sizes.append(entry_size(entry[3], linked) if len(entry) > 3 else 0)
+            if type == EntryType.DIRECTORY:
+                directories.append(index)
+        return snapshot
+
+    @classmethod
+    def scan(
+        cls,
+        start_dir: str,
+        reverse: bool = False,
+        with_sizes: bool = False,
+        **kwargs,
+    ) -> "TreeSnapshot":
+        """
+        Builds a snapshot by traversing a directory
+
+        Args:
+            start_dir (str): Absolute path to the directory to traverse
+            reverse (bool, optional): Traverses in reverse lexicographical order.
+            Defaults to False.
+            with_sizes (bool, optional): Records the size of every entry. Defaults to False.
+            **kwargs: Passed on to traverse_directory (ex. jobs, max_depth, entry_filter)
+
+        Returns:
+            TreeSnapshot: The snapshot
+        """
+        traverse = reverse_traverse_directory if reverse else traverse_directory
+        kwargs.setdefault("executable_check", ExecutableCheck.MODE)
+        root_size = 0
+        if with_sizes:
+            try:
+                root_size = lstat(start_dir).st_size
+            except OSError:
+                pass
+        entries = traverse(start_dir, with_status=with_sizes, **kwargs)
+        return cls.from_traversal(basename(start_dir), entries, root_size)
+
+    @classmethod
+    def load(cls, path: str) -> "TreeSnapshot":
+        """
+        Loads a snapshot saved to a file. The file is mapped into memory and its columns are
+        read in place, so loading takes the same time however large the snapshot is, and only
+        the parts of the file walked are ever read from disk.
+
+        Args:
+            path (str): Path to the snapshot file
+
+        Raises:
+            OSError: Raises if the file cannot be read
+            ValueError: Raises if the file is not a snapshot, or is truncated or corrupt
+
+        Returns:
+            TreeSnapshot: The snapshot
+        """
+        with open(path, "rb") as file:
+            try:
+                data = mmap(file.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                data = b""
+        view = memoryview(data)
+        if len(view) < _HEADER.size:
+            raise ValueError("%s is not a snapshot" % path)
+        header = _HEADER.unpack_from(view)
+        magic, version, big_endian, length, name_count, root_length, root_size = header
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("%s is not a snapshot" % path)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("%s is a snapshot of unsupported version %d" % (path, version))
+        offset = _HEADER.size + root_length
+        root_name = str(view[_HEADER.size : offset], "utf-8", "surrogateescape")
+        # Columns saved on a machine of the other byte order are copied, and swapped
+        swapped = bool(big_endian) != (sys.byteorder == "big")
+        columns = []
+        for typecode, count in zip(_COLUMN_TYPECODES, (name_count + 1,) + (length,) * 5):
+            offset += -offset % _ALIGNMENT
+            end = offset + count * array(typecode).itemsize
+            if end > len(view):
+                raise ValueError("%s is a truncated snapshot" % path)
+            if swapped:
+                column = array(typecode, view[offset:end].tobytes())
+                column.byteswap()
+            else:
+                column = view[offset:end].cast(typecode)
+            columns.append(column)
+            offset = end
+        offsets = columns[0]
+        if offset + offsets[-1] > len(view):
+            raise ValueError("%s is a truncated snapshot" % path)
+        snapshot = cls(root_name, root_size)
+        snapshot.names = _NameTable(offsets, view[offset : offset + offsets[-1]])
+        (
+            snapshot.sizes,
+            snapshot.name_ids,
+            snapshot.parents,
+            snapshot.types,
+            snapshot.last,
+        ) = columns[1:]
+        snapshot._check(path)
+        return snapshot
+
+    def _check(self, path: str) -> None:
+        """
+        Checks that the columns of a loaded snapshot hold a tree in traversal order, so that
+        walking it cannot fail
+
+        Args:
+            path (str): Path to the snapshot file, for error messages
+
+        Raises:
+            ValueError: Raises if an entry has an unknown type or name, or is not placed right
+            below its parent directory
+        """
+        types = bytes(self.types)
+        if types.translate(None, _TYPE_CODES):
+            raise ValueError("%s is a corrupt snapshot: unknown entry type" % path)
+        if self.name_ids and max(self.name_ids) >= len(self.names):
+            raise ValueError("%s is a corrupt snapshot: unknown name" % path)
+        directory = EntryType.DIRECTORY.value
+        # The directories above the current entry, as the walks keep them
+        above = [ROOT]
+        for index, parent in enumerate(self.parents):
+            while above[-1] != parent:
+                above.pop()
+                if not above:
+                    raise ValueError(
+                        "%s is a corrupt snapshot: entry %d is not below its parent" % (path, index)
+                    )
+            if types[index] == directory:
+                above.append(index)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the snapshot to a file, which load() maps back into memory
+
+        Args:
+            path (str): Path to the snapshot file
+
+        Raises:
+            OSError: Raises if the file cannot be written
+        """
+        encoded = [name.encode("utf-8", "surrogateescape") for name in self.names]
+        offsets = array("Q", [0])
+        total = 0
+        for name in encoded:
+            total += len(name)
+            offsets.append(total)
+        root_name = self.root_name.encode("utf-8", "surrogateescape")
+        with open(path, "wb") as file:
+            file.write(
+                _HEADER.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    sys.byteorder == "big",
+                    len(self.types),
+                    len(encoded),
+                    len(root_name),
+                    self.root_size,
+                )
+            )
+            file.write(root_name)
+            for column in (offsets, self.sizes, self.name_ids, self.parents, self.types, self.last):
+                _pad(file)
+                file.write(column)
+            file.write(b"".join(encoded))
+
+    def __len__(self) -> int:
+        """
+        Gets the number of entries in the snapshot, not counting the start directory
+
+        Returns:
+            int: The number of entries
+        """
+        return len(self.types)
+
+    def name(self, index: int) -> str:
+        """
+        Gets the name of an entry
+
+        Args:
+            index (int): The entry
+
+        Returns:
+            str: The entry's name
+        """
+        return self.names[self.name_ids[index]]
+
+    def type(self, index: int) -> EntryType:
+        """
+        Gets the type of an entry
+
+        Args:
+            index (int): The entry
+
+        Returns:
+            EntryType: The entry's type
+        """
+        return _ENTRY_TYPES[self.types[index]]
+
+    def path(self, index: int) -> str:
+        """
+        Gets the path of an entry relative to the start directory, separated by "/"
+
+        Args:
+            index (int): The entry
+
+        Returns:
+            str: The entry's relative path
+        """
+        parts = []
+        while index != ROOT:
+            parts.append(self.names[self.name_ids[index]])
+            index = self.parents[index]
+        return "/".join(reversed(parts))
+
+    def children(self, index: int = ROOT) -> Iterator[int]:
+        """
+        Gets the entries directly below a directory, in traversal order
+
+        Args:
+            index (int, optional): The directory. Defaults to ROOT, the start directory.
+
+        Yields:
+            Iterator[int]: The indices of the directory's entries
+        """
+        if self._next_siblings is None:
+            self._link_siblings()
+        next_siblings = self._next_siblings
+        child = self._first_children[index + 1]
+        while child != _NO_ENTRY:
+            yield child
+            child = next_siblings[child]
+
+    def _link_siblings(self) -> None:
+        """
+        Links the entries of every directory in a single pass, so that children() only visits
+        the entries it yields
+        """
+        parents = self.parents
+        # The first entry of each directory, offset by one so that ROOT's is first
+        first_children = array("i", [_NO_ENTRY]) * (len(parents) + 1)
+        next_siblings = array("i", [_NO_ENTRY]) * len(parents)
+        # The entry of each directory seen last so far, offset like first_children
+        previous = array("i", [_NO_ENTRY]) * (len(parents) + 1)
+        for index, parent in enumerate(parents):
+            sibling = previous[parent + 1]
+            if sibling == _NO_ENTRY:
+                first_children[parent + 1] = index
+            else:
+                next_siblings[sibling] = index
+            previous[parent + 1] = index
+        self._first_children = first_children
+        self._next_siblings = next_siblings
+
+    def entries(self) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
+        """
+        Regenerates the traversal the snapshot was built from. The entries of a directory
+        share their histories, which are only created once per directory, so the histories
+        yielded must not be modified.
+
+        Yields:
+            Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the names,
+            types, and end state histories of the entries
+        """
+        names = self.names
+        parents = self.parents
+        root = EndStateHistory()
+        # (index, histories of its entries, by whether they are last) of the directories above
+        # the current entry
+        stack: List[Tuple[int, Tuple[EndStateHistory, EndStateHistory]]] = [
+            (ROOT, (root.child(False), root.child(True)))
+        ]
+        directory = EntryType.DIRECTORY
+        columns = zip(self.name_ids, self.types, self.last)
+        for index, (name_id, type, last) in enumerate(columns):
+            parent = parents[index]
+            while stack[-1][0] != parent:
+                stack.pop()
+            history = stack[-1][1][last]
+            entry_type = _ENTRY_TYPES[type]
+            if entry_type is directory:
+                stack.append((index, (history.child(False), history.child(True))))
+            yield names[name_id], entry_type, history
+
+    def count(self) -> Tuple[int, int]:
+        """
+        Counts the directories and files in the snapshot
+
+        Returns:
+            Tuple[int, int]: The number of directories and of files
+        """
+        # Loaded snapshots hold their columns as memoryviews, which cannot be counted
+        types = bytes(self.types)
+        directories = types.count(EntryType.DIRECTORY.value)
+        truncated = types.count(EntryType.TRUNCATED.value)
+        return directories, len(types) - directories - truncated
+
+    def find(self, pattern: str) -> List[int]:
+        """
+        Finds the entries whose name matches a glob pattern
+
+        Args:
+            pattern (str): The glob pattern
+
+        Returns:
+            List[int]: The indices of the matching entries, in traversal order
+        """
+        match = re.compile(translate(pattern)).match
+        matching = array("B", (match(name) is not None for name in self.names))
+        return [index for index, name_id in enumerate(self.name_ids) if matching[name_id]]
+
+    def subtree_sizes(self) -> array:
+        """
+        Totals the sizes of every directory's subtree, including the directory itself
+
+        Returns:
+            array: The total size of each entry, indexed like the entries. Entries other than
+            directories have their own size.
+        """
+        totals = array("q", self.sizes)
+        parents = self.parents
+        # Children always come after their parents, so a reverse pass totals every subtree
+        for index in range(len(totals) - 1, -1, -1):
+            parent = parents[index]
+            if parent != ROOT:
+                totals[parent] += totals[index]
+        return totals
+
+    def digests(self) -> List[bytes]:
+        """
+        Digests every entry's subtree: its name, type and size and, for a directory, the
+        digests of its entries. Entries with equal digests have identical subtrees, so
+        comparisons can skip them.
+
+        Returns:
+            List[bytes]: The digest of each entry, indexed like the entries
+        """
+        names = self.names
+        name_ids = self.name_ids
+        parents = self.parents
+        types = self.types
+        sizes = self.sizes
+        digests: List[bytes] = [b""] * len(types)
+        # Digests of each directory's entries, gathered in reverse order
+        below: Dict[int, List[bytes]] = {}
+        # Children always come after their parents, so a reverse pass digests every subtree
+        for index in range(len(types) - 1, -1, -1):
+            digest = blake2b(digest_size=DIGEST_SIZE)
+            digest.update(names[name_ids[index]].encode("utf-8", "surrogateescape"))
+            digest.update(b"\0%d\0%d\0" % (types[index], sizes[index]))
+            for child in reversed(below.pop(index, ())):
+                digest.update(child)
+            digests[index] = digest.digest()
+            parent = parents[index]
+            if parent != ROOT:
+                below.setdefault(parent, []).append(digests[index])
+        return digests
+
+    def render(
+        self, settings: Settings, colors: Optional[ColorScheme] = None
+    ) -> Generator[str, None, None]:
+        """
+        Renders the snapshot as a pretty-printed tree, as generate_tree does. With Settings.DU
+        set, every entry is printed with its size and every directory with the total size of
+        its subtree, as in disk usage mode. Sizes are only held by snapshots taken with sizes.
+
+        Args:
+            settings (Settings): Print settings
+            colors (Optional[ColorScheme], optional): The colors names are printed in, when
+            colorizing. Defaults to DEFAULT_COLORS.
+
+        Yields:
+            Generator[str, None, None]: Generator of pretty-printed tree strings.
+        """
+        colors = colors or DEFAULT_COLORS
+        if settings & Settings.COLORIZE:
+            yield colors.colorize(self.root_name, EntryType.DIRECTORY)
+        else:
+            yield self.root_name
+        if not settings & Settings.DU:
+            filestring_builder = create_filestring_builder(settings, colors=colors)
+            for name, type, history in self.entries():
+                yield filestring_builder(name, type, history)
+            yield "%d directories, %d files" % self.count()
+            return
+
+        prefix_function = build_fancy_prefix if settings & Settings.FANCY else build_prefix
+        format_name = create_name_formatter(settings, colors)
+        totals = self.subtree_sizes()
+        truncated = EntryType.TRUNCATED
+        for index, (name, type, history) in enumerate(self.entries()):
+            if type is truncated:
+                yield prefix_function(history) + format_name(name, type)
+            else:
+                yield du_line(prefix_function(history), format_name(name, type), totals[index])
+        total = self.root_size + sum(totals[index] for index in self.children())
+        yield du_footer(total, *self.count())
@@ -0,0 +1,199 @@
+"""
+Compact directory listings for huge directories. Only a (name, type) record is kept per entry,
+and past a memory threshold the records are sorted on disk with an external merge sort.
+"""
+
+from heapq import merge
+from os import lstat, stat_result
+from os.path import join
+from struct import Struct
+from sys import getsizeof
+from tempfile import TemporaryFile
+from typing import BinaryIO, Generator, List, Optional, Tuple
+from gdtree.utils import EntryType
+
+# Estimated memory held per record besides its name: the record tuple and the list's reference
+RECORD_OVERHEAD = getsizeof((None, None)) + 8
+# Header of a record in a run on disk: the type's value and the length of the encoded name
+RECORD_HEADER = Struct("<BI")
+# Encoding of the names in runs on disk. Undecodable names round trip through it unchanged.
+ENCODING = "utf-8"
+ENCODING_ERRORS = "surrogateescape"
+# Entry types by their values
+_ENTRY_TYPES = {type.value: type for type in EntryType}
+
+
+def _lstat(path: str) -> Optional[stat_result]:
+    """
+    Gets the status of an entry, without following symbolic links
+
+    Args:
+        path (str): Path to the entry
+
+    Returns:
+        Optional[stat_result]: The entry's status, or None if it cannot be taken
+    """
+    try:
+        return lstat(path)
+    except OSError:
+        return None
+
+
+def _read_run(run: BinaryIO) -> Generator[Tuple[str, EntryType], None, None]:
+    """
+    Reads the records of a run back from disk, closing the run once they are all read
+
+    Args:
+        run (BinaryIO): The run
+
+    Yields:
+        Generator[Tuple[str, EntryType], None, None]: The records, in the order they were written
+    """
+    header_size = RECORD_HEADER.size
+    unpack = RECORD_HEADER.unpack
+    try:
+        run.seek(0)
+        while True:
+            header = run.read(header_size)
+            if not header:
+                return
+            value, length = unpack(header)
+            yield run.read(length).decode(ENCODING, ENCODING_ERRORS), _ENTRY_TYPES[value]
+    finally:
+        run.close()
+
+
+class CompactListing:
+    """
+    The listing of a directory held as (name, type) records, without the entries' paths and
+    os.DirEntry objects. Records are added as the directory is read. Once their estimated size
+    passes spill_size, they are sorted and written to disk as a run, and the runs are merged
+    when the listing is iterated, so memory stays bounded however large the directory is.
+
+    Iterating the listing yields the same (name, path, type, status) records as a list listing,
+    building each path (and taking each status) as it goes.
+    """
+
+    __slots__ = (
+        "path",
+        "reverse",
+        "spill_size",
+        "keep_status",
+        "records",
+        "size",
+        "runs",
+        "length",
+        "files",
+    )
+
+    def __init__(self, path: str, reverse: bool, spill_size: int, keep_status: bool = False):
+        """
+        Initializes an empty listing.
+
+        Args:
+            path (str): The directory listed
+            reverse (bool): Sorts the records in reverse lexicographical order
+            spill_size (int): Estimated size in bytes past which records are sorted on disk
+            keep_status (bool, optional): Takes the lstat() result of every entry as it is
+            iterated. Defaults to False.
+        """
+        self.path = path
+        self.reverse = reverse
+        self.spill_size = spill_size
+        self.keep_status = keep_status
+        self.records: List[Tuple[str, EntryType]] = []
+        # Estimated size of the records held in memory
+        self.size = 0
+        # Sorted runs of records spilled to disk
+        self.runs: List[BinaryIO] = []
+        self.length = 0
+        # Number of entries other than directories and symlinks
+        self.files = 0
+
+    def add(self, name: str, type: EntryType) -> None:
+        """
+        Adds an entry to the listing
+
+        Args:
+            name (str): The entry's name
+            type (EntryType): The entry's type
+        """
+        self.records.append((name, type))
+        self.length += 1
+        if type == EntryType.FILE or type == EntryType.EXECUTABLE:
+            self.files += 1
+        self.size += getsizeof(name) + RECORD_OVERHEAD
+        if self.size > self.spill_size:
+            self._spill()
+
+    def finish(self) -> None:
+        """
+        Sorts the listing once every entry has been added. If any records were spilled, the rest
+        are spilled too, so that only the runs' buffers stay in memory.
+        """
+        if self.runs:
+            if self.records:
+                self._spill()
+        else:
+            self.records.sort(reverse=self.reverse)
+
+    def directories(self) -> List[str]:
+        """
+        Gets the paths of the directories in the listing, for prefetching. Spilled listings are
+        not read for them, so give none.
+
+        Returns:
+            List[str]: The paths of the directories, in order
+        """
+        path = self.path
+        return [join(path, name) for name, type in self.records if type == EntryType.DIRECTORY]
+
+    def close(self) -> None:
+        """
+        Removes the runs spilled to disk
+        """
+        for run in self.runs:
+            run.close()
+        self.runs.clear()
+
+    def __len__(self) -> int:
+        """
+        Gets the number of entries in the listing
+
+        Returns:
+            int: The number of entries
+        """
+        return self.length
+
+    def __iter__(self) -> Generator[Tuple[str, str, EntryType, Optional[stat_result]], None, None]:
+        """
+        Iterates the listing in order. A spilled listing can only be iterated once.
+
+        Yields:
+            Generator[Tuple[str, str, EntryType, Optional[stat_result]], None, None]: The (name,
+            path, type, status) records of the entries
+        """
+        if self.runs:
+            records = merge(*(_read_run(run) for run in self.runs), reverse=self.reverse)
+        else:
+            records = iter(self.records)
+        path = self.path
+        keep_status = self.keep_status
+        for name, type in records:
+            entry_path = join(path, name)
+            yield name, entry_path, type, _lstat(entry_path) if keep_status else None
+
+    def _spill(self) -> None:
+        """
+        Sorts the records held in memory and writes them to disk as a run
+        """
+        self.records.sort(reverse=self.reverse)
+        run = TemporaryFile()
+        pack = RECORD_HEADER.pack
+        for name, type in self.records:
+            encoded = name.encode(ENCODING, ENCODING_ERRORS)
+            run.write(pack(type.value, len(encoded)))
+            run.write(encoded)
+        self.runs.append(run)
+        self.records = []
+        self.size = 0
@@ -0,0 +1,135 @@
+"""
+Instrumentation of the phases of tree generation, reported by --stats
+"""
+
+import sys
+from heapq import heappush, heappushpop
+from time import perf_counter
+from typing import Dict, List, Optional, TextIO, Tuple
+
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    # Not available on Windows - peak memory is not reported there
+    getrusage = None
+
+# The phases of tree generation that are timed, in the order they are reported
+PHASES = ("scandir", "sort", "get_type", "prefix", "colorize", "write")
+# The system calls that are counted, in the order they are reported
+SYSCALLS = ("scandir", "stat", "access")
+# Number of slowest directories reported
+SLOWEST_DIRECTORIES = 10
+
+
+class Stats:
+    """
+    Collects the time spent in each phase of tree generation, the system calls made, and the
+    slowest directories scanned. Directories may be scanned on several threads, so updates from
+    the traversal are locked.
+    """
+
+    def __init__(self):
+        """
+        Initializes the statistics, starting the wall clock.
+        """
+        self.start = perf_counter()
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.syscalls: Dict[str, int] = dict.fromkeys(SYSCALLS, 0)
+        self.entries = 0
+        self.directories = 0
+        # Min-heap of the (scan time, path) of the slowest directories
+        self.slowest: List[Tuple[float, str]] = []
+        # Imported here, as statistics are only collected with --stats
+        from threading import Lock
+
+        self.lock = Lock()
+
+    def add_directory(
+        self,
+        path: str,
+        entries: int,
+        phases: Dict[str, float],
+        syscalls: Dict[str, int],
+    ) -> None:
+        """
+        Records the scan of a directory
+
+        Args:
+            path (str): The directory scanned
+            entries (int): Number of entries listed
+            phases (Dict[str, float]): Seconds spent in each phase of the scan
+            syscalls (Dict[str, int]): Number of each system call made by the scan
+        """
+        elapsed = sum(phases.values())
+        with self.lock:
+            self.directories += 1
+            self.entries += entries
+            for phase, seconds in phases.items():
+                self.phases[phase] += seconds
+            for syscall, count in syscalls.items():
+                self.syscalls[syscall] += count
+            if len(self.slowest) < SLOWEST_DIRECTORIES:
+                heappush(self.slowest, (elapsed, path))
+            else:
+                heappushpop(self.slowest, (elapsed, path))
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """
+        Adds time spent in a phase outside of the traversal
+
+        Args:
+            phase (str): The phase, one of PHASES
+            seconds (float): Seconds spent in the phase
+        """
+        self.phases[phase] += seconds
+
+    def report(self, stream: TextIO = None) -> None:
+        """
+        Writes a report of the statistics collected
+
+        Args:
+            stream (TextIO, optional): The stream to write to. Defaults to sys.stderr.
+        """
+        if stream is None:
+            stream = sys.stderr
+        wall = perf_counter() - self.start
+        lines = [
+            "wall time      %10.3fs" % wall,
+            "directories    %10d" % self.directories,
+            "entries        %10d  (%.0f entries/s)"
+            % (self.entries, self.entries / wall if wall > 0 else 0),
+            "phase times (scan phases are summed over worker threads):",
+        ]
+        for phase in PHASES:
+            seconds = self.phases[phase]
+            lines.append(
+                "  %-12s %10.3fs  %5.1f%%"
+                % (phase, seconds, 100 * seconds / wall if wall > 0 else 0)
+            )
+        lines.append("system calls:")
+        for syscall in SYSCALLS:
+            lines.append("  %-12s %10d" % (syscall, self.syscalls[syscall]))
+        if self.slowest:
+            lines.append("slowest directories:")
+            for elapsed, path in sorted(self.slowest, reverse=True):
+                lines.append("  %10.6fs  %s" % (elapsed, path))
+        peak = peak_memory()
+        if peak is not None:
+            lines.append("peak memory    %10.1f MiB" % (peak / (1 << 20)))
+        stream.write("\n".join(lines))
+        stream.write("\n")
+        stream.flush()
+
+
+def peak_memory() -> Optional[int]:
+    """
+    Gets the peak resident set size of this process
+
+    Returns:
+        Optional[int]: The peak resident set size in bytes, or None if it cannot be measured
+    """
+    if getrusage is None:
+        return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -3,10 +3,60 @@ Directory tree traversal utilities
 """
 
 
-from os import scandir, DirEntry
+import sys
+from collections import deque
+from heapq import nlargest, nsmallest
+from os import scandir, stat, stat_result, DirEntry
+from stat import S_ISLNK
+from os.path import join
+from time import perf_counter
 from gdtree.end_state_history import EndStateHistory
-from gdtree.utils import EntryType, MAX_DEPTH, get_type
-from typing import Generator, Iterator, Tuple
+from gdtree.stats import Stats
+from gdtree.utils import EntryType, ExecutableCheck, get_type
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+    from gdtree.cache import ScanCache
+    from gdtree.patterns import EntryFilter
+    from gdtree.spill import CompactListing
+
+# A directory entry's (name, path, type, status) record. The status is the entry's lstat()
+# result if the scanner keeps it, and None otherwise.
+Record = Tuple[str, str, EntryType, Optional[stat_result]]
+# A directory listing, as records in traversal order
+Listing = List[Record]
+# A listing as returned by a scan: a list, a CompactListing in low memory mode, or an iterator
+# reading the directory as it is walked in unsorted mode
+AnyListing = Union[Listing, "CompactListing", Iterator[Record]]
+
+# Name given to the entry standing in for the entries left out of a listing
+TRUNCATED_FORMAT = "... %d more"
+
+# Maximum number of directories read while they are walked (unsorted) held open at once. Deeper
+# directories are read whole before the traversal descends below them.
+MAX_OPEN_STREAMS = 64
+# Number of listings each worker may hold ahead of the traversal
+PREFETCH_PER_WORKER = 4
+# Smoothing factor for the moving average of directory scan latency
+LATENCY_SMOOTHING = 0.2
+# Scan latencies (in seconds) below which a worker is released, and above
+# which a worker is added
+FAST_SCAN_LATENCY = 0.0002
+SLOW_SCAN_LATENCY = 0.002
 
 
 def filter_prefix(
@@ -35,82 +85,1098 @@ def construct_from_history(history: EndStateHistory, is_end: bool) -> EndStateHi
     Returns:
         EndStateHistory: The new end state history
     """
-    new_history = EndStateHistory()
-    new_history.extend(history)
-    new_history.append(is_end)
-    return new_history
+    return history.child(is_end)
 
 
-def _traverse(
-    path: str, history: EndStateHistory, reverse: bool
-) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
+def _select_first(
+    entries: Iterator[DirEntry], limit: int, reverse: bool
+) -> Tuple[List[DirEntry], int]:
     """
-    Traverses the directory starting at path
+    Selects the first entries of a directory in lexicographical order, using a bounded heap so
+    that only the selected entries are kept and sorted
 
     Args:
-        path (str): The top level directory to traverse downward from
-        history (EndStateHistory): The end state traversal history up to this point
-        reverse (bool): Reverses the order of traversal (lexicographical order)
+        entries (Iterator[DirEntry]): The directory's entries
+        limit (int): Maximum number of entries to select
+        reverse (bool): Selects the last entries in lexicographical order, in reverse order
 
-    Yields:
-        Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the paths,
-        types, and end state histories of the entries traversed
+    Returns:
+        Tuple[List[DirEntry], int]: The selected entries, in order, and the number of entries
+        left out
+    """
+    seen = 0
+
+    def counted() -> Iterator[DirEntry]:
+        nonlocal seen
+        for entry in entries:
+            seen += 1
+            yield entry
+
+    select = nlargest if reverse else nsmallest
+    selected = select(limit, counted(), key=lambda x: x.name)
+    return selected, seen - len(selected)
+
+
+def _lstat(entry: DirEntry) -> Optional[stat_result]:
+    """
+    Gets the status of an entry, without following symbolic links. The result is cached on the
+    entry, so an executability check and this share one system call.
+
+    Args:
+        entry (DirEntry): The entry
+
+    Returns:
+        Optional[stat_result]: The entry's status, or None if it cannot be taken
     """
     try:
+        return entry.stat(follow_symlinks=False)
+    except OSError:
+        return None
+
+
+class RetainedListings:
+    """
+    Directory listings kept from one traversal of a tree to the next, so that a traversal only
+    scans the directories invalidated since the last one. State the entry filter builds up while
+    scanning (ex. the .gitignore files read) is kept with the listings.
+    """
+
+    def __init__(self):
+        """
+        Initializes the retained listings, with none kept yet.
+        """
+        self.listings: Dict[str, Listing] = {}
+        # The entry filter the listings were made with, set by the first traversal
+        self.entry_filter: Optional["EntryFilter"] = None
+
+    def invalidate(self, path: str, subtree: bool = False) -> None:
+        """
+        Drops the listing of a directory, so that the next traversal scans it again
+
+        Args:
+            path (str): The directory
+            subtree (bool, optional): Also drops the listings of every directory below it.
+            Defaults to False.
+        """
+        self.listings.pop(path, None)
+        if subtree:
+            prefix = join(path, "")
+            for listed in [listed for listed in self.listings if listed.startswith(prefix)]:
+                del self.listings[listed]
+
+    def prune(self, start_dir: str) -> Set[str]:
+        """
+        Drops the listings of directories the last traversal of a tree did not reach (ex.
+        directories since removed)
+
+        Args:
+            start_dir (str): The directory the tree was traversed from
+
+        Returns:
+            Set[str]: The directories whose listings are kept
+        """
+        listings = self.listings
+        reached: Set[str] = set()
+        pending = [start_dir] if start_dir in listings else []
+        while pending:
+            path = pending.pop()
+            reached.add(path)
+            for _, entry_path, type, _ in listings[path]:
+                if type == EntryType.DIRECTORY and entry_path in listings:
+                    pending.append(entry_path)
+        self.listings = {path: listings[path] for path in reached}
+        return reached
+
+
+class Scanner:
+    """
+    Lists directories for the traversal. Entries are filtered (hidden entries by default), and the
+    remaining entries are sorted and typed.
+    """
+
+    def __init__(
+        self,
+        reverse: bool,
+        executable_check: ExecutableCheck,
+        stats: Optional[Stats] = None,
+        entry_limit: Optional[int] = None,
+        entry_filter: Optional["EntryFilter"] = None,
+        cache: Optional["ScanCache"] = None,
+        keep_status: bool = False,
+        spill_size: Optional[int] = None,
+        unsorted: bool = False,
+        retained: Optional[RetainedListings] = None,
+        follow_symlinks: bool = False,
+        one_file_system: bool = False,
+        before_scan: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initializes the scanner.
+
+        Args:
+            reverse (bool): Reverses the order of listings (lexicographical order)
+            executable_check (ExecutableCheck): How executables are told apart from other files
+            stats (Optional[Stats], optional): Records the time spent in each phase of every
+            scan, if given. Defaults to None.
+            entry_limit (Optional[int], optional): Maximum number of entries listed per
+            directory. Unbounded if None. Defaults to None.
+            entry_filter (Optional[EntryFilter], optional): Filters the entries of each
+            directory. Only hidden entries are filtered out if None. Defaults to None.
+            cache (Optional[ScanCache], optional): Reuses the listings of directories left
+            unchanged since an earlier scan, if given. Defaults to None.
+            keep_status (bool, optional): Keeps the lstat() result of every entry in the
+            listings. Cached listings hold none, so the cache is not used. Defaults to False.
+            spill_size (Optional[int], optional): Lists directories as CompactListings, which
+            sort on disk past this many bytes, unless an entry limit already bounds them. The
+            cache is not used. Lists directories as lists if None. Defaults to None.
+            unsorted (bool, optional): Lists directories in the order os.scandir() yields
+            their entries, as iterators reading the directories as they are walked. The cache
+            is not used. Defaults to False.
+            retained (Optional[RetainedListings], optional): Reuses the listings retained from
+            an earlier scan, and retains the listings of the directories scanned, if given.
+            Directories are listed as lists, so neither spill_size nor unsorted applies.
+            Defaults to None.
+            follow_symlinks (bool, optional): Types symbolic links to directories as
+            directories, so that they are descended into. Defaults to False.
+            one_file_system (bool, optional): Keeps the lstat() result of the directories in
+            the listings, which tells the file system each is on. Defaults to False.
+            before_scan (Optional[Callable[[], None]], optional): Called on the traversing
+            thread before it waits for a directory to be listed, if given. Defaults to None.
+        """
+        self.reverse = reverse
+        self.executable_check = executable_check
+        self.stats = stats
+        self.entry_limit = entry_limit
+        self.entry_filter = entry_filter
+        self.keep_status = keep_status
+        self.retained = retained
+        self.follow_symlinks = follow_symlinks
+        self.one_file_system = one_file_system
+        self.before_scan = before_scan
+        if retained is not None:
+            spill_size, unsorted = None, False
+        self.spill_size = spill_size if entry_limit is None else None
+        self.unsorted = unsorted
+        self.cache = None
+        if cache is not None and not keep_status and self.spill_size is None and not unsorted:
+            filter_key = "" if entry_filter is None else entry_filter.cache_key
+            if filter_key is not None:
+                self.cache = cache
+                # Listings made with other options are cached separately
+                self.cache_variant = "%d:%d:%s:%s" % (
+                    reverse,
+                    executable_check.value,
+                    entry_limit,
+                    filter_key,
+                )
+                if follow_symlinks:
+                    self.cache_variant += ":follow"
+
+    def scan(self, path: str) -> AnyListing:
+        """
+        Lists the directory at path, from the cache if the directory is unchanged since it was
+        cached
+
+        Args:
+            path (str): The directory to list
+
+        Raises:
+            OSError: Raises if the directory cannot be read
+
+        Returns:
+            AnyListing: The (name, path, type, status) records of the directory's entries
+        """
+        if self.retained is not None:
+            listings = self.retained.listings
+            listing = listings.get(path)
+            if listing is None:
+                listing = listings[path] = self._scan(path)
+            return listing
+        return self._scan(path)
+
+    def _scan(self, path: str) -> AnyListing:
+        """
+        Lists the directory at path in the way the scanner was set up for
+
+        Args:
+            path (str): The directory to list
+
+        Raises:
+            OSError: Raises if the directory cannot be read
+
+        Returns:
+            AnyListing: The (name, path, type, status) records of the directory's entries
+        """
+        if self.unsorted:
+            # Opened here, so that a directory which cannot be read raises now
+            return self._stream(path, scandir(path))
+        if self.spill_size is not None:
+            return self._list_compact(path)
+        cache = self.cache
+        if cache is None:
+            return self._list(path)
+        # The directory is stat()ed before it is listed, so that a change made while it is
+        # listed leaves the cached listing out of date rather than missing
+        status = stat(path)
+        listing = cache.get(path, self.cache_variant, status)
+        if listing is not None:
+            if self.stats is not None:
+                self.stats.add_directory(path, len(listing), {}, {"stat": 1})
+            return listing
+        listing = self._list(path)
+        cache.put(path, self.cache_variant, status, listing)
+        return listing
+
+    def _list(self, path: str) -> Listing:
+        """
+        Lists the directory at path with os.scandir()
+
+        Args:
+            path (str): The directory to list
+
+        Raises:
+            OSError: Raises if the directory cannot be read
+
+        Returns:
+            Listing: The (name, path, type, status) records of the directory's entries
+        """
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
         scandir_it = scandir(path)
-    except NotADirectoryError as err:
-        return
+        omitted = 0
+        with scandir_it:
+            if self.entry_filter is None:
+                entries = filter_prefix(scandir_it, ".")
+            else:
+                entries = self.entry_filter(path, scandir_it)
+            if self.entry_limit is None:
+                filtered_it = list(entries)
+            else:
+                filtered_it, omitted = _select_first(entries, self.entry_limit, self.reverse)
+        if stats is not None:
+            listed = perf_counter()
+        if self.entry_limit is None:
+            filtered_it.sort(key=lambda x: x.name, reverse=self.reverse)
+        if stats is not None:
+            sorted_ = perf_counter()
+        executable_check = self.executable_check
+        follow = self.follow_symlinks
+        if self.keep_status:
+            listing = [
+                (entry.name, entry.path, get_type(entry, executable_check, follow), _lstat(entry))
+                for entry in filtered_it
+            ]
+        elif self.one_file_system:
+            listing = []
+            for entry in filtered_it:
+                type = get_type(entry, executable_check, follow)
+                status = _lstat(entry) if type == EntryType.DIRECTORY else None
+                listing.append((entry.name, entry.path, type, status))
+        else:
+            listing = [
+                (entry.name, entry.path, get_type(entry, executable_check, follow), None)
+                for entry in filtered_it
+            ]
+        if omitted:
+            listing.append((TRUNCATED_FORMAT % omitted, "", EntryType.TRUNCATED, None))
+        if stats is not None:
+            files = sum(
+                1
+                for _, _, type, _ in listing
+                if type == EntryType.FILE or type == EntryType.EXECUTABLE
+            )
+            if self.keep_status:
+                statted = len(listing) - (1 if omitted else 0)
+            else:
+                statted = sum(1 for _, _, _, status in listing if status is not None)
+            self._record(
+                path, len(listing), files, statted, start, listed, sorted_, perf_counter()
+            )
+        return listing
+
+    def _list_compact(self, path: str) -> "CompactListing":
+        """
+        Lists the directory at path with os.scandir(), typing each entry as it is read so that
+        only its (name, type) record is kept
+
+        Args:
+            path (str): The directory to list
+
+        Raises:
+            OSError: Raises if the directory cannot be read
+
+        Returns:
+            CompactListing: The listing of the directory's entries
+        """
+        # Imported here, as only low memory traversals sort on disk
+        from gdtree.spill import CompactListing
+
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter()
+        listing = CompactListing(path, self.reverse, self.spill_size, self.keep_status)
+        executable_check = self.executable_check
+        follow = self.follow_symlinks
+        add = listing.add
+        scandir_it = scandir(path)
+        with scandir_it:
+            if self.entry_filter is None:
+                entries = filter_prefix(scandir_it, ".")
+            else:
+                entries = self.entry_filter(path, scandir_it)
+            for entry in entries:
+                add(entry.name, get_type(entry, executable_check, follow))
+        if stats is not None:
+            listed = perf_counter()
+        listing.finish()
+        if stats is not None:
+            # Entries are typed as they are read, so typing is timed with the read
+            sorted_ = perf_counter()
+            statted = len(listing) if self.keep_status else 0
+            self._record(
+                path, len(listing), listing.files, statted, start, listed, sorted_, sorted_
+            )
+        return listing
+
+    def _stream(
+        self, path: str, scandir_it: Iterator[DirEntry]
+    ) -> Generator[Record, None, None]:
+        """
+        Reads an open directory as it is walked, typing each entry as it is read. Past the entry
+        limit, the remaining entries are only counted.
+
+        Args:
+            path (str): The directory read
+            scandir_it (Iterator[DirEntry]): The os.scandir() iterator of the directory
+
+        Yields:
+            Generator[Record, None, None]: The (name, path, type, status) records of the
+            directory's entries
+        """
+        stats = self.stats
+        executable_check = self.executable_check
+        follow = self.follow_symlinks
+        keep_status = self.keep_status
+        one_file_system = self.one_file_system
+        entry_limit = self.entry_limit
+        listed, files, directories, omitted, elapsed = 0, 0, 0, 0, 0.0
+        if stats is not None:
+            resumed = perf_counter()
+        with scandir_it:
+            if self.entry_filter is None:
+                entries = filter_prefix(scandir_it, ".")
+            else:
+                entries = self.entry_filter(path, scandir_it)
+            for entry in entries:
+                if entry_limit is not None and listed == entry_limit:
+                    omitted += 1
+                    continue
+                listed += 1
+                type = get_type(entry, executable_check, follow)
+                if type == EntryType.FILE or type == EntryType.EXECUTABLE:
+                    files += 1
+                if keep_status:
+                    status = _lstat(entry)
+                elif one_file_system and type == EntryType.DIRECTORY:
+                    status = _lstat(entry)
+                    directories += 1
+                else:
+                    status = None
+                if stats is not None:
+                    elapsed += perf_counter() - resumed
+                yield entry.name, entry.path, type, status
+                if stats is not None:
+                    resumed = perf_counter()
+        if omitted:
+            yield TRUNCATED_FORMAT % omitted, "", EntryType.TRUNCATED, None
+        if stats is not None:
+            elapsed += perf_counter() - resumed
+            length = listed + (1 if omitted else 0)
+            statted = listed if keep_status else directories
+            # Reading, typing and status taking are interleaved, so are timed as one phase
+            self._record(path, length, files, statted, 0.0, elapsed, elapsed, elapsed)
+
+    def _record(
+        self,
+        path: str,
+        length: int,
+        files: int,
+        statted: int,
+        start: float,
+        listed: float,
+        sorted_: float,
+        typed: float,
+    ) -> None:
+        """
+        Records the scan of a directory in the statistics
+
+        Args:
+            path (str): The directory scanned
+            length (int): Number of entries in the listing produced
+            files (int): Number of entries other than directories and symlinks
+            statted (int): Number of entries whose status is kept
+            start (float): Time the scan started
+            listed (float): Time the directory was read
+            sorted_ (float): Time the entries were sorted
+            typed (float): Time the entries were typed
+        """
+        syscalls = {"scandir": 1, "stat": 1 if self.cache is not None else 0}
+        if self.executable_check != ExecutableCheck.NONE:
+            # Only files other than directories and symlinks have their executability checked
+            if self.executable_check == ExecutableCheck.ACCESS:
+                syscalls["access"] = files
+            elif not self.keep_status or self.spill_size is not None:
+                syscalls["stat"] += files
+        if self.keep_status or self.one_file_system:
+            # The stat() result of an executability check is the one kept, except in compact
+            # listings, which take it when they are iterated. Staying on one file system only
+            # takes the status of directories.
+            syscalls["stat"] += statted
+        phases = {
+            "scandir": listed - start,
+            "sort": sorted_ - listed,
+            "get_type": typed - sorted_,
+        }
+        self.stats.add_directory(path, length, phases, syscalls)
+
+    def timed_scan(self, path: str) -> Tuple[object, float]:
+        """
+        Lists the directory at path on a worker thread, timing the scan
+
+        Args:
+            path (str): The directory to list
+
+        Returns:
+            Tuple[object, float]: The listing (or the OSError raised while listing) and
+            the time in seconds the scan took
+        """
+        start = perf_counter()
+        try:
+            result = self.scan(path)
+        except OSError as err:
+            result = err
+        return result, perf_counter() - start
+
+
+class _Prefetcher:
+    """
+    Lists directories on a thread pool ahead of the traversal. Directories are prefetched in the
+    order the traversal will visit them, and the number of listings held is bounded. The number
+    of concurrent scans adapts to the observed scan latency, so that fast local disks are not
+    oversubscribed while slow network mounts get the full pool.
+    """
+
+    def __init__(self, jobs: int, scanner: Scanner):
+        """
+        Initializes the prefetcher.
+
+        Args:
+            jobs (int): Maximum number of worker threads
+            scanner (Scanner): Lists the directories
+        """
+        self.scanner = scanner
+        self.max_workers = jobs
+        self.workers = 1
+        self.capacity = jobs * PREFETCH_PER_WORKER
+        self.latency = 0.0
+        # Imported here, as only parallel traversals need threads
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        # Directories waiting to be prefetched, in traversal order
+        self.queue: Deque[str] = deque()
+        # Prefetched (or in flight) listings, by directory path
+        self.pending: Dict[str, "Future"] = {}
+
+    def schedule(self, paths: List[str]) -> None:
+        """
+        Queues directories for prefetching. The directories must be the next ones the traversal
+        descends into, given in the order it descends into them.
+
+        Args:
+            paths (List[str]): The directories to prefetch
+        """
+        self.queue.extendleft(reversed(paths))
+        self._fill()
+
+    def take(self, path: str) -> AnyListing:
+        """
+        Gets the listing of a directory, waiting for its prefetch if it is in flight
+
+        Args:
+            path (str): The directory to list
+
+        Raises:
+            OSError: Raises if the directory cannot be read
+
+        Returns:
+            AnyListing: The (name, path, type, status) records of the directory's entries
+        """
+        future = self.pending.pop(path, None)
+        if future is not None:
+            result, elapsed = future.result()
+        else:
+            if self.queue and self.queue[0] == path:
+                self.queue.popleft()
+            result, elapsed = self.scanner.timed_scan(path)
+        self._observe(elapsed)
+        self._fill()
+        if isinstance(result, OSError):
+            raise result
+        return result
+
+    def discard(self, path: str) -> None:
+        """
+        Drops a directory that was scheduled, but that the traversal will not descend into
+        after all
+
+        Args:
+            path (str): The directory
+        """
+        future = self.pending.pop(path, None)
+        if future is not None:
+            future.cancel()
+        elif self.queue and self.queue[0] == path:
+            self.queue.popleft()
+        self._fill()
+
+    def ready(self, path: str) -> bool:
+        """
+        Tells whether the listing of a directory has been prefetched, so that taking it will not
+        wait
+
+        Args:
+            path (str): The directory
+
+        Returns:
+            bool: Whether the directory's prefetch is done
+        """
+        future = self.pending.get(path)
+        return future is not None and future.done()
+
+    def close(self) -> None:
+        """
+        Cancels outstanding prefetches and releases the worker threads
+        """
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.queue.clear()
+        self.executor.shutdown(wait=False)
+
+    def _observe(self, elapsed: float) -> None:
+        """
+        Updates the scan latency average and adjusts the number of active workers
+
+        Args:
+            elapsed (float): Time in seconds the last scan took
+        """
+        self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
+        if self.latency > SLOW_SCAN_LATENCY and self.workers < self.max_workers:
+            self.workers += 1
+        elif self.latency < FAST_SCAN_LATENCY and self.workers > 1:
+            self.workers -= 1
+
+    def _fill(self) -> None:
+        """
+        Submits queued directories while there are free workers and buffer space
+        """
+        in_flight = sum(1 for future in self.pending.values() if not future.done())
+        while (
+            self.queue
+            and in_flight < self.workers
+            and len(self.pending) < self.capacity
+        ):
+            path = self.queue.popleft()
+            self.pending[path] = self.executor.submit(self.scanner.timed_scan, path)
+            in_flight += 1
+
+
+def list_directory(
+    path: str, scanner: Scanner, prefetcher: Optional[_Prefetcher] = None
+) -> Optional[AnyListing]:
+    """
+    Lists the directory at path, reporting (rather than raising) any error that occurs
+
+    Args:
+        path (str): The directory to list
+        scanner (Scanner): Lists the directory
+        prefetcher (Optional[_Prefetcher], optional): Supplies prefetched directory listings.
+        The directory is listed on the calling thread if None. Defaults to None.
+
+    Returns:
+        Optional[AnyListing]: The (name, path, type, status) records of the directory's entries,
+        or None if the directory could not be listed
+    """
+    before_scan = scanner.before_scan
+    if before_scan is not None and (prefetcher is None or not prefetcher.ready(path)):
+        before_scan()
+    try:
+        if prefetcher is None:
+            return scanner.scan(path)
+        return prefetcher.take(path)
+    except NotADirectoryError:
+        return None
     except OSError as err:
         # We don't want to fail the entire traversal if something fails on
         # OS call - continue with traversal
         # This will also catch if the input directory is bad, we rely on EAFP principle here
-        print(err)
+        # Reported on stderr, so that machine-readable output stays intact
+        print(err, file=sys.stderr)
+        return None
+
+
+def _identity(path: str, status: Optional[stat_result] = None) -> Optional[Tuple[int, int]]:
+    """
+    Gets what identifies a directory however it is reached, following symbolic links
+
+    Args:
+        path (str): Path to the directory
+        status (Optional[stat_result], optional): The entry's lstat() result, reused unless the
+        entry is a symbolic link. Defaults to None.
+
+    Returns:
+        Optional[Tuple[int, int]]: The directory's (st_dev, st_ino), or None if it cannot be
+        stat()ed
+    """
+    if status is None or S_ISLNK(status.st_mode):
+        try:
+            status = stat(path)
+        except OSError:
+            return None
+    return status.st_dev, status.st_ino
+
+
+def subdirectories(listing: AnyListing, device: Optional[int] = None) -> List[str]:
+    """
+    Gets the paths of the directories in a listing, in order, for prefetching
+
+    Args:
+        listing (AnyListing): The listing
+        device (Optional[int], optional): Only gives the directories whose status shows them
+        on this device, if given. Defaults to None.
+
+    Returns:
+        List[str]: The paths of the directories. Spilled compact listings and streamed listings
+        give none, and neither do compact listings when a device is given, as they hold no
+        status.
+    """
+    if isinstance(listing, list):
+        if device is None:
+            return [
+                entry_path for _, entry_path, type, _ in listing if type == EntryType.DIRECTORY
+            ]
+        # Directories of unknown status, and links (whose own status is on the device of the
+        # directory holding them), are left for the traversal to check
+        return [
+            entry_path
+            for _, entry_path, type, status in listing
+            if type == EntryType.DIRECTORY
+            and status is not None
+            and not S_ISLNK(status.st_mode)
+            and status.st_dev == device
+        ]
+    if device is not None:
+        return []
+    if hasattr(listing, "directories"):
+        return listing.directories()
+    # Streamed listings are read as they are walked
+    return []
+
+
+class TraversalStack:
+    """
+    The listings of the directories open in a depth-first traversal. Stepping through it gives
+    the entries in traversal order, each with its end state history. An entry is known to be the
+    last of its directory once the entry after it is looked for, so listings whose length is
+    unknown until they are read to the end (ex. streamed listings) are walked the same way.
+
+    Pushing the listing of a directory just stepped onto opens it, so that its entries come next.
+    """
+
+    __slots__ = ("max_depth", "frames")
+
+    def __init__(self, max_depth: Optional[int] = None):
+        """
+        Initializes an empty stack.
+
+        Args:
+            max_depth (Optional[int], optional): Maximum depth of entries to step onto.
+            Unbounded if None. Defaults to None.
+        """
+        self.max_depth = max_depth
+        # Each frame holds an iterator over a directory's listing, the entry it gives next,
+        # whether its subdirectories are descended into, and its history
+        self.frames: List[list] = []
+
+    def __len__(self) -> int:
+        """
+        Gets the number of directories open
+
+        Returns:
+            int: The number of directories open
+        """
+        return len(self.frames)
+
+    def descends(self, history: EndStateHistory) -> bool:
+        """
+        Tells whether the subdirectories of a directory are descended into, within the maximum
+        depth
+
+        Args:
+            history (EndStateHistory): The directory's history
+
+        Returns:
+            bool: Whether the directory's subdirectories are descended into
+        """
+        return self.max_depth is None or len(history) + 1 < self.max_depth
+
+    def push(self, listing: Iterable[Record], history: EndStateHistory) -> None:
+        """
+        Opens a directory, whose entries are stepped onto next. Empty directories are not kept.
+
+        Args:
+            listing (Iterable[Record]): The (name, path, type, status) records of the
+            directory's entries
+            history (EndStateHistory): The directory's history (empty for the start directory)
+        """
+        entries = iter(listing)
+        first = next(entries, None)
+        if first is not None:
+            self.frames.append([entries, first, self.descends(history), history])
+
+    def step(self) -> Optional[Tuple[Record, EndStateHistory, bool]]:
+        """
+        Steps onto the next entry, closing its directory if it is the last entry
+
+        Returns:
+            Optional[Tuple[Record, EndStateHistory, bool]]: The entry's record, its history, and
+            whether its directory's subdirectories are descended into, or None once every
+            directory is closed
+        """
+        frames = self.frames
+        if not frames:
+            return None
+        frame = frames[-1]
+        entries, entry, descend, history = frame
+        following = next(entries, None)
+        if following is None:
+            frames.pop()
+        else:
+            frame[1] = following
+        return entry, history.child(following is None), descend
+
+    @property
+    def listing(self) -> Optional[Iterator[Record]]:
+        """
+        The iterator over the rest of the innermost open directory's listing, which the next
+        step reads from
+
+        Returns:
+            Optional[Iterator[Record]]: The iterator, or None if every directory is closed
+        """
+        return self.frames[-1][0] if self.frames else None
+
+    def read_ahead(self) -> None:
+        """
+        Reads the rest of the innermost open directory's listing into memory, so that a
+        streamed listing closes its directory
+        """
+        frame = self.frames[-1]
+        frame[0] = iter(list(frame[0]))
+
+
+def _traverse(
+    path: str,
+    scanner: Scanner,
+    max_depth: Optional[int] = None,
+    prefetcher: Optional[_Prefetcher] = None,
+) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
+    """
+    Traverses the directory starting at path. The traversal keeps an explicit stack of the
+    directories being listed rather than recursing, so the depth of the tree is unbounded. If the
+    scanner keeps the status of entries, each entry is yielded with its status.
+
+    If the scanner follows symbolic links, the (st_dev, st_ino) of every directory descended
+    into is kept in a set. A directory reached again is yielded with the type LOOP if it holds
+    the entry itself, and REPEAT otherwise, and is not scanned again.
+
+    If the scanner stays on one file system, directories on another device than path's are
+    yielded, but not scanned.
+
+    Args:
+        path (str): The top level directory to traverse downward from
+        scanner (Scanner): Lists the directories traversed
+        max_depth (Optional[int], optional): Maximum depth of entries to yield. Directories at
+        this depth are not scanned. Unbounded if None. Defaults to None.
+        prefetcher (Optional[_Prefetcher], optional): Supplies prefetched directory listings.
+        Directories are listed on the calling thread if None. Defaults to None.
+
+    Yields:
+        Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the paths,
+        types, and end state histories of the entries traversed
+    """
+    if max_depth is not None and max_depth < 1:
         return
-    try:
-        with scandir_it:
-            filtered_it = list(filter_prefix(scandir_it, "."))
-    except OSError as err:
-        # Same OSError policy as above
-        print(err)
+    with_status = scanner.keep_status
+    follow = scanner.follow_symlinks
+    device = None
+    if follow or scanner.one_file_system:
+        root = _identity(path)
+        if scanner.one_file_system and root is not None:
+            device = root[0]
+    if follow:
+        visited: Set[Tuple[int, int]] = set()
+        # Identities of the directories above the entry being walked, by depth
+        ancestors: List[Optional[Tuple[int, int]]] = [root]
+        visited.add(root)
+    listing = list_directory(path, scanner, prefetcher)
+    if listing is None:
         return
+    stack = TraversalStack(max_depth)
+
+    def push(listing: AnyListing, history: EndStateHistory) -> None:
+        if prefetcher is not None and stack.descends(history):
+            prefetcher.schedule(subdirectories(listing, device))
+        stack.push(listing, history)
+
+    push(listing, EndStateHistory())
+    while True:
+        step = stack.step()
+        if step is None:
+            break
+        (name, entry_path, type, status), subentry_history, descend = step
+        descend_entry = type == EntryType.DIRECTORY and descend
+        if descend_entry and (follow or device is not None):
+            identity = _identity(entry_path, status)
+            if device is not None and identity is not None and identity[0] != device:
+                # The directory is a mount point, or a link to another file system
+                descend_entry = False
+                if prefetcher is not None:
+                    prefetcher.discard(entry_path)
+        if descend_entry and follow:
+            depth = len(subentry_history)
+            if identity is not None and identity in visited:
+                descend_entry = False
+                type = EntryType.LOOP if identity in ancestors[:depth] else EntryType.REPEAT
+                if prefetcher is not None:
+                    prefetcher.discard(entry_path)
+            else:
+                visited.add(identity)
+                del ancestors[depth:]
+                ancestors.append(identity)
+        if with_status:
+            yield name, type, subentry_history, status
+        else:
+            yield name, type, subentry_history
+        if descend_entry:
+            is_last = subentry_history[len(subentry_history) - 1]
+            if not is_last and scanner.unsorted and len(stack) >= MAX_OPEN_STREAMS:
+                # Reads the rest of the directory, which closes it, so that the number of open
+                # directories stays bounded however deep the tree is
+                stack.read_ahead()
+            sublisting = list_directory(entry_path, scanner, prefetcher)
+            if sublisting is not None:
+                push(sublisting, subentry_history)
+
+
+def _walk(
+    start_dir: str, scanner: Scanner, jobs: int, max_depth: Optional[int]
+) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
+    """
+    Traverses the directory given, prefetching listings on a thread pool if more than one job
+    is requested
 
-    filtered_it.sort(key=lambda x: x.name, reverse=reverse)
-    last_index = len(filtered_it) - 1
-    for index, directory_entry in enumerate(filtered_it):
-        type = get_type(directory_entry)
-        subentry_history = construct_from_history(history, index == last_index)
-        yield directory_entry.name, type, subentry_history
-        if type == EntryType.DIRECTORY and len(subentry_history) < MAX_DEPTH:
-            yield from _traverse(directory_entry.path, subentry_history, reverse)
+    Args:
+        start_dir (str): Absolute path to the directory to traverse
+        scanner (Scanner): Lists the directories traversed
+        jobs (int): Maximum number of directories to scan concurrently
+        max_depth (Optional[int]): Maximum depth of entries to yield. Unbounded if None.
+
+    Yields:
+        Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the paths,
+        types, and end state histories of the entries traversed
+    """
+    if jobs <= 1:
+        yield from _traverse(start_dir, scanner, max_depth)
+        return
+    prefetcher = _Prefetcher(jobs, scanner)
+    try:
+        yield from _traverse(start_dir, scanner, max_depth, prefetcher)
+    finally:
+        prefetcher.close()
 
 
 def reverse_traverse_directory(
     start_dir: str,
+    jobs: int = 1,
+    max_depth: Optional[int] = None,
+    executable_check: ExecutableCheck = ExecutableCheck.ACCESS,
+    stats: Optional[Stats] = None,
+    entry_limit: Optional[int] = None,
+    entry_filter: Optional["EntryFilter"] = None,
+    cache: Optional["ScanCache"] = None,
+    with_status: bool = False,
+    spill_size: Optional[int] = None,
+    unsorted: bool = False,
+    retained: Optional[RetainedListings] = None,
+    follow_symlinks: bool = False,
+    one_file_system: bool = False,
+    before_scan: Optional[Callable[[], None]] = None,
 ) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
     """
     Traverses the directory given and yields the entries found in reverse lexicographical order
 
     Args:
         start_dir (str): Absolute path to the directory to traverse
+        jobs (int, optional): Maximum number of directories to scan concurrently. Defaults to 1.
+        max_depth (Optional[int], optional): Maximum depth of entries to yield. Directories at
+        this depth are not scanned. Unbounded if None. Defaults to None.
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.ACCESS.
+        stats (Optional[Stats], optional): Records the time spent scanning directories, if given.
+        Defaults to None.
+        entry_limit (Optional[int], optional): Maximum number of entries yielded per directory.
+        The entries left out are stood in for by a single TRUNCATED entry, and never typed or
+        descended into. Unbounded if None. Defaults to None.
+        entry_filter (Optional[EntryFilter], optional): Filters the entries of each directory.
+        Directories filtered out are never scanned. Only hidden entries are filtered out if None.
+        Defaults to None.
+        cache (Optional[ScanCache], optional): Reuses the listings of directories left unchanged
+        since an earlier scan, so that they are only stat()ed. Listings filtered by .gitignore
+        files are not cached. Defaults to None.
+        with_status (bool, optional): Yields each entry's lstat() result (None if it could not
+        be taken) after its history. The stat() result of an executability check is reused.
+        The cache is not used. Defaults to False.
+        spill_size (Optional[int], optional): Keeps only a (name, type) record per entry of a
+        directory, rather than its os.DirEntry and path, and sorts a directory's records on disk
+        once they take more than this many bytes, so memory stays bounded however large a
+        directory is. Not needed, so not used, with an entry limit. The cache is not used.
+        Directories are held in memory whole if None. Defaults to None.
+        unsorted (bool, optional): Yields the entries of each directory in the order
+        os.scandir() reads them, as they are read, rather than sorted. Each directory is read
+        while it is walked, so the first entries are yielded after a single read, and nothing
+        is prefetched. The cache is not used. Defaults to False.
+        retained (Optional[RetainedListings], optional): Reuses the listings retained from an
+        earlier traversal instead of scanning their directories again, and retains the listings
+        of the directories scanned, if given. The same entry filter must be used for every
+        traversal. Neither spill_size nor unsorted applies. Defaults to None.
+        follow_symlinks (bool, optional): Descends into symbolic links to directories, which
+        are yielded as directories. Each directory is scanned once: a directory reached again
+        (through a loop, or through another link) is yielded with a marked name, and not
+        descended into. Defaults to False.
+        one_file_system (bool, optional): Stays on the file system of start_dir: directories on
+        another device are yielded, but never scanned. Their device is read from the lstat()
+        result os.DirEntry caches, which is the one yielded with with_status. Defaults to False.
+        before_scan (Optional[Callable[[], None]], optional): Called before the traversal waits
+        for a directory to be listed (ex. to write the output generated so far). Not called
+        for directories already prefetched. Defaults to None.
 
     Yields:
         Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the paths,
         types, and end state histories of the entries traversed
     """
-    yield from _traverse(start_dir, EndStateHistory(), True)
+    scanner = Scanner(
+        True,
+        executable_check,
+        stats,
+        entry_limit,
+        entry_filter,
+        cache,
+        with_status,
+        spill_size,
+        unsorted,
+        retained,
+        follow_symlinks,
+        one_file_system,
+        before_scan,
+    )
+    yield from _walk(start_dir, scanner, jobs, max_depth)
 
 
 def traverse_directory(
     start_dir: str,
+    jobs: int = 1,
+    max_depth: Optional[int] = None,
+    executable_check: ExecutableCheck = ExecutableCheck.ACCESS,
+    stats: Optional[Stats] = None,
+    entry_limit: Optional[int] = None,
+    entry_filter: Optional["EntryFilter"] = None,
+    cache: Optional["ScanCache"] = None,
+    with_status: bool = False,
+    spill_size: Optional[int] = None,
+    unsorted: bool = False,
+    retained: Optional[RetainedListings] = None,
+    follow_symlinks: bool = False,
+    one_file_system: bool = False,
+    before_scan: Optional[Callable[[], None]] = None,
 ) -> Generator[Tuple[str, EntryType, EndStateHistory], None, None]:
     """
     Traverses the directory given and yields the entries found
 
     Args:
         start_dir (str): Absolute path to the directory to traverse
+        jobs (int, optional): Maximum number of directories to scan concurrently. Defaults to 1.
+        max_depth (Optional[int], optional): Maximum depth of entries to yield. Directories at
+        this depth are not scanned. Unbounded if None. Defaults to None.
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.ACCESS.
+        stats (Optional[Stats], optional): Records the time spent scanning directories, if given.
+        Defaults to None.
+        entry_limit (Optional[int], optional): Maximum number of entries yielded per directory.
+        The entries left out are stood in for by a single TRUNCATED entry, and never typed or
+        descended into. Unbounded if None. Defaults to None.
+        entry_filter (Optional[EntryFilter], optional): Filters the entries of each directory.
+        Directories filtered out are never scanned. Only hidden entries are filtered out if None.
+        Defaults to None.
+        cache (Optional[ScanCache], optional): Reuses the listings of directories left unchanged
+        since an earlier scan, so that they are only stat()ed. Listings filtered by .gitignore
+        files are not cached. Defaults to None.
+        with_status (bool, optional): Yields each entry's lstat() result (None if it could not
+        be taken) after its history. The stat() result of an executability check is reused.
+        The cache is not used. Defaults to False.
+        spill_size (Optional[int], optional): Keeps only a (name, type) record per entry of a
+        directory, rather than its os.DirEntry and path, and sorts a directory's records on disk
+        once they take more than this many bytes, so memory stays bounded however large a
+        directory is. Not needed, so not used, with an entry limit. The cache is not used.
+        Directories are held in memory whole if None. Defaults to None.
+        unsorted (bool, optional): Yields the entries of each directory in the order
+        os.scandir() reads them, as they are read, rather than sorted. Each directory is read
+        while it is walked, so the first entries are yielded after a single read, and nothing
+        is prefetched. The cache is not used. Defaults to False.
+        retained (Optional[RetainedListings], optional): Reuses the listings retained from an
+        earlier traversal instead of scanning their directories again, and retains the listings
+        of the directories scanned, if given. The same entry filter must be used for every
+        traversal. Neither spill_size nor unsorted applies. Defaults to None.
+        follow_symlinks (bool, optional): Descends into symbolic links to directories, which
+        are yielded as directories. Each directory is scanned once: a directory reached again
+        (through a loop, or through another link) is yielded with a marked name, and not
+        descended into. Defaults to False.
+        one_file_system (bool, optional): Stays on the file system of start_dir: directories on
+        another device are yielded, but never scanned. Their device is read from the lstat()
+        result os.DirEntry caches, which is the one yielded with with_status. Defaults to False.
+        before_scan (Optional[Callable[[], None]], optional): Called before the traversal waits
+        for a directory to be listed (ex. to write the output generated so far). Not called
+        for directories already prefetched. Defaults to None.
 
     Yields:
         Generator[Tuple[str, EntryType, EndStateHistory], None, None]: Generates the paths,
         types, and end state histories of the entries traversed
     """
-    yield from _traverse(start_dir, EndStateHistory(), False)
+    scanner = Scanner(
+        False,
+        executable_check,
+        stats,
+        entry_limit,
+        entry_filter,
+        cache,
+        with_status,
+        spill_size,
+        unsorted,
+        retained,
+        follow_symlinks,
+        one_file_system,
+        before_scan,
+    )
+    yield from _walk(start_dir, scanner, jobs, max_depth)
@@ -2,12 +2,18 @@
 A set of smaller (but important) utility constants, functions, and classes used by gdtree
 """
 
+import os
 from os import access, X_OK, DirEntry
 from enum import Enum, Flag, auto
-from typing import Callable
+from functools import lru_cache
+from stat import S_IXGRP, S_IXOTH, S_IXUSR
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+from gdtree.output import DEFAULT_BUFFER_SIZE
 
-# Maximum depth of traversal
-MAX_DEPTH = 32
+# Default maximum size of the cached directory listings, in bytes
+DEFAULT_CACHE_SIZE = 64 << 20
+# Default size of a directory's entries past which --low-memory sorts them on disk, in bytes
+DEFAULT_SPILL_SIZE = 16 << 20
 
 
 class EntryType(Enum):
@@ -19,6 +25,25 @@ class EntryType(Enum):
     FILE = 2
     EXECUTABLE = 3
     SYMLINK = 4
+    # Stands in for the entries left out of a truncated directory listing
+    TRUNCATED = 5
+    # Directories reached again when following symlinks, which are not descended into: a link
+    # back to a directory above it (a loop), and a link to a directory listed elsewhere
+    LOOP = 6
+    REPEAT = 7
+
+
+class ExecutableCheck(Enum):
+    """
+    Enum type consisting of the ways executables can be told apart from other files
+    """
+
+    # Executables are not told apart from other files
+    NONE = 0
+    # Ask the operating system with an access() call per file
+    ACCESS = 1
+    # Check the permission bits of the file's stat() result
+    MODE = 2
 
 
 class Settings(Flag):
@@ -29,9 +54,108 @@ class Settings(Flag):
     COLORIZE = auto()
     FANCY = auto()
     REVERSE = auto()
+    ALL = auto()
+    GITIGNORE = auto()
+    DU = auto()
+    UNSORTED = auto()
+    WATCH = auto()
+    FOLLOW = auto()
+    ONE_FILE_SYSTEM = auto()
+
+
+class Options(NamedTuple):
+    """
+    Holds all program options that take a value
+    """
+
+    # Maximum number of directories scanned concurrently
+    jobs: int = 1
+    # Number of characters of output buffered between writes
+    buffer_size: int = DEFAULT_BUFFER_SIZE
+    # Maximum depth of the tree to print, unbounded if None
+    max_depth: Optional[int] = None
+    # Whether to report statistics on the generation to stderr
+    stats: bool = False
+    # Maximum number of entries printed per directory, unbounded if None
+    entry_limit: Optional[int] = None
+    # Globs of the names of entries not to print
+    ignore: Tuple[str, ...] = ()
+    # Globs of the names of the only files to print
+    pattern: Tuple[str, ...] = ()
+    # Path to the listing cache, not cached if None
+    cache: Optional[str] = None
+    # Maximum size of the listing cache in bytes
+    cache_size: int = DEFAULT_CACHE_SIZE
+    # Format the tree is printed in, one of gdtree.formats.OUTPUT_FORMATS
+    output_format: str = "tree"
+    # Size of a directory's entries past which they are sorted on disk, in bytes. Directories
+    # are held in memory whole if None
+    spill_size: Optional[int] = None
+    # LS_COLORS specification names are colored by, the default colors if None
+    ls_colors: Optional[str] = None
+
+
+def default_cache_path() -> str:
+    """
+    Gets the default location of the listing cache, in the user's cache directory
+
+    Returns:
+        str: The path to the cache file
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "gdtree", "scan-cache.sqlite3")
+
 
+@lru_cache(maxsize=None)
+def _effective_ids() -> Tuple[int, FrozenSet[int]]:
+    """
+    Gets the effective user id and group memberships of this process, which do not change
+    during a run
+
+    Returns:
+        Tuple[int, FrozenSet[int]]: The effective user id and the set of group ids
+    """
+    return os.geteuid(), frozenset(os.getgroups()) | {os.getegid()}
+
+
+def is_executable(entry: DirEntry) -> bool:
+    """
+    Checks whether the effective user may execute the file, using the permission bits of the
+    entry's stat() result rather than an access() call. The stat() result is cached on the entry.
+
+    May not function properly with non-POSIX file permission attributes (ex. ACLs).
 
-def get_type(entry: DirEntry) -> EntryType:
+    Args:
+        entry (os.DirEntry): The directory entry object returned by os.scandir()
+
+    Returns:
+        bool: Whether the file is executable
+    """
+    if not hasattr(os, "geteuid"):
+        # No POSIX ids to check permission bits against
+        return access(entry.path, X_OK)
+    try:
+        stat_result = entry.stat(follow_symlinks=False)
+    except OSError:
+        return False
+    mode = stat_result.st_mode
+    uid, groups = _effective_ids()
+    if uid == 0:
+        return bool(mode & (S_IXUSR | S_IXGRP | S_IXOTH))
+    if uid == stat_result.st_uid:
+        return bool(mode & S_IXUSR)
+    if stat_result.st_gid in groups:
+        return bool(mode & S_IXGRP)
+    return bool(mode & S_IXOTH)
+
+
+def get_type(
+    entry: DirEntry,
+    executable_check: ExecutableCheck = ExecutableCheck.ACCESS,
+    follow_symlinks: bool = False,
+) -> EntryType:
     """
     Gets the type of directory entry held by this file.
 
@@ -39,6 +163,10 @@ def get_type(entry: DirEntry) -> EntryType:
 
     Args:
         entry (os.DirEntry): The directory entry object returned by os.scandir()
+        executable_check (ExecutableCheck, optional): How executables are told apart from other
+        files. Defaults to ExecutableCheck.ACCESS.
+        follow_symlinks (bool, optional): Types symbolic links to directories as directories.
+        Defaults to False.
 
     Returns:
         EntryType: The type of directory entry located here (File, Directory, Symbolic Link, Executable)
@@ -51,6 +179,13 @@ def get_type(entry: DirEntry) -> EntryType:
         # expected - To not stop execution, return False
         is_symlink = False
     if is_symlink:
+        if follow_symlinks:
+            try:
+                # Follows the link, and caches the target's status on the entry
+                if entry.is_dir():
+                    return EntryType.DIRECTORY
+            except OSError:
+                pass
         return EntryType.SYMLINK
 
     try:
@@ -62,6 +197,10 @@ def get_type(entry: DirEntry) -> EntryType:
     if is_dir:
         return EntryType.DIRECTORY
 
-    if access(entry.path, X_OK):
-        return EntryType.EXECUTABLE
+    if executable_check == ExecutableCheck.ACCESS:
+        if access(entry.path, X_OK):
+            return EntryType.EXECUTABLE
+    elif executable_check == ExecutableCheck.MODE:
+        if is_executable(entry):
+            return EntryType.EXECUTABLE
     return EntryType.FILE
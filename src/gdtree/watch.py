@@ -0,0 +1,358 @@
+"""
+Watch mode: prints the tree, then prints it again whenever the tree changes. The listings of the
+directories walked are kept in memory, and only the directories that changed are scanned again.
+"""
+
+import os
+import sys
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from errno import ENOMEM, ENOSPC
+from select import select
+from struct import Struct
+from time import monotonic, sleep
+from typing import Callable, Dict, Iterable, Optional, TextIO, Tuple, Union
+from gdtree.output import DEFAULT_BUFFER_SIZE, write_lines
+from gdtree.patterns import GITIGNORE
+from gdtree.traverse import RetainedListings
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+# Events that change a directory's listing
+LISTING_EVENTS = (
+    IN_ATTRIB
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+# Header of an inotify event: watch descriptor, mask, cookie and length of the name
+EVENT_HEADER = Struct("iIII")
+# Size of the buffer events are read into
+EVENT_BUFFER_SIZE = 1 << 16
+
+# Seconds without events after which a burst of events is over
+COALESCE_DELAY = 0.1
+# Maximum number of seconds a burst of events delays a new tree
+COALESCE_LIMIT = 1.0
+# Seconds between checks of the directories when polling
+POLL_INTERVAL = 1.0
+# Clears a terminal and moves the cursor to its top left corner
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+# Changed directories, each mapped to whether everything below it changed too
+Changes = Dict[str, bool]
+# Name of the .gitignore file, as inotify reports it
+_GITIGNORE_NAME = os.fsencode(GITIGNORE)
+
+
+class InotifyWatcher:
+    """
+    Watches directories with Linux inotify. The kernel reports every change, so no directory is
+    checked unless it changed.
+    """
+
+    def __init__(self, with_contents: bool = False, follow_symlinks: bool = False):
+        """
+        Initializes the watcher, watching no directories yet.
+
+        Args:
+            with_contents (bool, optional): Also reports changes to the contents of files (ex.
+            when sizes are printed). Defaults to False.
+            follow_symlinks (bool, optional): Watches the directories that symbolic links given
+            as paths lead to, under the link's path. Defaults to False.
+
+        Raises:
+            OSError: Raises if inotify is not available
+        """
+        libc_name = find_library("c")
+        if libc_name is None:
+            raise OSError("inotify is not available")
+        self.libc = CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = get_errno()
+            raise OSError(error, os.strerror(error))
+        # .gitignore files are edited in place, which changes how everything below them is
+        # filtered
+        self.mask = LISTING_EVENTS | IN_CLOSE_WRITE | IN_ONLYDIR | IN_EXCL_UNLINK
+        if with_contents:
+            self.mask |= IN_MODIFY
+        # Without IN_DONT_FOLLOW a link's target is watched, which is what a followed link lists
+        if not follow_symlinks:
+            self.mask |= IN_DONT_FOLLOW
+        self.paths: Dict[int, str] = {}
+        self.descriptors: Dict[str, int] = {}
+
+    def update(self, paths: Iterable[str]) -> None:
+        """
+        Watches the directories given, and stops watching any others
+
+        Args:
+            paths (Iterable[str]): The directories to watch
+
+        Raises:
+            OSError: Raises if a directory cannot be watched for lack of resources (ex. past
+            the limit of watches per user)
+        """
+        paths = set(paths)
+        for path in paths - self.descriptors.keys():
+            descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.mask)
+            if descriptor < 0:
+                error = get_errno()
+                if error == ENOSPC or error == ENOMEM:
+                    raise OSError(error, os.strerror(error), path)
+                # The directory is gone, which its parent's events report
+                continue
+            # A directory moved since it was watched keeps its watch descriptor
+            moved = self.paths.get(descriptor)
+            if moved is not None:
+                del self.descriptors[moved]
+            self.paths[descriptor] = path
+            self.descriptors[path] = descriptor
+        for path in self.descriptors.keys() - paths:
+            descriptor = self.descriptors.pop(path)
+            del self.paths[descriptor]
+            self.libc.inotify_rm_watch(self.fd, descriptor)
+
+    def read(self, timeout: Optional[float]) -> Changes:
+        """
+        Waits for changes to the directories watched
+
+        Args:
+            timeout (Optional[float]): Maximum number of seconds to wait. Waits until a change
+            if None.
+
+        Returns:
+            Changes: The directories changed. Empty if none changed before the timeout.
+        """
+        changes: Changes = {}
+        if not select([self.fd], [], [], timeout)[0]:
+            return changes
+        try:
+            data = os.read(self.fd, EVENT_BUFFER_SIZE)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, so any directory may have changed
+                changes.update((path, False) for path in self.descriptors)
+                continue
+            path = self.paths.get(descriptor)
+            if path is None:
+                continue
+            if mask & IN_IGNORED:
+                # The directory is gone, and the kernel removed its watch
+                del self.paths[descriptor]
+                del self.descriptors[path]
+            if mask & IN_CLOSE_WRITE and name != _GITIGNORE_NAME:
+                continue
+            changes[path] = changes.get(path, False) or name == _GITIGNORE_NAME
+        return changes
+
+    def close(self) -> None:
+        """
+        Stops watching every directory
+        """
+        os.close(self.fd)
+
+
+class PollWatcher:
+    """
+    Watches directories by checking their modification times, where inotify is not available.
+    Only entries being added, removed or renamed change a directory's modification time, so
+    changes to files themselves are not seen.
+    """
+
+    def __init__(self):
+        """
+        Initializes the watcher, watching no directories yet.
+        """
+        # The (inode, modification time) of each directory watched when it was last checked
+        self.signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+
+    def update(self, paths: Iterable[str]) -> None:
+        """
+        Watches the directories given, and stops watching any others
+
+        Args:
+            paths (Iterable[str]): The directories to watch
+        """
+        signatures = self.signatures
+        self.signatures = {
+            path: signatures[path] if path in signatures else _signature(path)
+            for path in paths
+        }
+
+    def read(self, timeout: Optional[float]) -> Changes:
+        """
+        Waits for changes to the directories watched, checking them all every POLL_INTERVAL
+
+        Args:
+            timeout (Optional[float]): Maximum number of seconds to wait. Waits until a change
+            if None.
+
+        Returns:
+            Changes: The directories changed. Empty if none changed before the timeout.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            if deadline is None:
+                sleep(POLL_INTERVAL)
+            else:
+                sleep(max(min(POLL_INTERVAL, deadline - monotonic()), 0))
+            changes: Changes = {}
+            for path, signature in self.signatures.items():
+                current = _signature(path)
+                if current != signature:
+                    self.signatures[path] = current
+                    changes[path] = False
+            if changes or (deadline is not None and monotonic() >= deadline):
+                return changes
+
+    def close(self) -> None:
+        """
+        Stops watching every directory
+        """
+        self.signatures.clear()
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Gets what identifies the state of a directory's listing
+
+    Args:
+        path (str): The directory
+
+    Returns:
+        Optional[Tuple[int, int]]: The directory's inode and modification time, or None if it
+        cannot be stat()ed
+    """
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return status.st_ino, status.st_mtime_ns
+
+
+Watcher = Union[InotifyWatcher, PollWatcher]
+
+
+def create_watcher(with_contents: bool = False, follow_symlinks: bool = False) -> Watcher:
+    """
+    Creates a watcher using inotify, or polling where inotify is not available
+
+    Args:
+        with_contents (bool, optional): Also reports changes to the contents of files, where
+        inotify is available. Defaults to False.
+        follow_symlinks (bool, optional): Watches the directories symbolic links lead to. Polling
+        always does, since it stat()s the paths. Defaults to False.
+
+    Returns:
+        Watcher: The watcher
+    """
+    try:
+        return InotifyWatcher(with_contents, follow_symlinks)
+    except OSError:
+        return PollWatcher()
+
+
+def wait_for_changes(watcher: Watcher) -> Changes:
+    """
+    Waits for a burst of changes to end. Changes made within COALESCE_DELAY of each other are
+    gathered together, for at most COALESCE_LIMIT after the first.
+
+    Args:
+        watcher (Watcher): Watches the directories
+
+    Returns:
+        Changes: The directories changed
+    """
+    changes: Changes = {}
+    while not changes:
+        changes = watcher.read(None)
+    deadline = monotonic() + COALESCE_LIMIT
+    while True:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return changes
+        burst = watcher.read(min(COALESCE_DELAY, remaining))
+        if not burst:
+            return changes
+        for path, subtree in burst.items():
+            changes[path] = changes.get(path, False) or subtree
+
+
+def watch(
+    directory: str,
+    generate: Callable[[RetainedListings], Iterable[str]],
+    with_contents: bool = False,
+    follow_symlinks: bool = False,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    stream: TextIO = None,
+) -> None:
+    """
+    Prints the tree, then prints it again whenever it changes, until interrupted. Only the
+    directories that changed are scanned again.
+
+    Args:
+        directory (str): The directory the tree is generated from
+        generate (Callable[[RetainedListings], Iterable[str]]): Generates the lines of the tree,
+        reusing the listings retained from the last generation
+        with_contents (bool, optional): Also generates the tree again when the contents of
+        files change (ex. when sizes are printed). Defaults to False.
+        follow_symlinks (bool, optional): The tree descends into symbolic links to directories,
+        so the directories they lead to are watched. Defaults to False.
+        buffer_size (int, optional): Number of characters to buffer between writes.
+        Defaults to DEFAULT_BUFFER_SIZE.
+        stream (TextIO, optional): The stream to write to. Defaults to sys.stdout.
+    """
+    if stream is None:
+        stream = sys.stdout
+    retained = RetainedListings()
+    watcher = create_watcher(with_contents, follow_symlinks)
+    try:
+        while True:
+            # The tree is generated before the screen is cleared, so it never shows half a tree
+            lines = list(generate(retained))
+            if stream.isatty():
+                stream.write(CLEAR_SCREEN)
+            write_lines(lines, stream, buffer_size)
+            watched = retained.prune(directory)
+            try:
+                watcher.update(watched)
+            except OSError as err:
+                print("%s, polling instead" % err, file=sys.stderr)
+                watcher.close()
+                watcher = PollWatcher()
+                watcher.update(watched)
+            for path, subtree in wait_for_changes(watcher).items():
+                retained.invalidate(path, subtree)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -1,6 +1,26 @@
-from gdtree.app import process_settings_from_args, setup_parser
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from os import makedirs, path, scandir
+from tempfile import TemporaryDirectory
+from time import sleep
+from gdtree.app import (
+    generate_tree,
+    init_colors,
+    process_options_from_args,
+    process_settings_from_args,
+    setup_diff_parser,
+    setup_parser,
+    setup_render_parser,
+    setup_snapshot_parser,
+    start,
+    start_render,
+    start_snapshot,
+)
+from gdtree.output import FLUSH_INTERVAL
 from unittest import TestCase, main
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 from argparse import Namespace
 from gdtree.utils import Settings
 
@@ -14,6 +34,13 @@ class TestApp(TestCase):
         mocked_args.colorize = False
         mocked_args.fancy = False
         mocked_args.reverse = False
+        mocked_args.all = False
+        mocked_args.gitignore = False
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
         settings = Settings(0)
         output = process_settings_from_args(mocked_args)
         self.assertEqual(settings, output)
@@ -27,6 +54,13 @@ class TestApp(TestCase):
         mocked_args.colorize = True
         mocked_args.fancy = False
         mocked_args.reverse = False
+        mocked_args.all = False
+        mocked_args.gitignore = False
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
         settings = Settings(0)
         settings |= Settings.COLORIZE
         output = process_settings_from_args(mocked_args)
@@ -41,6 +75,13 @@ class TestApp(TestCase):
         mocked_args.colorize = False
         mocked_args.fancy = True
         mocked_args.reverse = False
+        mocked_args.all = False
+        mocked_args.gitignore = False
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
         settings = Settings(0)
         settings |= Settings.FANCY
         output = process_settings_from_args(mocked_args)
@@ -55,6 +96,13 @@ class TestApp(TestCase):
         mocked_args.colorize = False
         mocked_args.fancy = False
         mocked_args.reverse = True
+        mocked_args.all = False
+        mocked_args.gitignore = False
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
         settings = Settings(0)
         settings |= Settings.REVERSE
         output = process_settings_from_args(mocked_args)
@@ -69,6 +117,13 @@ class TestApp(TestCase):
         mocked_args.colorize = False
         mocked_args.fancy = False
         mocked_args.reverse = True
+        mocked_args.all = False
+        mocked_args.gitignore = False
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
         settings = Settings(0)
         settings |= Settings.REVERSE
         output = process_settings_from_args(mocked_args)
@@ -149,6 +204,402 @@ class TestApp(TestCase):
             output = parser.parse_args(args)
         self.assertEqual(exit.exception.code, 2)
 
+    def test_parser_jobs(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the number of jobs
+        """
+        parser = setup_parser()
+        self.assertEqual(parser.parse_args(["directory"]).jobs, 1)
+        self.assertEqual(parser.parse_args(["directory", "-j", "8"]).jobs, 8)
+        self.assertEqual(parser.parse_args(["directory", "--jobs", "3"]).jobs, 3)
+
+    def test_process_options_jobs(self):
+        """
+        Tests that args are correctly processed into options, with the job count at least one
+        """
+        mocked_args = Mock(spec=Namespace)
+        mocked_args.jobs = 0
+        mocked_args.buffer_size = 100
+        mocked_args.max_depth = None
+        mocked_args.stats = False
+        mocked_args.entry_limit = None
+        mocked_args.ignore = None
+        mocked_args.pattern = None
+        mocked_args.cache = None
+        mocked_args.cache_size = 64
+        mocked_args.output_format = "tree"
+        mocked_args.spill_size = None
+        self.assertEqual(process_options_from_args(mocked_args).jobs, 1)
+        mocked_args.jobs = 6
+        self.assertEqual(process_options_from_args(mocked_args).jobs, 6)
+
+    def test_parser_buffer_size(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the buffer size
+        """
+        parser = setup_parser()
+        output = parser.parse_args(["directory", "--buffer-size", "4096"])
+        self.assertEqual(output.buffer_size, 4096)
+
+    def test_parser_max_depth(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the maximum depth,
+        and rejects depths below one
+        """
+        parser = setup_parser()
+        self.assertIsNone(parser.parse_args(["directory"]).max_depth)
+        self.assertEqual(parser.parse_args(["directory", "-L", "3"]).max_depth, 3)
+        self.assertEqual(parser.parse_args(["directory", "--max-depth", "1"]).max_depth, 1)
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["directory", "-L", "0"])
+
+    def test_parser_entry_limit(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the entry limit
+        under both of its names
+        """
+        parser = setup_parser()
+        self.assertIsNone(parser.parse_args(["directory"]).entry_limit)
+        self.assertEqual(parser.parse_args(["directory", "--filelimit", "5"]).entry_limit, 5)
+        output = parser.parse_args(["directory", "--max-entries-per-dir", "2"])
+        self.assertEqual(output.entry_limit, 2)
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["directory", "--filelimit", "0"])
+
+    def test_parser_filters(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the entry filters
+        """
+        parser = setup_parser()
+        output = parser.parse_args(["directory"])
+        self.assertFalse(output.all)
+        self.assertFalse(output.gitignore)
+        self.assertIsNone(output.ignore)
+        self.assertIsNone(output.pattern)
+        output = parser.parse_args(
+            ["directory", "-a", "--gitignore", "-I", "*.pyc", "--ignore", "build", "-P", "*.py"]
+        )
+        self.assertTrue(output.all)
+        self.assertTrue(output.gitignore)
+        self.assertEqual(output.ignore, ["*.pyc", "build"])
+        self.assertEqual(output.pattern, ["*.py"])
+
+    def test_process_args_filters(self):
+        """
+        Tests that the entry filter switches are correctly processed into settings
+        """
+        mocked_args = Mock(spec=Namespace)
+        mocked_args.colorize = False
+        mocked_args.fancy = False
+        mocked_args.reverse = False
+        mocked_args.all = True
+        mocked_args.gitignore = True
+        mocked_args.du = False
+        mocked_args.unsorted = False
+        mocked_args.watch = False
+        mocked_args.follow = False
+        mocked_args.one_file_system = False
+        output = process_settings_from_args(mocked_args)
+        self.assertEqual(output, Settings.ALL | Settings.GITIGNORE)
+
+    def test_process_options_patterns(self):
+        """
+        Tests that the ignore and include patterns are correctly processed into options
+        """
+        mocked_args = Mock(spec=Namespace)
+        mocked_args.jobs = 1
+        mocked_args.buffer_size = 100
+        mocked_args.max_depth = None
+        mocked_args.stats = False
+        mocked_args.entry_limit = None
+        mocked_args.ignore = None
+        mocked_args.pattern = None
+        mocked_args.cache = None
+        mocked_args.cache_size = 64
+        mocked_args.output_format = "tree"
+        mocked_args.spill_size = None
+        output = process_options_from_args(mocked_args)
+        self.assertEqual(output.ignore, ())
+        self.assertEqual(output.pattern, ())
+        mocked_args.ignore = ["node_modules", "*.pyc"]
+        mocked_args.pattern = ["*.py"]
+        output = process_options_from_args(mocked_args)
+        self.assertEqual(output.ignore, ("node_modules", "*.pyc"))
+        self.assertEqual(output.pattern, ("*.py",))
+
+    def test_parser_cache(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the listing cache
+        location and size, defaulting to the user's cache directory
+        """
+        parser = setup_parser()
+        output = parser.parse_args(["directory"])
+        self.assertIsNone(output.cache)
+        self.assertEqual(output.cache_size, 64)
+        output = parser.parse_args(["directory", "--cache"])
+        self.assertTrue(output.cache.endswith("scan-cache.sqlite3"))
+        output = parser.parse_args(["directory", "--cache", "file.db", "--cache-size", "8"])
+        self.assertEqual(output.cache, "file.db")
+        self.assertEqual(output.cache_size, 8)
+
+    def test_parser_output_format(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses the output format
+        """
+        parser = setup_parser()
+        self.assertEqual(parser.parse_args(["directory"]).output_format, "tree")
+        output = parser.parse_args(["directory", "--output-format", "ndjson"])
+        self.assertEqual(output.output_format, "ndjson")
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["directory", "--output-format", "xml"])
+
+    def test_parser_low_memory(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses --low-memory, and
+        that it is processed into a spill size in bytes
+        """
+        parser = setup_parser()
+        self.assertIsNone(parser.parse_args(["directory"]).spill_size)
+        self.assertEqual(parser.parse_args(["directory", "--low-memory"]).spill_size, 16)
+        output = parser.parse_args(["directory", "--low-memory", "2"])
+        self.assertEqual(output.spill_size, 2)
+        self.assertEqual(process_options_from_args(output).spill_size, 2 << 20)
+
+    def test_parser_unsorted(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses -U, and that it
+        is processed into settings
+        """
+        parser = setup_parser()
+        self.assertFalse(parser.parse_args(["directory"]).unsorted)
+        output = parser.parse_args(["directory", "--unsorted"])
+        self.assertTrue(output.unsorted)
+        output = parser.parse_args(["directory", "-U", "-n"])
+        self.assertEqual(process_settings_from_args(output), Settings.UNSORTED)
+
+    def test_parser_follow(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses -l, and that it
+        is processed into settings
+        """
+        parser = setup_parser()
+        self.assertFalse(parser.parse_args(["directory"]).follow)
+        self.assertTrue(parser.parse_args(["directory", "--follow"]).follow)
+        output = parser.parse_args(["directory", "-l", "-n"])
+        self.assertEqual(process_settings_from_args(output), Settings.FOLLOW)
+
+    def test_parser_one_file_system(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses -x, and that it
+        is processed into settings
+        """
+        parser = setup_parser()
+        self.assertFalse(parser.parse_args(["directory"]).one_file_system)
+        self.assertTrue(parser.parse_args(["directory", "--one-file-system"]).one_file_system)
+        output = parser.parse_args(["directory", "-x", "-n"])
+        self.assertEqual(process_settings_from_args(output), Settings.ONE_FILE_SYSTEM)
+
+    def test_diff_parser(self):
+        """
+        Tests that the argument parser setup by setup_diff_parser() correctly parses the trees to
+        compare and the comparison options
+        """
+        parser = setup_diff_parser()
+        output = parser.parse_args(["old", "new"])
+        self.assertEqual((output.first, output.second), ("old", "new"))
+        self.assertTrue(output.colorize)
+        self.assertFalse(output.trust_mtime)
+        output = parser.parse_args(["old", "new", "-n", "--trust-mtime", "-I", "*.pyc"])
+        self.assertFalse(output.colorize)
+        self.assertTrue(output.trust_mtime)
+        self.assertEqual(output.ignore, ["*.pyc"])
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["old"])
+
+    def test_unsorted_streams_output(self):
+        """
+        Tests that with -U, the first entries of a directory read slowly are written before the
+        directory is read to the end
+        """
+        read = []
+
+        class SlowScandir:
+            def __init__(self, directory):
+                self.entries = scandir(directory)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.entries.close()
+
+            def __iter__(self):
+                for entry in self.entries:
+                    sleep(FLUSH_INTERVAL / 10)
+                    read.append(entry.name)
+                    yield entry
+
+        stream = StringIO()
+        with TemporaryDirectory() as root:
+            for index in range(40):
+                open(path.join(root, "file%d" % index), "w").close()
+            writes = []
+            stream.write = lambda text: writes.append((text, len(read)))
+            with patch("gdtree.traverse.scandir", SlowScandir), patch(
+                "sys.argv", ["gdtree", "-n", "-U", root]
+            ), redirect_stdout(stream):
+                start()
+        first_entry = next(count for text, count in writes if "file" in text)
+        self.assertLess(first_entry, 40)
+        self.assertEqual(len(read), 40)
+
+    def test_snapshot_parsers(self):
+        """
+        Tests that the argument parsers setup by setup_snapshot_parser() and
+        setup_render_parser() correctly parse the snapshot file and options
+        """
+        parser = setup_snapshot_parser()
+        output = parser.parse_args(["directory", "-o", "tree.snap", "--du", "-x"])
+        self.assertEqual((output.directory, output.output), ("directory", "tree.snap"))
+        self.assertTrue(output.du)
+        self.assertTrue(output.one_file_system)
+        with self.assertRaises(SystemExit):
+            parser.parse_args(["directory"])
+        for option in ("-n", "--watch", "--stats", "--output-format"):
+            with self.assertRaises(SystemExit):
+                parser.parse_args(["directory", "-o", "tree.snap", option])
+        parser = setup_render_parser()
+        output = parser.parse_args(["tree.snap", "-n", "--du", "--output-format", "ndjson"])
+        self.assertEqual(output.snapshot, "tree.snap")
+        self.assertFalse(output.colorize)
+        self.assertTrue(output.du)
+        self.assertEqual(output.output_format, "ndjson")
+
+    def test_snapshot_render(self):
+        """
+        Tests that rendering a snapshot file prints the tree the snapshot was taken of
+        """
+        with TemporaryDirectory() as root:
+            tree = path.join(root, "tree")
+            makedirs(path.join(tree, "a", "b"))
+            open(path.join(tree, "a", "file"), "w").close()
+            snapshot = path.join(root, "tree.snap")
+            start_snapshot([tree, "-o", snapshot])
+            stream = StringIO()
+            with redirect_stdout(stream):
+                start_render([snapshot, "-n"])
+            expected = list(generate_tree(tree, Settings(0)))
+        self.assertEqual(stream.getvalue().splitlines(), expected)
+
+    def test_snapshot_render_matches(self):
+        """
+        Tests that gdtree render prints exactly what gdtree prints for the tree the snapshot
+        was taken of, with and without sizes
+        """
+
+        def gdtree(*args):
+            command = [sys.executable, "-m", "gdtree"] + list(args)
+            return subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+
+        with TemporaryDirectory() as root:
+            tree = path.join(root, "tree")
+            makedirs(path.join(tree, "a", "b"))
+            makedirs(path.join(tree, "empty"))
+            with open(path.join(tree, "a", "file"), "w") as file:
+                file.write("x" * 3000)
+            with open(path.join(tree, "a", "b", "small"), "w") as file:
+                file.write("x" * 10)
+            snapshot = path.join(root, "tree.snap")
+            for options in (["-n"], ["-n", "--du"], ["-n", "-f", "--du"]):
+                du = ["--du"] if "--du" in options else []
+                gdtree("snapshot", tree, "-o", snapshot, *du)
+                self.assertEqual(
+                    gdtree("render", snapshot, *options), gdtree(tree, *options), options
+                )
+
+    def test_parser_du(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses --du
+        """
+        parser = setup_parser()
+        self.assertFalse(parser.parse_args(["directory"]).du)
+        self.assertTrue(parser.parse_args(["directory", "--du"]).du)
+
+    def test_parser_stats(self):
+        """
+        Tests that the argument parser setup by setup_parser() correctly parses --stats
+        """
+        parser = setup_parser()
+        self.assertFalse(parser.parse_args(["directory"]).stats)
+        self.assertTrue(parser.parse_args(["directory", "--stats"]).stats)
+
+    def test_process_options_buffer_size(self):
+        """
+        Tests that args are correctly processed into options, with the buffer size at least one
+        """
+        mocked_args = Mock(spec=Namespace)
+        mocked_args.jobs = 1
+        mocked_args.buffer_size = 0
+        mocked_args.max_depth = None
+        mocked_args.stats = False
+        mocked_args.entry_limit = None
+        mocked_args.ignore = None
+        mocked_args.pattern = None
+        mocked_args.cache = None
+        mocked_args.cache_size = 64
+        mocked_args.output_format = "tree"
+        mocked_args.spill_size = None
+        self.assertEqual(process_options_from_args(mocked_args).buffer_size, 1)
+        mocked_args.buffer_size = 512
+        self.assertEqual(process_options_from_args(mocked_args).buffer_size, 512)
+        with patch.dict("gdtree.app.environ", {"LS_COLORS": "di=01;34"}):
+            self.assertEqual(process_options_from_args(mocked_args).ls_colors, "di=01;34")
+        with patch.dict("gdtree.app.environ", {"LS_COLORS": ""}):
+            self.assertIsNone(process_options_from_args(mocked_args).ls_colors)
+
+    def test_lazy_imports(self):
+        """
+        Tests that starting the command line does not import the modules only some runs need
+        """
+        output = subprocess.run(
+            [sys.executable, "-c", "import sys, gdtree.app; print(*sys.modules)"],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        ).stdout
+        imported = set(output.split())
+        for module in (
+            "colorama",
+            "concurrent.futures",
+            "ctypes",
+            "fnmatch",
+            "gdtree.cache",
+            "gdtree.diff",
+            "gdtree.du",
+            "gdtree.patterns",
+            "gdtree.snapshot",
+            "gdtree.spill",
+            "gdtree.watch",
+            "json",
+            "mmap",
+            "sqlite3",
+            "tempfile",
+            "threading",
+        ):
+            self.assertNotIn(module, imported)
+
+    def test_init_colors(self):
+        """
+        Tests that colors are only written to terminals
+        """
+        with patch("gdtree.app.sys") as mocked_sys:
+            mocked_sys.platform = "linux"
+            mocked_sys.stdout.isatty.return_value = False
+            self.assertEqual(init_colors(Settings.COLORIZE | Settings.FANCY), Settings.FANCY)
+            mocked_sys.stdout.isatty.return_value = True
+            self.assertEqual(init_colors(Settings.COLORIZE), Settings.COLORIZE)
+            self.assertEqual(init_colors(Settings.FANCY), Settings.FANCY)
+
 
 if __name__ == "__main__":
     main()
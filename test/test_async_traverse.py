@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os import lstat, mkdir, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+from gdtree.async_traverse import async_reverse_traverse_directory, async_traverse_directory
+from gdtree.traverse import reverse_traverse_directory, traverse_directory
+
+
+def _flatten(entries):
+    return [(name, type, list(history)) for name, type, history in entries]
+
+
+async def _collect(traversal):
+    return _flatten([entry async for entry in traversal])
+
+
+class TestAsyncTraversal(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = self.tempdir.name
+        for top in ("b", "a", "c"):
+            mkdir(path.join(self.root, top))
+            for sub in ("y", "x"):
+                mkdir(path.join(self.root, top, sub))
+                for name in ("2.txt", "1.txt"):
+                    open(path.join(self.root, top, sub, name), "w").close()
+        open(path.join(self.root, "file.txt"), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_order(self):
+        """
+        Tests that the asynchronous traversal yields the same entries in the same order as the
+        synchronous traversal, whatever the concurrency
+        """
+        expected = _flatten(traverse_directory(self.root))
+        for jobs in (1, 4):
+            output = asyncio.run(_collect(async_traverse_directory(self.root, jobs=jobs)))
+            self.assertEqual(output, expected)
+
+    def test_reverse_order(self):
+        """
+        Tests that the asynchronous reverse traversal yields the same entries in the same order
+        as the synchronous reverse traversal
+        """
+        expected = _flatten(reverse_traverse_directory(self.root))
+        output = asyncio.run(_collect(async_reverse_traverse_directory(self.root)))
+        self.assertEqual(output, expected)
+
+    def test_max_depth_and_executor(self):
+        """
+        Tests that a maximum depth is applied, and that a given executor is used and left open
+        """
+        expected = _flatten(traverse_directory(self.root, max_depth=2))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            output = asyncio.run(
+                _collect(async_traverse_directory(self.root, max_depth=2, executor=executor))
+            )
+            self.assertEqual(executor.submit(len, "ab").result(), 2)
+        self.assertEqual(output, expected)
+
+    def test_low_memory_off_loop(self):
+        """
+        Tests that compact listings, which take statuses and read spilled runs as they are
+        iterated, are read on the executor rather than on the event loop
+        """
+        options = {"with_status": True, "spill_size": 1}
+        expected = [entry[:3] for entry in traverse_directory(self.root, **options)]
+        expected = _flatten(expected)
+        threads = set()
+
+        def recording_lstat(entry_path):
+            threads.add(threading.get_ident())
+            return lstat(entry_path)
+
+        async def collect():
+            traversal = async_traverse_directory(self.root, jobs=2, **options)
+            return _flatten([entry[:3] async for entry in traversal])
+
+        with patch("gdtree.spill.lstat", side_effect=recording_lstat), patch(
+            "gdtree.async_traverse.CHUNK_SIZE", 2
+        ):
+            output = asyncio.run(collect())
+        self.assertEqual(output, expected)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_close(self):
+        """
+        Tests that the traversal can be abandoned partway through
+        """
+
+        async def first_entry():
+            traversal = async_traverse_directory(self.root)
+            entry = await traversal.__anext__()
+            await traversal.aclose()
+            return entry
+
+        self.assertEqual(asyncio.run(first_entry())[0], "a")
+
+    def test_cancel(self):
+        """
+        Tests that cancelling the task iterating the traversal stops it
+        """
+
+        async def cancelled():
+            seen = []
+            started = asyncio.Event()
+
+            async def consume():
+                async for entry in async_traverse_directory(self.root):
+                    seen.append(entry)
+                    started.set()
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(consume())
+            await started.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return seen
+
+        self.assertLess(len(asyncio.run(cancelled())), 22)
+
+    def test_missing_directory(self):
+        """
+        Tests that a directory that cannot be listed yields no entries
+        """
+        output = asyncio.run(
+            _collect(async_traverse_directory(path.join(self.root, "missing", "dir")))
+        )
+        self.assertEqual(output, [])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from contextlib import redirect_stderr
+from io import StringIO
+from os import makedirs, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+from gdtree.app import generate_output
+from gdtree.batch import output_path, read_roots, run_batch, setup_batch_parser, start_batch
+from gdtree.utils import Options, Settings
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.roots = []
+        for index in range(6):
+            root = path.join(self.tempdir.name, "roots", "root%d" % index)
+            makedirs(path.join(root, "sub"))
+            for file in range(index):
+                open(path.join(root, "sub", "file%d" % file), "w").close()
+            self.roots.append(root)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_read_roots(self):
+        """
+        Tests that roots are read one per line, skipping blank lines
+        """
+        stream = StringIO("%s\n\n  \n%s\n" % (self.roots[0], self.roots[1]))
+        self.assertEqual(list(read_roots(stream)), self.roots[:2])
+
+    def test_combined(self):
+        """
+        Tests that trees are written to one stream in the order the roots are given, however
+        many workers print them
+        """
+        options = Options()
+        roots = list(reversed(self.roots))
+        expected = []
+        for root in roots:
+            expected.append("==> %s <==" % root)
+            expected.extend(generate_output(root, Settings(0), options))
+            expected.append("")
+        for workers in (1, 3):
+            stream = StringIO()
+            self.assertEqual(run_batch(roots, Settings(0), options, workers, stream=stream), 0)
+            self.assertEqual(stream.getvalue(), "\n".join(expected))
+
+    def test_combined_ndjson(self):
+        """
+        Tests that machine-readable trees are written to one stream without headers
+        """
+        options = Options(output_format="ndjson")
+        stream = StringIO()
+        run_batch(self.roots, Settings(0), options, 2, stream=stream)
+        lines = stream.getvalue().splitlines()
+        # Each root holds sub and its files
+        self.assertEqual(len(lines), sum(index + 1 for index in range(len(self.roots))))
+        self.assertFalse(any(line.startswith("==>") for line in lines))
+
+    def test_output_dir(self):
+        """
+        Tests that each root's tree is written to its own file, mirroring the root's path
+        """
+        output_dir = path.join(self.tempdir.name, "out")
+        options = Options()
+        stream = StringIO()
+        self.assertEqual(
+            run_batch(self.roots, Settings(0), options, 2, output_dir, stream=stream), 0
+        )
+        self.assertEqual(stream.getvalue(), "")
+        for root in self.roots:
+            destination = output_path(output_dir, root, "tree")
+            self.assertTrue(destination.startswith(path.join(output_dir, "")))
+            self.assertTrue(destination.endswith(path.basename(root) + ".txt"))
+            with open(destination) as file:
+                expected = list(generate_output(root, Settings(0), options))
+                self.assertEqual(file.read().splitlines(), expected)
+
+    def test_duplicate_roots(self):
+        """
+        Tests that a root listed twice is written to two files, rather than twice to one
+        """
+        output_dir = path.join(self.tempdir.name, "out")
+        roots = [self.roots[1], self.roots[2], self.roots[1]]
+        run_batch(roots, Settings(0), Options(), 2, output_dir, stream=StringIO())
+        first = output_path(output_dir, self.roots[1], "tree")
+        second = first[: -len(".txt")] + ".2.txt"
+        for destination in (first, second):
+            with open(destination) as file:
+                expected = list(generate_output(self.roots[1], Settings(0), Options()))
+                self.assertEqual(file.read().splitlines(), expected)
+        taken = set()
+        paths = [output_path(output_dir, root, "tree", taken) for root in roots]
+        self.assertEqual(paths, [first, output_path(output_dir, self.roots[2], "tree"), second])
+
+    def test_failures(self):
+        """
+        Tests that roots which are missing or are not directories are counted as failures,
+        without stopping the other roots from being printed
+        """
+        missing = path.join(self.tempdir.name, "missing")
+        file = path.join(self.tempdir.name, "file")
+        open(file, "w").close()
+        stream = StringIO()
+        with redirect_stderr(StringIO()) as errors:
+            failures = run_batch(
+                [missing, self.roots[0], file], Settings(0), Options(), 2, stream=stream
+            )
+        self.assertEqual(failures, 2)
+        self.assertIn(missing, errors.getvalue())
+        self.assertIn(file, errors.getvalue())
+        self.assertEqual(stream.getvalue().splitlines()[0], "==> %s <==" % self.roots[0])
+
+    def test_start_batch(self):
+        """
+        Tests that trees written to files are never colored, and that a roots file that
+        cannot be read is reported as a usage error
+        """
+        output_dir = path.join(self.tempdir.name, "out")
+        roots_file = path.join(self.tempdir.name, "roots.txt")
+        with open(roots_file, "w") as file:
+            file.write(self.roots[2] + "\n")
+        with patch("sys.stdout.isatty", return_value=True):
+            failures = start_batch([roots_file, "-o", output_dir, "-w", "1"])
+        self.assertEqual(failures, 0)
+        with open(output_path(output_dir, self.roots[2], "tree")) as file:
+            self.assertNotIn("\x1b", file.read())
+        with redirect_stderr(StringIO()) as errors, self.assertRaises(SystemExit):
+            start_batch([path.join(self.tempdir.name, "missing.txt")])
+        self.assertIn("missing.txt", errors.getvalue())
+
+    def test_parser(self):
+        """
+        Tests that batch mode takes the tree options
+        """
+        args = setup_batch_parser().parse_args(["roots.txt", "-w", "2", "-o", "out", "-a"])
+        self.assertEqual(args.roots, "roots.txt")
+        self.assertEqual(args.workers, 2)
+        self.assertEqual(args.output_dir, "out")
+        self.assertTrue(args.all)
+        self.assertEqual(setup_batch_parser().parse_args([]).roots, "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from os import mkdir, path, scandir, stat
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+from gdtree.cache import ScanCache
+from gdtree.traverse import traverse_directory
+from gdtree.utils import EntryType
+
+
+@patch("gdtree.cache.RACY_INTERVAL", 0)
+class TestScanCache(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = path.join(self.tempdir.name, "tree")
+        self.filename = path.join(self.tempdir.name, "cache", "scan-cache.sqlite3")
+        mkdir(self.root)
+        mkdir(path.join(self.root, "sub"))
+        for name in ("file", path.join("sub", "other")):
+            open(path.join(self.root, name), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _listing(self, name):
+        return [(name, path.join(self.root, name), EntryType.FILE, None)]
+
+    def test_round_trip(self):
+        """
+        Tests that a cached listing is returned while the directory is unchanged, across
+        instances of the cache
+        """
+        listing = self._listing("file") + [("... 3 more", "", EntryType.TRUNCATED, None)]
+        cache = ScanCache(self.filename)
+        cache.put(self.root, "variant", stat(self.root), listing)
+        cache.close()
+        cache = ScanCache(self.filename)
+        output = cache.get(self.root, "variant", stat(self.root))
+        other_variant = cache.get(self.root, "other", stat(self.root))
+        cache.close()
+        self.assertEqual(output, listing)
+        self.assertIsNone(other_variant)
+
+    def test_empty_listing(self):
+        """
+        Tests that the listing of an empty directory is cached
+        """
+        cache = ScanCache(self.filename)
+        cache.put(self.root, "variant", stat(self.root), [])
+        cache.close()
+        cache = ScanCache(self.filename)
+        self.assertEqual(cache.get(self.root, "variant", stat(self.root)), [])
+        cache.close()
+
+    def test_modified(self):
+        """
+        Tests that the listing of a directory modified since it was cached is not returned
+        """
+        cache = ScanCache(self.filename)
+        status = stat(self.root)
+        cache.put(self.root, "variant", status, self._listing("file"))
+        cache.close()
+        open(path.join(self.root, "new"), "w").close()
+        modified = stat(self.root)
+        if modified.st_mtime_ns == status.st_mtime_ns:
+            self.skipTest("filesystem timestamps are too coarse")
+        cache = ScanCache(self.filename)
+        self.assertIsNone(cache.get(self.root, "variant", modified))
+        cache.close()
+
+    def test_racy(self):
+        """
+        Tests that directories modified just before they were listed are not cached
+        """
+        with patch("gdtree.cache.RACY_INTERVAL", 10 ** 18):
+            cache = ScanCache(self.filename)
+            cache.put(self.root, "variant", stat(self.root), self._listing("file"))
+            cache.close()
+        cache = ScanCache(self.filename)
+        self.assertIsNone(cache.get(self.root, "variant", stat(self.root)))
+        cache.close()
+
+    def test_eviction(self):
+        """
+        Tests that the least recently used listings are evicted past the maximum size
+        """
+        status = stat(self.root)
+        cache = ScanCache(self.filename)
+        for index in range(10):
+            cache.put("/directory/%d" % index, "variant", status, self._listing("file"))
+        cache.close()
+        # Use the last listing, so that it is the most recently used, and leave room for it alone
+        cache = ScanCache(self.filename, max_size=20)
+        self.assertIsNotNone(cache.get("/directory/9", "variant", status))
+        cache.close()
+        cache = ScanCache(self.filename)
+        kept = [
+            index
+            for index in range(10)
+            if cache.get("/directory/%d" % index, "variant", status) is not None
+        ]
+        cache.close()
+        self.assertEqual(kept, [9])
+
+    def test_unusable(self):
+        """
+        Tests that a cache which cannot be opened misses rather than failing
+        """
+        blocker = path.join(self.tempdir.name, "blocker")
+        open(blocker, "w").close()
+        cache = ScanCache(path.join(blocker, "scan-cache.sqlite3"))
+        cache.put(self.root, "variant", stat(self.root), self._listing("file"))
+        self.assertIsNone(cache.get(self.root, "variant", stat(self.root)))
+        cache.close()
+
+    def test_traverse_cached(self):
+        """
+        Tests that a traversal reuses cached listings of unchanged directories without listing
+        them, and yields the same entries
+        """
+        cache = ScanCache(self.filename)
+        expected = list(traverse_directory(self.root, cache=cache))
+        cache.close()
+        cache = ScanCache(self.filename)
+        with patch("gdtree.traverse.scandir", wraps=scandir) as mocked_scandir:
+            output = list(traverse_directory(self.root, cache=cache))
+        cache.close()
+        self.assertEqual(
+            [(name, type, list(history)) for name, type, history in output],
+            [(name, type, list(history)) for name, type, history in expected],
+        )
+        mocked_scandir.assert_not_called()
+        self.assertEqual(cache.hits, 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+from gdtree.diff import Change, DirectoryTree, SnapshotTree, diff_lines, diff_trees
+from gdtree.snapshot import TreeSnapshot
+from gdtree.utils import EntryType, Settings
+
+
+def _flatten(nodes, depth=0):
+    flat = []
+    for node in nodes:
+        flat.append((depth, node.name, node.change, node.type))
+        flat.extend(_flatten(node.children, depth + 1))
+    return flat
+
+
+class TestDiff(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.left = path.join(self.tempdir.name, "left")
+        self.right = path.join(self.tempdir.name, "right")
+        for root in (self.left, self.right):
+            mkdir(root)
+            for directory in ("lib", "same", path.join("same", "deep")):
+                mkdir(path.join(root, directory))
+            open(path.join(root, "same", "deep", "file"), "w").close()
+            open(path.join(root, "lib", "kept"), "w").close()
+        open(path.join(self.left, "lib", "old"), "w").close()
+        open(path.join(self.right, "lib", "new"), "w").close()
+        mkdir(path.join(self.left, "bin"))
+        open(path.join(self.left, "bin", "tool"), "w").close()
+        open(path.join(self.right, "bin"), "w").close()
+        mkdir(path.join(self.right, "added"))
+        open(path.join(self.right, "added", "inside"), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    expected = [
+        (0, "added", Change.ADDED, EntryType.DIRECTORY),
+        (0, "bin", Change.TYPE_CHANGED, EntryType.FILE),
+        (0, "lib", Change.CONTAINS_CHANGES, EntryType.DIRECTORY),
+        (1, "new", Change.ADDED, EntryType.FILE),
+        (1, "old", Change.REMOVED, EntryType.FILE),
+    ]
+
+    def test_directories(self):
+        """
+        Tests that the differences between two directories are found, with unchanged
+        directories left out
+        """
+        output = diff_trees(DirectoryTree(self.left), DirectoryTree(self.right))
+        self.assertEqual(_flatten(output), self.expected)
+
+    def test_same_directory(self):
+        """
+        Tests that a directory compared with itself is not walked
+        """
+        tree = DirectoryTree(self.left)
+        with patch.object(tree, "children", wraps=tree.children) as mocked_children:
+            self.assertEqual(diff_trees(tree, tree), [])
+        self.assertEqual(mocked_children.call_count, 2)
+
+    def test_snapshots(self):
+        """
+        Tests that snapshots are compared like directories, and that subtrees with equal
+        digests are skipped
+        """
+        left = SnapshotTree(TreeSnapshot.scan(self.left))
+        right = SnapshotTree(TreeSnapshot.scan(self.right))
+        with patch.object(left, "children", wraps=left.children) as mocked_children:
+            output = diff_trees(left, right)
+        self.assertEqual(_flatten(output), self.expected)
+        # The top level and lib, but not the identical same directory
+        self.assertEqual(mocked_children.call_count, 2)
+        mixed = diff_trees(DirectoryTree(self.left), right)
+        self.assertEqual(_flatten(mixed), self.expected)
+
+    def test_trust_mtime(self):
+        """
+        Tests that directories with equal modification times are skipped if they are trusted
+        """
+        left = DirectoryTree(self.left, trust_mtime=True)
+        right = DirectoryTree(self.right, trust_mtime=True)
+        with patch.object(left, "key", return_value=("mtime", 1)), patch.object(
+            right, "key", return_value=("mtime", 1)
+        ):
+            output = diff_trees(left, right)
+        self.assertEqual([node.name for node in output], ["added", "bin"])
+
+    def test_lines(self):
+        """
+        Tests that the differences are printed as a tree with a marker per change
+        """
+        left, right = DirectoryTree(self.left), DirectoryTree(self.right)
+        output = list(diff_lines(left, right, Settings(0)))
+        self.assertEqual(
+            output,
+            [
+                "left -> right",
+                "├── + added",
+                "├── ~ bin (directory -> file)",
+                "└── lib",
+                "    ├── + new",
+                "    └── - old",
+                "2 added, 1 removed, 1 changed type",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
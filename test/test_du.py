@@ -0,0 +1,120 @@
+from os import link, mkdir, path, stat_result
+from stat import S_IFDIR, S_IFREG
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.app import generate_tree
+from gdtree.du import du_lines, format_size
+from gdtree.end_state_history import EndStateHistory
+from gdtree.filestring import build_prefix
+from gdtree.utils import EntryType, Settings
+
+
+def _status(size, directory=False, inode=0, links=1):
+    mode = S_IFDIR if directory else S_IFREG
+    return stat_result((mode | 0o644, inode, 1, links, 0, 0, size, 0, 0, 0))
+
+
+def _lines(entries, root_size=0):
+    entries = [
+        (name, type, EndStateHistory(history), status)
+        for name, type, history, status in entries
+    ]
+    return du_lines("root", entries, build_prefix, lambda name, type: name, root_size)
+
+
+class TestDu(TestCase):
+    def test_format_size(self):
+        """
+        Tests that sizes are formatted in at most five characters
+        """
+        self.assertEqual(format_size(0), "0")
+        self.assertEqual(format_size(1023), "1023")
+        self.assertEqual(format_size(1024), "1.0K")
+        self.assertEqual(format_size(15 * 1024), "15K")
+        self.assertEqual(format_size(1023 * 1024), "1023K")
+        self.assertEqual(format_size(1024 * 1024 - 1), "1.0M")
+        self.assertEqual(format_size(3 << 30), "3.0G")
+
+    def test_totals(self):
+        """
+        Tests that directory sizes are the totals of their subtrees, written into their lines
+        """
+        output = list(
+            _lines(
+                [
+                    ("a", EntryType.DIRECTORY, [False], _status(100, directory=True)),
+                    ("b", EntryType.DIRECTORY, [False, True], _status(10, directory=True)),
+                    ("x", EntryType.FILE, [False, True, True], _status(1)),
+                    ("e", EntryType.DIRECTORY, [False], _status(100, directory=True)),
+                    ("z", EntryType.FILE, [True], _status(2000)),
+                ],
+                root_size=5,
+            )
+        )
+        self.assertEqual(
+            output,
+            [
+                "root",
+                "├── [  111]  a",
+                "│   └── [   11]  b",
+                "│       └── [    1]  x",
+                "├── [  100]  e",
+                "└── [ 2.0K]  z",
+                "2.2K used in 3 directories, 2 files",
+            ],
+        )
+
+    def test_hard_links(self):
+        """
+        Tests that a file with several hard links is only counted once
+        """
+        linked = _status(500, inode=7, links=2)
+        output = list(
+            _lines(
+                [
+                    ("a", EntryType.FILE, [False], linked),
+                    ("b", EntryType.FILE, [False], linked),
+                    ("c", EntryType.FILE, [True], _status(500, inode=8)),
+                ]
+            )
+        )
+        self.assertEqual(
+            output[1:4], ["├── [  500]  a", "├── [    0]  b", "└── [  500]  c"]
+        )
+        self.assertEqual(output[-1], "1000 used in 0 directories, 3 files")
+
+    def test_streaming(self):
+        """
+        Tests that lines are released as soon as no directory above them waits for its size
+        """
+        lines = _lines(
+            [
+                ("a", EntryType.FILE, [False], _status(1)),
+                ("d", EntryType.DIRECTORY, [False], _status(0, directory=True)),
+                ("x", EntryType.FILE, [False, True], _status(2)),
+                ("z", EntryType.FILE, [True], _status(3)),
+            ]
+        )
+        self.assertEqual(next(lines), "root")
+        self.assertEqual(next(lines), "├── [    1]  a")
+        self.assertEqual(next(lines), "├── [    2]  d")
+        lines.close()
+
+    def test_generate_tree_du(self):
+        """
+        Tests that the disk usage tree of a directory counts every file once
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+            with open(path.join(root, "sub", "file"), "w") as file:
+                file.write("x" * 2048)
+            link(path.join(root, "sub", "file"), path.join(root, "zlink"))
+            output = list(generate_tree(root, Settings.DU))
+        self.assertRegex(output[1], r"^├── \[ *\S+\]  sub$")
+        self.assertEqual(output[2], "│   └── [ 2.0K]  file")
+        self.assertEqual(output[3], "└── [    0]  zlink")
+        self.assertTrue(output[-1].endswith(" used in 1 directories, 2 files"))
+
+
+if __name__ == "__main__":
+    main()
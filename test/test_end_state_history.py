@@ -1,6 +1,8 @@
 from unittest import TestCase, main
-from gdtree.utils import MAX_DEPTH
-from gdtree.end_state_history import DepthError, EndStateHistory
+from gdtree.end_state_history import EndStateHistory
+
+# A depth well past the size of a machine word
+DEEP = 200
 
 
 class TestEndStateHistory(TestCase):
@@ -11,14 +13,14 @@ class TestEndStateHistory(TestCase):
         entry = EndStateHistory()
         self.assertEqual(len(entry), 0)
 
-    def test_construction_length_error(self):
+    def test_construction_deep(self):
         """
-        Tests that the length of the input boolean array does not exceed
-        maximum allowed depth
+        Tests that a history of any depth can be constructed
         """
-        history = [False] * (MAX_DEPTH + 1)
-        with self.assertRaises(ValueError):
-            entry = EndStateHistory(history)
+        history = [index % 3 == 0 for index in range(DEEP)]
+        entry = EndStateHistory(history)
+        self.assertEqual(len(entry), DEEP)
+        self.assertEqual(list(entry), history)
 
     def test_construction_empty_input_length(self):
         """
@@ -42,13 +44,13 @@ class TestEndStateHistory(TestCase):
         entry = EndStateHistory(history)
         self.assertEqual(len(entry), 7)
 
-    def test_len_max_length(self):
+    def test_len_deep(self):
         """
-        Tests that the history length is properly returned at maximum depth
+        Tests that the history length is properly returned for a deep history
         """
-        history = [False] * MAX_DEPTH
+        history = [False] * DEEP
         entry = EndStateHistory(history)
-        self.assertEqual(len(entry), MAX_DEPTH)
+        self.assertEqual(len(entry), DEEP)
 
     def test_history_append_length(self):
         """
@@ -66,14 +68,14 @@ class TestEndStateHistory(TestCase):
         entry.append(False)
         self.assertFalse(entry[6])
 
-    def test_history_append_error(self):
+    def test_history_append_deep(self):
         """
-        Tests that an error is raised when trying to update history
-        past the max possible depth
+        Tests that values can be appended to a deep history
         """
-        entry = EndStateHistory([False] * MAX_DEPTH)
-        with self.assertRaises(DepthError):
-            entry.append(True)
+        entry = EndStateHistory([False] * DEEP)
+        entry.append(True)
+        self.assertEqual(len(entry), DEEP + 1)
+        self.assertTrue(entry[DEEP])
 
     def test_history_append_start(self):
         """
@@ -138,25 +140,15 @@ class TestEndStateHistory(TestCase):
         for state, expected_output in zip(entry_one, output_values):
             self.assertEqual(state, expected_output)
 
-    def test_extend_error(self):
+    def test_extend_deep(self):
         """
-        Tests that a depth error is raised when attempting to extend
-        one history past the maximum depth
+        Tests that a deep history can be extended with another history
         """
-        entry_one = EndStateHistory([False] * MAX_DEPTH)
+        entry_one = EndStateHistory([False] * DEEP)
         entry_two = EndStateHistory([False, False, True])
-        with self.assertRaises(DepthError):
-            entry_one.extend(entry_two)
-
-    def test_extend_error_edge(self):
-        """
-        Tests that a depth error is raised when attempting to extend
-        one history exactly one past the maximum depth
-        """
-        entry_one = EndStateHistory([False] * (MAX_DEPTH - 2))
-        entry_two = EndStateHistory([False, False, True])
-        with self.assertRaises(DepthError):
-            entry_one.extend(entry_two)
+        entry_one.extend(entry_two)
+        self.assertEqual(len(entry_one), DEEP + 3)
+        self.assertEqual(list(entry_one), [False] * (DEEP + 2) + [True])
 
     def test_extend_empty(self):
         """
@@ -189,6 +181,32 @@ class TestEndStateHistory(TestCase):
         entry_one.extend(entry_two)
         self.assertEqual(len(entry_one), 6)
 
+    def test_child(self):
+        """
+        Tests that a child history holds the parent's values followed by the new end state
+        """
+        entry = EndStateHistory([True, False, True])
+        child = entry.child(True)
+        self.assertEqual(list(child), [True, False, True, True])
+        self.assertEqual(list(entry.child(False)), [True, False, True, False])
+
+    def test_child_no_change(self):
+        """
+        Tests that creating a child history does not change the parent history
+        """
+        entry = EndStateHistory([True, False, True])
+        entry.child(True)
+        self.assertEqual(len(entry), 3)
+        self.assertEqual(list(entry), [True, False, True])
+
+    def test_child_empty(self):
+        """
+        Tests that a child history can be created from an empty history
+        """
+        child = EndStateHistory().child(True)
+        self.assertEqual(len(child), 1)
+        self.assertTrue(child[0])
+
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,20 @@
 from unittest import TestCase, main
 from gdtree.filestring import (
+    DEFAULT_COLORS,
+    RESET,
+    ColorScheme,
+    color_scheme,
     create_filestring_builder,
     get_filestring_color,
     type_colorize,
     _get_prefix,
     build_prefix,
     build_fancy_prefix,
+    _PrefixRenderer,
+    PREFIX_REGULAR,
+    PREFIX_FANCY,
+    EXT,
+    FILE_EXT,
 )
 from gdtree.utils import EntryType, Settings
 from colorama import Fore
@@ -168,6 +177,39 @@ class TestFilestring(TestCase):
         expected_output = "╚══ "
         self.assertEqual(output_string, expected_output)
 
+    def test_prefix_generation_empty(self):
+        """
+        Tests that an empty history produces an empty prefix
+        """
+        self.assertEqual(build_prefix(EndStateHistory()), "")
+
+    def test_prefix_generation_deep(self):
+        """
+        Tests that the proper prefix is generated for a history deeper than the prefix cache
+        """
+        states = [index % 3 == 0 for index in range(50)]
+        renderer = _PrefixRenderer(PREFIX_REGULAR, maxsize=8)
+        expected_output = "".join(EXT[state] for state in states[:-1]) + FILE_EXT[states[-1]]
+        self.assertEqual(renderer(EndStateHistory(states)), expected_output)
+
+    def test_prefix_renderer_cache_bound(self):
+        """
+        Tests that the prefix renderer caches no more indentations than its bound, and still
+        renders correctly after evictions
+        """
+        renderer = _PrefixRenderer(PREFIX_FANCY, maxsize=4)
+        reference = _PrefixRenderer(PREFIX_FANCY)
+        histories = [
+            [True, False, False, True, True, False],
+            [False, True, True],
+            [True, False, False, True, True, True],
+            [False, False, False, False, False, False, False],
+        ]
+        for states in histories * 2:
+            history = EndStateHistory(states)
+            self.assertEqual(renderer(history), reference(history))
+            self.assertLessEqual(len(renderer.indentations), 4)
+
     def test_filestring_builder_basic(self):
         """
         Tests that the filestring builder is correctly created from default
@@ -247,5 +289,69 @@ class TestFilestring(TestCase):
         self.assertEqual(output, expected_output)
 
 
+
+class TestColorScheme(TestCase):
+    def test_default_colors(self):
+        """
+        Tests that the default colors match colorama's, leaving files uncolored
+        """
+        self.assertIs(color_scheme(None), DEFAULT_COLORS)
+        self.assertIs(color_scheme(""), DEFAULT_COLORS)
+        self.assertEqual(
+            DEFAULT_COLORS.colorize("bin", EntryType.DIRECTORY), Fore.CYAN + "bin" + Fore.WHITE
+        )
+        self.assertEqual(DEFAULT_COLORS.colorize("a.tar", EntryType.FILE), "a.tar")
+
+    def test_parse_types(self):
+        """
+        Tests that LS_COLORS colors entry types, with GNU ls's colors for those it leaves out
+        """
+        colors = ColorScheme.parse("di=01;33:ln=target:fi=00:or=40;31:bogus")
+        self.assertEqual(
+            colors.colorize("src", EntryType.DIRECTORY), "\x1b[01;33msrc" + RESET
+        )
+        self.assertEqual(colors.colorize("link", EntryType.SYMLINK), "\x1b[01;36mlink" + RESET)
+        self.assertEqual(colors.colorize("run", EntryType.EXECUTABLE), "\x1b[01;32mrun" + RESET)
+        self.assertEqual(colors.colorize("notes", EntryType.FILE), "notes")
+        self.assertEqual(colors.colorize("... 3 more", EntryType.TRUNCATED), "... 3 more")
+        with self.assertRaises(ValueError):
+            colors.colorize("name", 0)
+
+    def test_parse_suffixes(self):
+        """
+        Tests that files are colored by the longest suffix of their names in LS_COLORS, matching
+        extensions without regard to case
+        """
+        colors = ColorScheme.parse("fi=37:*.gz=01;31:*.tar.gz=01;35:*~=90:*.PNG=35:*.c=32")
+        self.assertEqual(colors.colorize("a.gz", EntryType.FILE), "\x1b[01;31ma.gz" + RESET)
+        self.assertEqual(
+            colors.colorize("a.tar.gz", EntryType.FILE), "\x1b[01;35ma.tar.gz" + RESET
+        )
+        self.assertEqual(colors.colorize("notes~", EntryType.FILE), "\x1b[90mnotes~" + RESET)
+        self.assertEqual(colors.colorize("image.png", EntryType.FILE), "\x1b[35mimage.png" + RESET)
+        self.assertEqual(colors.colorize("main.C", EntryType.FILE), "\x1b[32mmain.C" + RESET)
+        self.assertEqual(colors.colorize("README", EntryType.FILE), "\x1b[37mREADME" + RESET)
+        # Only files are colored by their names
+        self.assertEqual(
+            colors.colorize("run.gz", EntryType.EXECUTABLE), "\x1b[01;32mrun.gz" + RESET
+        )
+
+    def test_parsed_once(self):
+        """
+        Tests that each LS_COLORS specification is only parsed once
+        """
+        self.assertIs(color_scheme("di=34:*.py=33"), color_scheme("di=34:*.py=33"))
+
+    def test_filestring_builder(self):
+        """
+        Tests that the filestring builder colors names with the scheme given
+        """
+        builder = create_filestring_builder(Settings.COLORIZE, colors=ColorScheme.parse("*.py=33"))
+        history = EndStateHistory([True])
+        self.assertEqual(builder("a.py", EntryType.FILE, history), "└── \x1b[33ma.py" + RESET)
+        uncolored = create_filestring_builder(Settings(0), colors=ColorScheme.parse("*.py=33"))
+        self.assertEqual(uncolored("a.py", EntryType.FILE, history), "└── a.py")
+
+
 if __name__ == "__main__":
     main()
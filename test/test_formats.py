@@ -0,0 +1,129 @@
+from json import loads
+from os import mkdir, path, symlink
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.app import generate_output
+from gdtree.end_state_history import EndStateHistory
+from gdtree.formats import json_lines, ndjson_lines
+from gdtree.utils import EntryType, Options, Settings
+
+# A traversal of:
+# root
+# ├── a
+# │   ├── b
+# │   │   └── y
+# │   └── x
+# ├── e
+# └── z
+ENTRIES = [
+    ("a", EntryType.DIRECTORY, [False]),
+    ("b", EntryType.DIRECTORY, [False, False]),
+    ("y", EntryType.FILE, [False, False, True]),
+    ("x", EntryType.EXECUTABLE, [False, True]),
+    ("e", EntryType.DIRECTORY, [False]),
+    ("z", EntryType.SYMLINK, [True]),
+]
+
+
+def _entries(entries=ENTRIES):
+    return [(name, type, EndStateHistory(history)) for name, type, history in entries]
+
+
+class TestFormats(TestCase):
+    def test_ndjson(self):
+        """
+        Tests that a JSON object is generated per entry with its relative path and position
+        """
+        output = [loads(line) for line in ndjson_lines(_entries())]
+        self.assertEqual(
+            [record["path"] for record in output], ["a", "a/b", "a/b/y", "a/x", "e", "z"]
+        )
+        self.assertEqual(
+            output[3],
+            {"name": "x", "path": "a/x", "type": "EXECUTABLE", "depth": 2, "is_last": True},
+        )
+        self.assertEqual([record["depth"] for record in output], [1, 2, 3, 2, 1, 1])
+
+    def test_json(self):
+        """
+        Tests that the generated lines form a single JSON document nesting the entries
+        """
+        output = loads("\n".join(json_lines("root", _entries())))
+        self.assertEqual(
+            output,
+            {
+                "name": "root",
+                "type": "DIRECTORY",
+                "contents": [
+                    {
+                        "name": "a",
+                        "type": "DIRECTORY",
+                        "contents": [
+                            {
+                                "name": "b",
+                                "type": "DIRECTORY",
+                                "contents": [{"name": "y", "type": "FILE"}],
+                            },
+                            {"name": "x", "type": "EXECUTABLE"},
+                        ],
+                    },
+                    {"name": "e", "type": "DIRECTORY", "contents": []},
+                    {"name": "z", "type": "SYMLINK"},
+                ],
+                "directories": 3,
+                "files": 3,
+            },
+        )
+
+    def test_json_edges(self):
+        """
+        Tests that empty trees, trailing empty directories and escaped names form valid JSON
+        """
+        output = loads("\n".join(json_lines('q"uote', [])))
+        self.assertEqual(output["name"], 'q"uote')
+        self.assertEqual(output["contents"], [])
+        entries = _entries(
+            [("a", EntryType.DIRECTORY, [False]), ("b", EntryType.DIRECTORY, [True])]
+        )
+        output = loads("\n".join(json_lines("root", entries)))
+        self.assertEqual([entry["contents"] for entry in output["contents"]], [[], []])
+
+    def test_generate_output(self):
+        """
+        Tests that the output format option picks the format generated
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+            open(path.join(root, "sub", "file"), "w").close()
+            tree = list(generate_output(root, Settings(0)))
+            ndjson = list(generate_output(root, Settings(0), Options(output_format="ndjson")))
+            json = list(generate_output(root, Settings(0), Options(output_format="json")))
+        self.assertEqual(tree[-1], "1 directories, 1 files")
+        self.assertEqual([loads(line)["path"] for line in ndjson], ["sub", "sub/file"])
+        self.assertEqual(loads("\n".join(json))["files"], 1)
+
+    def test_followed_loop(self):
+        """
+        Tests that a link back to an enclosing directory keeps its name in every format, and is
+        only marked in the tree
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+            symlink("..", path.join(root, "sub", "up"))
+            settings = Settings.FOLLOW
+            tree = list(generate_output(root, settings))
+            ndjson = list(generate_output(root, settings, Options(output_format="ndjson")))
+            json = list(generate_output(root, settings, Options(output_format="json")))
+        self.assertEqual(
+            tree[1:],
+            ["└── sub", "    └── up [recursive, not followed]", "1 directories, 1 files"],
+        )
+        up = loads(ndjson[1])
+        self.assertEqual((up["name"], up["path"], up["type"]), ("up", "sub/up", "LOOP"))
+        output = loads("\n".join(json))
+        self.assertEqual(output["contents"][0]["contents"], [{"name": "up", "type": "LOOP"}])
+        self.assertEqual((output["directories"], output["files"]), (1, 1))
+
+
+if __name__ == "__main__":
+    main()
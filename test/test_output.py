@@ -0,0 +1,116 @@
+from io import StringIO
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from time import sleep
+from unittest import TestCase, main
+from unittest.mock import Mock
+from gdtree.output import FLUSH_INTERVAL, LineWriter, write_lines
+from gdtree.traverse import traverse_directory
+
+
+class TestOutput(TestCase):
+    def test_write_lines(self):
+        """
+        Tests that lines are written to the stream separated by newlines
+        """
+        stream = StringIO()
+        write_lines(["a", "b", "c"], stream)
+        self.assertEqual(stream.getvalue(), "a\nb\nc\n")
+
+    def test_write_lines_empty(self):
+        """
+        Tests that nothing is written when there are no lines
+        """
+        stream = StringIO()
+        write_lines([], stream)
+        self.assertEqual(stream.getvalue(), "")
+
+    def test_write_lines_chunks(self):
+        """
+        Tests that lines are written in chunks once the buffer is full, and that the stream is
+        flushed after every chunk
+        """
+        stream = Mock()
+        write_lines(["aaa", "bbb", "ccc", "ddd", "e"], stream, buffer_size=8)
+        written = "".join(call.args[0] for call in stream.write.call_args_list)
+        self.assertEqual(written, "aaa\nbbb\nccc\nddd\ne\n")
+        self.assertEqual(stream.flush.call_count, 3)
+
+    def test_write_lines_streams(self):
+        """
+        Tests that lines are written before the input is exhausted
+        """
+        stream = StringIO()
+
+        def lines():
+            yield "first"
+            self.assertEqual(stream.getvalue(), "first\n")
+            yield "second"
+
+        write_lines(lines(), stream, buffer_size=1)
+        self.assertEqual(stream.getvalue(), "first\nsecond\n")
+
+    def test_write_lines_broken_pipe(self):
+        """
+        Tests that a closed pipe stops writing immediately
+        """
+        stream = Mock()
+        stream.write.side_effect = BrokenPipeError()
+        consumed = []
+
+        def lines():
+            for index in range(100):
+                consumed.append(index)
+                yield str(index)
+
+        with self.assertRaises(BrokenPipeError):
+            write_lines(lines(), stream, buffer_size=1)
+        self.assertEqual(consumed, [0])
+
+    def test_write_lines_slow(self):
+        """
+        Tests that lines generated slowly are written once they have waited FLUSH_INTERVAL,
+        however few they are
+        """
+        stream = StringIO()
+        written_at = []
+
+        def lines():
+            for index in range(256):
+                if stream.getvalue() and not written_at:
+                    written_at.append(index)
+                sleep(FLUSH_INTERVAL / 20)
+                yield str(index)
+
+        write_lines(lines(), stream)
+        self.assertTrue(written_at)
+        self.assertLess(written_at[0], 256)
+        self.assertEqual(stream.getvalue().splitlines(), [str(index) for index in range(256)])
+
+    def test_line_writer_flush(self):
+        """
+        Tests that flushing a writer writes the lines buffered so far, and that a traversal
+        flushes it before listing a directory
+        """
+        stream = StringIO()
+        writer = LineWriter(stream)
+        writer.flush()
+        self.assertEqual(stream.getvalue(), "")
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "a"))
+            mkdir(path.join(root, "a", "b"))
+            written = []
+
+            def lines():
+                for name, _, _ in traverse_directory(root, before_scan=writer.flush):
+                    yield name
+                    # Each directory is written before it is listed
+                    written.append(stream.getvalue())
+
+            writer.write_lines(lines())
+        self.assertEqual(written, ["", "a\n"])
+        self.assertEqual(stream.getvalue(), "a\nb\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from os import mkdir, path, scandir
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.patterns import EntryFilter, GitIgnore, compile_globs
+
+
+class TestCompileGlobs(TestCase):
+    def test_compile_globs_none(self):
+        """
+        Tests that no patterns compile to no matcher
+        """
+        self.assertIsNone(compile_globs([]))
+        self.assertIsNone(compile_globs(["", "|"]))
+
+    def test_compile_globs(self):
+        """
+        Tests that several patterns and alternatives compile into a single matcher of whole names
+        """
+        matcher = compile_globs(["*.pyc|__pycache__", "build"])
+        for name in ("a.pyc", "__pycache__", "build"):
+            self.assertIsNotNone(matcher.match(name))
+        for name in ("a.py", "a.pyc.txt", "builder", "xbuild"):
+            self.assertIsNone(matcher.match(name))
+
+
+class TestGitIgnore(TestCase):
+    def _gitignore(self, *lines):
+        return GitIgnore(path.join("/", "repo"), lines)
+
+    def _match(self, gitignore, relative, is_dir=False):
+        return gitignore.match(path.join("/", "repo", *relative.split("/")), is_dir)
+
+    def test_empty(self):
+        """
+        Tests that a .gitignore holding only comments and blank lines has no rules
+        """
+        gitignore = self._gitignore("# comment\n", "\n", "   \n")
+        self.assertFalse(gitignore)
+        self.assertIsNone(self._match(gitignore, "anything"))
+
+    def test_unanchored(self):
+        """
+        Tests that patterns without a slash match names at any level
+        """
+        gitignore = self._gitignore("*.log\n", "node_modules\n")
+        self.assertTrue(self._match(gitignore, "debug.log"))
+        self.assertTrue(self._match(gitignore, "a/b/debug.log"))
+        self.assertTrue(self._match(gitignore, "web/node_modules", is_dir=True))
+        self.assertIsNone(self._match(gitignore, "debug.log.txt"))
+
+    def test_anchored(self):
+        """
+        Tests that patterns with a slash only match relative to the .gitignore file
+        """
+        gitignore = self._gitignore("/build\n", "docs/*.md\n")
+        self.assertTrue(self._match(gitignore, "build", is_dir=True))
+        self.assertIsNone(self._match(gitignore, "src/build", is_dir=True))
+        self.assertTrue(self._match(gitignore, "docs/index.md"))
+        self.assertIsNone(self._match(gitignore, "docs/api/index.md"))
+
+    def test_double_star(self):
+        """
+        Tests that ** matches any number of directories
+        """
+        gitignore = self._gitignore("**/cache\n", "logs/**\n", "a/**/z\n")
+        self.assertTrue(self._match(gitignore, "cache"))
+        self.assertTrue(self._match(gitignore, "x/y/cache"))
+        self.assertTrue(self._match(gitignore, "logs/today/1.log"))
+        self.assertTrue(self._match(gitignore, "a/z"))
+        self.assertTrue(self._match(gitignore, "a/b/c/z"))
+
+    def test_directory_only(self):
+        """
+        Tests that patterns with a trailing slash only match directories
+        """
+        gitignore = self._gitignore("out/\n")
+        self.assertTrue(self._match(gitignore, "out", is_dir=True))
+        self.assertIsNone(self._match(gitignore, "out"))
+
+    def test_negation(self):
+        """
+        Tests that the last rule matching decides, so negated rules re-include entries
+        """
+        gitignore = self._gitignore("*.log\n", "!keep.log\n", "\\!bang\n")
+        self.assertTrue(self._match(gitignore, "debug.log"))
+        self.assertFalse(self._match(gitignore, "keep.log"))
+        self.assertTrue(self._match(gitignore, "!bang"))
+        gitignore = self._gitignore("!keep.log\n", "*.log\n")
+        self.assertTrue(self._match(gitignore, "keep.log"))
+
+    def test_character_class(self):
+        """
+        Tests that character classes and their negations are matched
+        """
+        gitignore = self._gitignore("file[0-9].txt\n", "tmp[!a]\n")
+        self.assertTrue(self._match(gitignore, "file3.txt"))
+        self.assertIsNone(self._match(gitignore, "filex.txt"))
+        self.assertTrue(self._match(gitignore, "tmpb"))
+        self.assertIsNone(self._match(gitignore, "tmpa"))
+
+
+class TestEntryFilter(TestCase):
+    def _names(self, entry_filter, directory):
+        with scandir(directory) as entries:
+            return sorted(entry.name for entry in entry_filter(directory, entries))
+
+    def test_hidden(self):
+        """
+        Tests that hidden entries are filtered out unless they are shown
+        """
+        with TemporaryDirectory() as root:
+            for name in (".hidden", "shown"):
+                open(path.join(root, name), "w").close()
+            self.assertEqual(self._names(EntryFilter(), root), ["shown"])
+            output = self._names(EntryFilter(show_hidden=True), root)
+        self.assertEqual(output, [".hidden", "shown"])
+
+    def test_ignore_and_pattern(self):
+        """
+        Tests that ignored entries are filtered out, and that only files matching the pattern
+        are kept while directories are always kept
+        """
+        with TemporaryDirectory() as root:
+            for name in ("a.py", "b.txt", "c.pyc"):
+                open(path.join(root, name), "w").close()
+            for name in ("src", "node_modules"):
+                mkdir(path.join(root, name))
+            entry_filter = EntryFilter(ignore=["node_modules|*.pyc"], pattern=["*.py"])
+            output = self._names(entry_filter, root)
+        self.assertEqual(output, ["a.py", "src"])
+
+    def test_gitignore(self):
+        """
+        Tests that entries ignored by the .gitignore files of a directory and its parents are
+        filtered out, along with the .git directory
+        """
+        with TemporaryDirectory() as root:
+            for name in (".git", "build", "src"):
+                mkdir(path.join(root, name))
+            with open(path.join(root, ".gitignore"), "w") as file:
+                file.write("build/\n*.o\n")
+            with open(path.join(root, "src", ".gitignore"), "w") as file:
+                file.write("!keep.o\n")
+            for name in ("main.c", "main.o", "keep.o"):
+                open(path.join(root, "src", name), "w").close()
+            entry_filter = EntryFilter(show_hidden=True, gitignore=True)
+            top = self._names(entry_filter, root)
+            src = self._names(entry_filter, path.join(root, "src"))
+        self.assertEqual(top, [".gitignore", "src"])
+        self.assertEqual(src, [".gitignore", "keep.o", "main.c"])
+
+    def test_gitignore_hidden(self):
+        """
+        Tests that .gitignore files apply when hidden entries are filtered out
+        """
+        with TemporaryDirectory() as root:
+            with open(path.join(root, ".gitignore"), "w") as file:
+                file.write("*.o\n")
+            for name in ("main.c", "main.o"):
+                open(path.join(root, name), "w").close()
+            output = self._names(EntryFilter(gitignore=True), root)
+        self.assertEqual(output, ["main.c"])
+
+    def test_gitignore_start_inside_repository(self):
+        """
+        Tests that the .gitignore files of the directories above the first one scanned apply,
+        up to the root of its repository, and that only directories holding a .gitignore file
+        are kept
+        """
+        with TemporaryDirectory() as outside:
+            with open(path.join(outside, ".gitignore"), "w") as file:
+                file.write("*.c\n")
+            repository = path.join(outside, "repository")
+            for directory in ("", ".git", "src", path.join("src", "lib")):
+                mkdir(path.join(repository, directory))
+            with open(path.join(repository, ".gitignore"), "w") as file:
+                file.write("*.o\n")
+            for name in ("main.c", "main.o", "main.h"):
+                open(path.join(repository, "src", "lib", name), "w").close()
+            entry_filter = EntryFilter(gitignore=True)
+            self._names(entry_filter, path.join(repository, "src"))
+            output = self._names(entry_filter, path.join(repository, "src", "lib"))
+            kept = list(entry_filter._gitignores)
+        self.assertEqual(output, ["main.c", "main.h"])
+        self.assertEqual(kept, [repository])
+
+    def test_gitignore_streams(self):
+        """
+        Tests that entries are filtered by .gitignore files as they are read
+        """
+        with TemporaryDirectory() as root:
+            with open(path.join(root, ".gitignore"), "w") as file:
+                file.write("*.o\n")
+            read = []
+
+            def entries():
+                with scandir(root) as iterator:
+                    for entry in iterator:
+                        read.append(entry.name)
+                        yield entry
+
+            open(path.join(root, "main.c"), "w").close()
+            filtered = EntryFilter(show_hidden=True, gitignore=True)(root, entries())
+            self.assertEqual(read, [])
+            names = sorted(entry.name for entry in filtered)
+        self.assertEqual(names, [".gitignore", "main.c"])
+
+
+if __name__ == "__main__":
+    main()
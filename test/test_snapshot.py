@@ -0,0 +1,234 @@
+from contextlib import redirect_stderr
+from io import StringIO
+from os import mkdir, path, stat_result, symlink
+from stat import S_IFDIR, S_IFREG
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.app import generate_tree, start_render
+from gdtree.diff import SnapshotTree, diff_trees
+from gdtree.end_state_history import EndStateHistory
+from gdtree.snapshot import ROOT, TreeSnapshot
+from gdtree.traverse import traverse_directory
+from gdtree.utils import EntryType, Settings
+
+
+def _flatten(entries):
+    return [(name, type, list(history)) for name, type, history in entries]
+
+
+def _status(size, directory=False):
+    mode = S_IFDIR if directory else S_IFREG
+    return stat_result((mode | 0o644, 0, 1, 1, 0, 0, size, 0, 0, 0))
+
+
+class TestTreeSnapshot(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = self.tempdir.name
+        for top in ("b", "a"):
+            mkdir(path.join(self.root, top))
+            for sub in ("y", "x"):
+                mkdir(path.join(self.root, top, sub))
+                for name in ("__init__.py", "1.txt"):
+                    open(path.join(self.root, top, sub, name), "w").close()
+        mkdir(path.join(self.root, "empty"))
+        open(path.join(self.root, "file.txt"), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_entries(self):
+        """
+        Tests that walking a snapshot regenerates the traversal it was built from, any number
+        of times
+        """
+        expected = _flatten(traverse_directory(self.root))
+        snapshot = TreeSnapshot.from_traversal("root", traverse_directory(self.root))
+        self.assertEqual(len(snapshot), len(expected))
+        self.assertEqual(_flatten(snapshot.entries()), expected)
+        self.assertEqual(_flatten(snapshot.entries()), expected)
+
+    def test_interned_names(self):
+        """
+        Tests that names repeated across the tree are stored once
+        """
+        snapshot = TreeSnapshot.scan(self.root)
+        self.assertEqual(snapshot.names.count("__init__.py"), 1)
+        self.assertEqual(len(snapshot.names), 8)
+        self.assertEqual(len(snapshot), 16)
+
+    def test_render(self):
+        """
+        Tests that a snapshot renders the same tree as generate_tree
+        """
+        for settings in (Settings(0), Settings.COLORIZE | Settings.FANCY):
+            expected = list(generate_tree(self.root, settings))
+            snapshot = TreeSnapshot.scan(self.root)
+            self.assertEqual(list(snapshot.render(settings)), expected)
+
+    def test_queries(self):
+        """
+        Tests that entries can be looked up by name, and their paths and children found
+        """
+        snapshot = TreeSnapshot.scan(self.root)
+        self.assertEqual(snapshot.count(), (7, 9))
+        found = snapshot.find("*.py")
+        self.assertEqual(
+            [snapshot.path(index) for index in found],
+            ["a/x/__init__.py", "a/y/__init__.py", "b/x/__init__.py", "b/y/__init__.py"],
+        )
+        top = list(snapshot.children(ROOT))
+        self.assertEqual([snapshot.name(index) for index in top], ["a", "b", "empty", "file.txt"])
+        self.assertEqual(snapshot.type(top[0]), EntryType.DIRECTORY)
+        self.assertEqual([snapshot.name(index) for index in snapshot.children(top[0])], ["x", "y"])
+        self.assertEqual(list(snapshot.children(top[2])), [])
+
+    def test_children_truncated(self):
+        """
+        Tests that the entries of a directory are found when its last entry is a truncation
+        marker, and that an empty directory has none
+        """
+        entries = [
+            ("a", EntryType.DIRECTORY, EndStateHistory([False]), None),
+            ("x", EntryType.FILE, EndStateHistory([False, False]), None),
+            ("2 entries", EntryType.TRUNCATED, EndStateHistory([False, False]), None),
+            ("empty", EntryType.DIRECTORY, EndStateHistory([False]), None),
+            ("z", EntryType.FILE, EndStateHistory([True]), None),
+        ]
+        snapshot = TreeSnapshot.from_traversal("root", entries)
+        self.assertEqual(list(snapshot.children(ROOT)), [0, 3, 4])
+        self.assertEqual(list(snapshot.children(0)), [1, 2])
+        self.assertEqual(list(snapshot.children(3)), [])
+        self.assertEqual(list(snapshot.children(4)), [])
+
+    def test_sizes(self):
+        """
+        Tests that sizes are recorded, and totalled over each directory's subtree
+        """
+        entries = [
+            ("a", EntryType.DIRECTORY, EndStateHistory([False]), _status(10, directory=True)),
+            ("x", EntryType.FILE, EndStateHistory([False, True]), _status(5)),
+            ("z", EntryType.FILE, EndStateHistory([True]), _status(7)),
+        ]
+        snapshot = TreeSnapshot.from_traversal("root", entries)
+        self.assertEqual(list(snapshot.sizes), [10, 5, 7])
+        self.assertEqual(list(snapshot.subtree_sizes()), [15, 5, 7])
+
+    def test_followed_loop(self):
+        """
+        Tests that a link back to an enclosing directory is stored under its own name, marked
+        only when rendered, and compares equal across snapshots
+        """
+        symlink("..", path.join(self.root, "a", "up"))
+        first = TreeSnapshot.scan(self.root, follow_symlinks=True)
+        second = TreeSnapshot.scan(self.root, follow_symlinks=True)
+        [index] = first.find("up")
+        self.assertEqual((first.path(index), first.type(index)), ("a/up", EntryType.LOOP))
+        self.assertIn("│   ├── up [recursive, not followed]", list(first.render(Settings(0))))
+        self.assertEqual(diff_trees(SnapshotTree(first), SnapshotTree(second)), [])
+
+    def test_render_du(self):
+        """
+        Tests that a snapshot with sizes renders every entry with its size, and every directory
+        with the total size of its subtree
+        """
+        entries = [
+            ("a", EntryType.DIRECTORY, EndStateHistory([False]), _status(1024, directory=True)),
+            ("x", EntryType.FILE, EndStateHistory([False, True]), _status(512)),
+            ("z", EntryType.FILE, EndStateHistory([True]), _status(2048)),
+        ]
+        snapshot = TreeSnapshot.from_traversal("root", entries)
+        self.assertEqual(
+            list(snapshot.render(Settings.DU)),
+            [
+                "root",
+                "├── [ 1.5K]  a",
+                "│   └── [  512]  x",
+                "└── [ 2.0K]  z",
+                "3.5K used in 1 directories, 2 files",
+            ],
+        )
+
+    def test_digests(self):
+        """
+        Tests that identical subtrees have equal digests, and that a change below a directory
+        changes its digest
+        """
+        snapshot = TreeSnapshot.scan(self.root)
+        digests = snapshot.digests()
+        a, b = list(snapshot.children())[:2]
+        self.assertEqual(len(digests[a]), 16)
+        # a and b hold the same entries, but are named differently
+        x_a, x_b = list(snapshot.children(a))[0], list(snapshot.children(b))[0]
+        self.assertEqual(digests[x_a], digests[x_b])
+        self.assertNotEqual(digests[a], digests[b])
+        open(path.join(self.root, "a", "x", "new"), "w").close()
+        changed = TreeSnapshot.scan(self.root)
+        changed_digests = changed.digests()
+        self.assertNotEqual(changed_digests[0], digests[0])
+        self.assertEqual(changed_digests[list(changed.children())[1]], digests[b])
+
+    def test_save_load(self):
+        """
+        Tests that a snapshot loaded from a file holds the snapshot saved, and can be saved again
+        """
+        snapshot = TreeSnapshot.scan(self.root, with_sizes=True)
+        with TemporaryDirectory() as directory:
+            first = path.join(directory, "first.snap")
+            snapshot.save(first)
+            loaded = TreeSnapshot.load(first)
+            self.assertEqual(loaded.root_name, snapshot.root_name)
+            self.assertEqual(loaded.root_size, snapshot.root_size)
+            self.assertEqual(_flatten(loaded.entries()), _flatten(snapshot.entries()))
+            self.assertEqual(list(loaded.render(Settings(0))), list(snapshot.render(Settings(0))))
+            self.assertEqual(loaded.count(), snapshot.count())
+            self.assertEqual(loaded.find("*.py"), snapshot.find("*.py"))
+            self.assertEqual(list(loaded.subtree_sizes()), list(snapshot.subtree_sizes()))
+            self.assertEqual(loaded.digests(), snapshot.digests())
+            second = path.join(directory, "second.snap")
+            loaded.save(second)
+            with open(first, "rb") as file, open(second, "rb") as other:
+                self.assertEqual(file.read(), other.read())
+
+    def test_load_invalid(self):
+        """
+        Tests that loading a file which is not a snapshot, or is a truncated one, raises
+        """
+        with TemporaryDirectory() as directory:
+            snapshot_path = path.join(directory, "tree.snap")
+            TreeSnapshot.scan(self.root).save(snapshot_path)
+            with open(snapshot_path, "rb") as file:
+                data = file.read()
+            for content in (b"", b"not a snapshot" * 4, data[:-1], data[:60]):
+                with open(snapshot_path, "wb") as file:
+                    file.write(content)
+                with self.assertRaises(ValueError):
+                    TreeSnapshot.load(snapshot_path)
+
+    def test_load_corrupt(self):
+        """
+        Tests that loading a snapshot whose columns do not hold a tree raises, and that
+        gdtree render reports it as an error
+        """
+        corruptions = (
+            ("parents", 1, 5),
+            ("parents", 1, -2),
+            ("parents", 4, 2),
+            ("types", 0, 99),
+            ("name_ids", 0, 1000),
+        )
+        with TemporaryDirectory() as directory:
+            snapshot_path = path.join(directory, "tree.snap")
+            for column, index, value in corruptions:
+                snapshot = TreeSnapshot.scan(self.root)
+                getattr(snapshot, column)[index] = value
+                snapshot.save(snapshot_path)
+                with self.assertRaises(ValueError, msg=column):
+                    TreeSnapshot.load(snapshot_path)
+            with redirect_stderr(StringIO()) as errors, self.assertRaises(SystemExit):
+                start_render([snapshot_path])
+        self.assertIn("corrupt snapshot", errors.getvalue())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.spill import CompactListing
+from gdtree.traverse import reverse_traverse_directory, traverse_directory
+from gdtree.utils import EntryType
+
+
+def _flatten(entries):
+    # Statuses are compared by inode, since access times may differ between traversals
+    return [
+        (entry[0], entry[1], list(entry[2])) + tuple(status.st_ino for status in entry[3:])
+        for entry in entries
+    ]
+
+
+class TestCompactListing(TestCase):
+    names = ["delta", "alpha", "echo", "b\udcff", "charlie", "bravo"]
+
+    def _type(self, name):
+        return EntryType.DIRECTORY if name.startswith("b") else EntryType.FILE
+
+    def _listing(self, reverse, spill_size):
+        listing = CompactListing("/root", reverse, spill_size)
+        for name in self.names:
+            listing.add(name, self._type(name))
+        listing.finish()
+        return listing
+
+    def test_in_memory(self):
+        """
+        Tests that a listing under its spill size is sorted in memory
+        """
+        listing = self._listing(False, 1 << 20)
+        self.assertEqual(len(listing), 6)
+        self.assertEqual(listing.files, 4)
+        self.assertEqual(listing.runs, [])
+        self.assertEqual([name for name, _, _, _ in listing], sorted(self.names))
+        self.assertEqual(listing.directories(), ["/root/bravo", "/root/b\udcff"])
+
+    def test_spilled(self):
+        """
+        Tests that a listing past its spill size is sorted on disk, in either order, and that
+        names which are not valid UTF-8 survive the round trip
+        """
+        for reverse in (False, True):
+            listing = self._listing(reverse, 1)
+            self.assertEqual(len(listing.runs), 6)
+            self.assertEqual(listing.records, [])
+            self.assertEqual(listing.directories(), [])
+            self.assertEqual(
+                [(name, path, type) for name, path, type, _ in listing],
+                [
+                    (name, "/root/" + name, self._type(name))
+                    for name in sorted(self.names, reverse=reverse)
+                ],
+            )
+            self.assertTrue(all(run.closed for run in listing.runs))
+
+
+class TestLowMemoryTraversal(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = self.tempdir.name
+        for directory in ("b", "a", path.join("a", "sub")):
+            mkdir(path.join(self.root, directory))
+        for name in range(30):
+            open(path.join(self.root, "a", "file%02d" % name), "w").close()
+        open(path.join(self.root, "a", "sub", "leaf"), "w").close()
+        open(path.join(self.root, "top"), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_same_entries(self):
+        """
+        Tests that traversing with spilled listings yields the same entries as traversing with
+        listings held in memory, however the traversal is run
+        """
+        for traverse in (traverse_directory, reverse_traverse_directory):
+            for kwargs in ({}, {"jobs": 3}, {"max_depth": 2}, {"with_status": True}):
+                expected = _flatten(traverse(self.root, **kwargs))
+                for spill_size in (1, 1000, 1 << 20):
+                    output = _flatten(traverse(self.root, spill_size=spill_size, **kwargs))
+                    self.assertEqual(output, expected)
+
+
+if __name__ == "__main__":
+    main()
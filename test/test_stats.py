@@ -0,0 +1,82 @@
+from io import StringIO
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from gdtree.app import generate_tree
+from gdtree.stats import SLOWEST_DIRECTORIES, Stats
+from gdtree.traverse import traverse_directory
+from gdtree.utils import ExecutableCheck, Settings
+
+
+class TestStats(TestCase):
+    def test_add_directory(self):
+        """
+        Tests that directory scans are accumulated
+        """
+        stats = Stats()
+        stats.add_directory("a", 3, {"scandir": 1.0, "sort": 0.5}, {"scandir": 1})
+        stats.add_directory("b", 2, {"scandir": 2.0}, {"scandir": 1, "access": 2})
+        self.assertEqual(stats.directories, 2)
+        self.assertEqual(stats.entries, 5)
+        self.assertEqual(stats.phases["scandir"], 3.0)
+        self.assertEqual(stats.phases["sort"], 0.5)
+        self.assertEqual(stats.syscalls, {"scandir": 2, "stat": 0, "access": 2})
+
+    def test_slowest_directories(self):
+        """
+        Tests that only the slowest directories are kept
+        """
+        stats = Stats()
+        for index in range(SLOWEST_DIRECTORIES * 2):
+            stats.add_directory(str(index), 0, {"scandir": float(index)}, {})
+        kept = sorted(int(path) for _, path in stats.slowest)
+        self.assertEqual(kept, list(range(SLOWEST_DIRECTORIES, SLOWEST_DIRECTORIES * 2)))
+
+    def test_report(self):
+        """
+        Tests that the report names every phase and system call
+        """
+        stats = Stats()
+        stats.add_directory("some/directory", 4, {"scandir": 0.25}, {"scandir": 1})
+        stream = StringIO()
+        stats.report(stream)
+        output = stream.getvalue()
+        for word in ("scandir", "sort", "get_type", "prefix", "colorize", "write"):
+            self.assertIn(word, output)
+        self.assertIn("some/directory", output)
+
+    def test_traverse_stats(self):
+        """
+        Tests that a traversal records its directories, entries and system calls
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+            open(path.join(root, "sub", "file"), "w").close()
+            open(path.join(root, "file"), "w").close()
+            stats = Stats()
+            list(
+                traverse_directory(
+                    root, executable_check=ExecutableCheck.ACCESS, stats=stats
+                )
+            )
+        self.assertEqual(stats.directories, 2)
+        self.assertEqual(stats.entries, 3)
+        self.assertEqual(stats.syscalls["scandir"], 2)
+        self.assertEqual(stats.syscalls["access"], 2)
+
+    def test_generate_tree_stats(self):
+        """
+        Tests that generating a tree with statistics produces the same output as without
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+            open(path.join(root, "sub", "file"), "w").close()
+            expected = list(generate_tree(root, Settings.COLORIZE))
+            stats = Stats()
+            output = list(generate_tree(root, Settings.COLORIZE, stats=stats))
+        self.assertEqual(expected, output)
+        self.assertEqual(stats.entries, 2)
+
+
+if __name__ == "__main__":
+    main()
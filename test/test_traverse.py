@@ -1,9 +1,15 @@
-from os import DirEntry, scandir
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from os import DirEntry, scandir, mkdir, path, rmdir, symlink
+from sys import getrecursionlimit
+from tempfile import TemporaryDirectory, mkdtemp
 from gdtree.end_state_history import EndStateHistory
-from gdtree.utils import EntryType
+from gdtree.patterns import EntryFilter
+from gdtree.utils import EntryType, ExecutableCheck, get_type
 from unittest import TestCase, main
 from unittest.mock import patch, Mock
 from gdtree.traverse import (
+    _identity,
     filter_prefix,
     reverse_traverse_directory,
     traverse_directory,
@@ -145,6 +151,302 @@ class TestTraversal(TestCase):
         for expected, output in zip(new_history, output_history):
             self.assertEqual(expected, output)
 
+    def _build_tree(self, root: str) -> None:
+        """
+        Builds a small directory tree with several levels of subdirectories under root
+        """
+        for top in ("b", "a", "c"):
+            mkdir(path.join(root, top))
+            for sub in ("y", "x"):
+                mkdir(path.join(root, top, sub))
+                for name in ("2.txt", "1.txt"):
+                    open(path.join(root, top, sub, name), "w").close()
+        open(path.join(root, "file.txt"), "w").close()
+
+    def _flatten(self, traversal):
+        return [(name, type, list(history)) for name, type, history in traversal]
+
+    def test_parallel_traverse_order(self):
+        """
+        Tests that a traversal with several jobs yields the same entries in the same order
+        as a serial traversal
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            expected = self._flatten(traverse_directory(root))
+            output = self._flatten(traverse_directory(root, jobs=4))
+        self.assertEqual(len(expected), 22)
+        self.assertEqual(expected, output)
+
+    def test_parallel_reverse_traverse_order(self):
+        """
+        Tests that a reverse traversal with several jobs yields the same entries in the same
+        order as a serial reverse traversal
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            expected = self._flatten(reverse_traverse_directory(root))
+            output = self._flatten(reverse_traverse_directory(root, jobs=4))
+        self.assertEqual(expected, output)
+
+    def test_parallel_traverse_early_close(self):
+        """
+        Tests that a parallel traversal can be abandoned partway through
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            traversal = traverse_directory(root, jobs=4)
+            first = next(traversal)
+            traversal.close()
+        self.assertEqual(first[0], "a")
+
+    def test_traverse_max_depth(self):
+        """
+        Tests that a traversal with a maximum depth yields no deeper entries
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            output = self._flatten(traverse_directory(root, max_depth=2))
+        self.assertEqual(len(output), 10)
+        self.assertTrue(all(len(history) <= 2 for _, _, history in output))
+
+    @patch("gdtree.traverse.scandir", wraps=scandir)
+    def test_traverse_max_depth_prunes(self, mocked_scandir):
+        """
+        Tests that directories at the maximum depth are never scanned
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            list(traverse_directory(root, max_depth=1))
+        mocked_scandir.assert_called_once_with(root)
+
+    def test_traverse_entry_limit(self):
+        """
+        Tests that a traversal with an entry limit yields the first entries of each directory,
+        followed by a last entry counting the rest
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            output = self._flatten(traverse_directory(root, entry_limit=2))
+            reverse_output = self._flatten(reverse_traverse_directory(root, entry_limit=2))
+        top = [(name, type, history) for name, type, history in output if len(history) == 1]
+        self.assertEqual(
+            top,
+            [
+                ("a", EntryType.DIRECTORY, [False]),
+                ("b", EntryType.DIRECTORY, [False]),
+                ("... 2 more", EntryType.TRUNCATED, [True]),
+            ],
+        )
+        self.assertEqual(len(output), 15)
+        self.assertEqual(
+            [name for name, _, history in reverse_output if len(history) == 1],
+            ["file.txt", "c", "... 2 more"],
+        )
+
+    @patch("gdtree.traverse.get_type", wraps=get_type)
+    def test_traverse_entry_limit_types_kept(self, mocked_get_type):
+        """
+        Tests that only the entries kept under an entry limit are typed
+        """
+        with TemporaryDirectory() as root:
+            for index in range(20):
+                open(path.join(root, "%02d" % index), "w").close()
+            output = list(traverse_directory(root, entry_limit=3))
+        self.assertEqual([name for name, _, _ in output], ["00", "01", "02", "... 17 more"])
+        self.assertEqual(mocked_get_type.call_count, 3)
+
+    @patch("gdtree.traverse.scandir", wraps=scandir)
+    def test_traverse_ignore_prunes(self, mocked_scandir):
+        """
+        Tests that directories filtered out are neither yielded nor scanned
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            entry_filter = EntryFilter(ignore=["b|x"])
+            output = [name for name, _, _ in traverse_directory(root, entry_filter=entry_filter)]
+        self.assertEqual(
+            output, ["a", "y", "1.txt", "2.txt", "c", "y", "1.txt", "2.txt", "file.txt"]
+        )
+        scanned = [call.args[0] for call in mocked_scandir.call_args_list]
+        subdirectories = [("a",), ("a", "y"), ("c",), ("c", "y")]
+        expected = [root] + [path.join(root, *parts) for parts in subdirectories]
+        self.assertEqual(scanned, expected)
+
+    def test_traverse_unsorted(self):
+        """
+        Tests that an unsorted traversal yields the same entries as a sorted one, with each
+        directory's last entry marked as such
+        """
+        with TemporaryDirectory() as root:
+            self._build_tree(root)
+            expected = self._flatten(traverse_directory(root))
+            for kwargs in ({}, {"jobs": 4}, {"entry_limit": 2}):
+                output = self._flatten(traverse_directory(root, unsorted=True, **kwargs))
+                if not kwargs:
+                    self.assertEqual(
+                        sorted((name, type, len(history)) for name, type, history in output),
+                        sorted((name, type, len(history)) for name, type, history in expected),
+                    )
+                for index, (_, type, history) in enumerate(output):
+                    # The last entry of a directory is followed by an entry further up
+                    following = output[index + 1][2] if index + 1 < len(output) else []
+                    nested = type == EntryType.DIRECTORY and len(following) > len(history)
+                    if not nested:
+                        self.assertEqual(history[-1], len(following) < len(history))
+            limited = self._flatten(traverse_directory(root, unsorted=True, entry_limit=2))
+        self.assertEqual(
+            [name for name, _, history in limited if len(history) == 1][-1], "... 2 more"
+        )
+
+    @patch("gdtree.traverse.scandir")
+    def test_traverse_unsorted_streams(self, mocked_scandir):
+        """
+        Tests that an unsorted traversal yields the first entry of a directory after reading
+        only one entry past it
+        """
+        read = []
+
+        def entries():
+            for name in ("first", "second", "third"):
+                read.append(name)
+                mock = Mock(spec=DirEntry)
+                mock.name = name
+                mock.path = "root/" + name
+                mock.is_dir.return_value = False
+                mock.is_symlink.return_value = False
+                yield mock
+
+        mocked_scandir.return_value.__iter__.return_value = entries()
+        traversal = traverse_directory(
+            "root", executable_check=ExecutableCheck.NONE, unsorted=True
+        )
+        name, type, history = next(traversal)
+        self.assertEqual((name, type, list(history)), ("first", EntryType.FILE, [False]))
+        self.assertEqual(read, ["first", "second"])
+        self.assertEqual([name for name, _, history in traversal if history[0]], ["third"])
+
+    @patch("gdtree.traverse.MAX_OPEN_STREAMS", 3)
+    def test_traverse_unsorted_deep(self):
+        """
+        Tests that an unsorted traversal past the limit of open directories reads deeper
+        directories whole, and still yields every entry
+        """
+        with TemporaryDirectory() as root:
+            current = root
+            for _ in range(8):
+                open(path.join(current, "file"), "w").close()
+                current = path.join(current, "d")
+                mkdir(current)
+            expected = self._flatten(traverse_directory(root))
+            output = self._flatten(traverse_directory(root, unsorted=True))
+        self.assertEqual(
+            sorted((name, len(history)) for name, _, history in output),
+            sorted((name, len(history)) for name, _, history in expected),
+        )
+
+    def test_traverse_deep(self):
+        """
+        Tests that a traversal descends past the interpreter's recursion limit
+        """
+        depth = getrecursionlimit() + 50
+        root = mkdtemp()
+        current = root
+        try:
+            for _ in range(depth):
+                current = path.join(current, "d")
+                mkdir(current)
+            output = list(traverse_directory(root))
+        finally:
+            # shutil.rmtree recurses, so remove the tree from the bottom up
+            while current != root:
+                rmdir(current)
+                current = path.dirname(current)
+            rmdir(root)
+        self.assertEqual(len(output), depth)
+        self.assertEqual(len(output[-1][2]), depth)
+
+    def test_errors_on_stderr(self):
+        """
+        Tests that a directory which cannot be listed is reported on stderr, leaving stdout to
+        the output
+        """
+        with TemporaryDirectory() as root:
+            missing = path.join(root, "missing")
+            with redirect_stdout(StringIO()) as output, redirect_stderr(StringIO()) as errors:
+                self.assertEqual(list(traverse_directory(missing)), [])
+        self.assertEqual(output.getvalue(), "")
+        self.assertIn(missing, errors.getvalue())
+
+    def test_traverse_follow(self):
+        """
+        Tests that following symbolic links descends into linked directories, marks links back
+        to an enclosing directory as loops, and leaves dangling links as links
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "a"))
+            open(path.join(root, "a", "file"), "w").close()
+            symlink("..", path.join(root, "a", "up"))
+            symlink(path.join(root, "a"), path.join(root, "link"))
+            symlink(path.join(root, "missing"), path.join(root, "dangling"))
+            unfollowed = [(name, type) for name, type, _ in traverse_directory(root)]
+            followed = [
+                (name, type, len(history))
+                for name, type, history in traverse_directory(root, follow_symlinks=True)
+            ]
+        self.assertIn(("link", EntryType.SYMLINK), unfollowed)
+        self.assertEqual(
+            followed,
+            [
+                ("a", EntryType.DIRECTORY, 1),
+                ("file", EntryType.FILE, 2),
+                ("up", EntryType.LOOP, 2),
+                ("dangling", EntryType.SYMLINK, 1),
+                ("link", EntryType.REPEAT, 1),
+            ],
+        )
+
+    def test_traverse_follow_no_rescan(self):
+        """
+        Tests that a directory reached through several links is only scanned once
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "target"))
+            for index in range(3):
+                open(path.join(root, "target", "file%d" % index), "w").close()
+                symlink(path.join(root, "target"), path.join(root, "link%d" % index))
+            with patch("gdtree.traverse.scandir", side_effect=scandir) as mocked_scandir:
+                output = list(traverse_directory(root, follow_symlinks=True))
+        self.assertEqual(mocked_scandir.call_count, 2)
+        self.assertEqual(len(output), 7)
+        self.assertEqual(output[0][0], "link0")
+        self.assertEqual(output[4][:2], ("link1", EntryType.REPEAT))
+
+    def test_traverse_one_file_system(self):
+        """
+        Tests that staying on one file system yields directories on another device without
+        scanning them, whether or not listings are prefetched
+        """
+
+        def identity(path, status=None):
+            device, inode = _identity(path, status)
+            return (device + 1 if path.endswith("mount") else device), inode
+
+        with TemporaryDirectory() as root:
+            for name in ("local", "mount"):
+                mkdir(path.join(root, name))
+                open(path.join(root, name, "file"), "w").close()
+            for jobs in (1, 4):
+                with patch("gdtree.traverse._identity", side_effect=identity), patch(
+                    "gdtree.traverse.scandir", side_effect=scandir
+                ) as mocked_scandir:
+                    output = traverse_directory(root, jobs=jobs, one_file_system=True)
+                    names = [name for name, _, _ in output]
+                self.assertEqual(names, ["local", "file", "mount"])
+                calls = mocked_scandir.call_args_list
+                scanned = sorted(path.basename(call[0][0]) for call in calls)
+                self.assertEqual(scanned, sorted([path.basename(root), "local"]))
+
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,8 @@
-from gdtree.utils import EntryType, get_type
+from gdtree.utils import EntryType, ExecutableCheck, get_type, is_executable
 from unittest import TestCase, main
 from unittest.mock import Mock, patch
-from os import DirEntry
+from os import DirEntry, stat_result
+from stat import S_IFREG
 
 
 class TestTypeExtraction(TestCase):
@@ -116,6 +117,99 @@ class TestTypeExtraction(TestCase):
 
         assert get_type(mock) == EntryType.EXECUTABLE
 
+    @patch("gdtree.utils.access")
+    def test_type_extraction_no_executable_check(self, mocked_access):
+        """
+        Tests that executables are reported as files, with no access call, when executables
+        are not checked for
+        """
+        mock = Mock(spec=DirEntry)
+        mock.is_dir.return_value = False
+        mock.is_symlink.return_value = False
+
+        mocked_access.return_value = True
+
+        self.assertEqual(get_type(mock, ExecutableCheck.NONE), EntryType.FILE)
+        mocked_access.assert_not_called()
+
+    @patch("gdtree.utils.is_executable")
+    @patch("gdtree.utils.access")
+    def test_type_extraction_mode_check(self, mocked_access, mocked_is_executable):
+        """
+        Tests that executables are found from permission bits, with no access call, when
+        executables are checked by mode
+        """
+        mock = Mock(spec=DirEntry)
+        mock.is_dir.return_value = False
+        mock.is_symlink.return_value = False
+
+        mocked_is_executable.return_value = True
+        self.assertEqual(get_type(mock, ExecutableCheck.MODE), EntryType.EXECUTABLE)
+        mocked_is_executable.return_value = False
+        self.assertEqual(get_type(mock, ExecutableCheck.MODE), EntryType.FILE)
+        mocked_access.assert_not_called()
+
+
+class TestExecutable(TestCase):
+    """
+    Tests the ability to tell executables apart from their permission bits.
+    """
+
+    def _entry(self, mode: int, uid: int, gid: int) -> Mock:
+        """
+        Creates a mocked directory entry for a regular file with the given permissions and owner
+        """
+        mock = Mock(spec=DirEntry)
+        mock.stat.return_value = stat_result(
+            (S_IFREG | mode, 0, 0, 1, uid, gid, 0, 0, 0, 0)
+        )
+        return mock
+
+    @patch("gdtree.utils._effective_ids")
+    def test_executable_owner(self, mocked_ids):
+        """
+        Tests that the owner's execute bit is used when the user owns the file
+        """
+        mocked_ids.return_value = (1000, frozenset({1000}))
+        self.assertTrue(is_executable(self._entry(0o700, 1000, 50)))
+        self.assertFalse(is_executable(self._entry(0o655, 1000, 50)))
+
+    @patch("gdtree.utils._effective_ids")
+    def test_executable_group(self, mocked_ids):
+        """
+        Tests that the group's execute bit is used when the user is in the file's group
+        """
+        mocked_ids.return_value = (1000, frozenset({1000, 50}))
+        self.assertTrue(is_executable(self._entry(0o610, 0, 50)))
+        self.assertFalse(is_executable(self._entry(0o705, 0, 50)))
+
+    @patch("gdtree.utils._effective_ids")
+    def test_executable_other(self, mocked_ids):
+        """
+        Tests that the other execute bit is used when the user neither owns the file nor is in
+        its group
+        """
+        mocked_ids.return_value = (1000, frozenset({1000}))
+        self.assertTrue(is_executable(self._entry(0o601, 0, 50)))
+        self.assertFalse(is_executable(self._entry(0o770, 0, 50)))
+
+    @patch("gdtree.utils._effective_ids")
+    def test_executable_root(self, mocked_ids):
+        """
+        Tests that root may execute a file when any execute bit is set
+        """
+        mocked_ids.return_value = (0, frozenset({0}))
+        self.assertTrue(is_executable(self._entry(0o601, 1000, 50)))
+        self.assertFalse(is_executable(self._entry(0o666, 1000, 50)))
+
+    def test_executable_stat_error(self):
+        """
+        Tests that a file which cannot be stat'ed is not executable
+        """
+        mock = Mock(spec=DirEntry)
+        mock.stat.side_effect = OSError("")
+        self.assertFalse(is_executable(mock))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,205 @@
+from io import StringIO
+from os import mkdir, path, rename, scandir, symlink
+from shutil import rmtree
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+from gdtree.app import generate_output
+from gdtree.traverse import RetainedListings, traverse_directory
+from gdtree.utils import Options, Settings
+from gdtree.watch import InotifyWatcher, PollWatcher, wait_for_changes, watch
+
+
+def _flatten(entries):
+    return [(name, type, list(history)) for name, type, history in entries]
+
+
+class TestRetainedListings(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = self.tempdir.name
+        for directory in ("a", path.join("a", "sub"), "b"):
+            mkdir(path.join(self.root, directory))
+            open(path.join(self.root, directory, "file"), "w").close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_reuse(self):
+        """
+        Tests that a traversal reuses retained listings, and only scans the directories
+        invalidated since the last traversal
+        """
+        retained = RetainedListings()
+        first = _flatten(traverse_directory(self.root, retained=retained))
+        open(path.join(self.root, "a", "new"), "w").close()
+        with patch("gdtree.traverse.scandir", wraps=scandir) as mocked_scandir:
+            self.assertEqual(_flatten(traverse_directory(self.root, retained=retained)), first)
+            mocked_scandir.assert_not_called()
+            retained.invalidate(path.join(self.root, "a"))
+            output = _flatten(traverse_directory(self.root, retained=retained))
+        mocked_scandir.assert_called_once_with(path.join(self.root, "a"))
+        self.assertEqual(output, _flatten(traverse_directory(self.root)))
+
+    def test_invalidate_subtree(self):
+        """
+        Tests that invalidating a subtree drops the listings of every directory below it, and
+        only those
+        """
+        retained = RetainedListings()
+        list(traverse_directory(self.root, retained=retained))
+        retained.invalidate(path.join(self.root, "a"), subtree=True)
+        self.assertEqual(sorted(retained.listings), [self.root, path.join(self.root, "b")])
+
+    def test_prune(self):
+        """
+        Tests that the listings of directories no longer in the tree are dropped
+        """
+        retained = RetainedListings()
+        list(traverse_directory(self.root, retained=retained))
+        rmtree(path.join(self.root, "a"))
+        retained.invalidate(self.root)
+        list(traverse_directory(self.root, retained=retained))
+        kept = retained.prune(self.root)
+        self.assertEqual(kept, {self.root, path.join(self.root, "b")})
+        self.assertEqual(set(retained.listings), kept)
+
+
+class TestWatchers(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.root = self.tempdir.name
+        self.sub = path.join(self.root, "sub")
+        mkdir(self.sub)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_inotify(self):
+        """
+        Tests that inotify reports the directories whose entries change, and a change of a
+        .gitignore file as affecting the whole subtree
+        """
+        try:
+            watcher = InotifyWatcher()
+        except OSError:
+            self.skipTest("inotify is not available")
+        try:
+            watcher.update([self.root, self.sub])
+            self.assertEqual(watcher.read(0), {})
+            open(path.join(self.sub, "file"), "w").close()
+            self.assertEqual(watcher.read(1), {self.sub: False})
+            with open(path.join(self.root, ".gitignore"), "w") as file:
+                file.write("*.o\n")
+            self.assertEqual(watcher.read(1), {self.root: True})
+            watcher.update([self.root])
+            open(path.join(self.sub, "other"), "w").close()
+            self.assertEqual(watcher.read(0.1), {})
+        finally:
+            watcher.close()
+
+    def test_inotify_moved(self):
+        """
+        Tests that a directory moved within the tree is watched under its new path
+        """
+        try:
+            watcher = InotifyWatcher()
+        except OSError:
+            self.skipTest("inotify is not available")
+        moved = path.join(self.root, "moved")
+        try:
+            watcher.update([self.root, self.sub])
+            rename(self.sub, moved)
+            self.assertEqual(watcher.read(1), {self.root: False, self.sub: False})
+            watcher.update([self.root, moved])
+            open(path.join(moved, "file"), "w").close()
+            self.assertEqual(watcher.read(1), {moved: False})
+        finally:
+            watcher.close()
+
+    def test_inotify_follow(self):
+        """
+        Tests that a followed symbolic link is watched through the directory it leads to, and
+        reported under the link's path, which is the path the tree lists it at
+        """
+        with TemporaryDirectory() as target:
+            link = path.join(self.root, "link")
+            symlink(target, link)
+            retained = RetainedListings()
+            list(traverse_directory(self.root, follow_symlinks=True, retained=retained))
+            watched = retained.prune(self.root)
+            self.assertIn(link, watched)
+            for follow_symlinks, expected in ((False, {}), (True, {link: False})):
+                try:
+                    watcher = InotifyWatcher(follow_symlinks=follow_symlinks)
+                except OSError:
+                    self.skipTest("inotify is not available")
+                try:
+                    watcher.update(watched)
+                    open(path.join(target, "file%d" % follow_symlinks), "w").close()
+                    self.assertEqual(watcher.read(0.2), expected)
+                finally:
+                    watcher.close()
+
+    @patch("gdtree.watch.POLL_INTERVAL", 0.01)
+    def test_poll(self):
+        """
+        Tests that polling reports the directories whose entries change
+        """
+        watcher = PollWatcher()
+        watcher.update([self.root, self.sub])
+        self.assertEqual(watcher.read(0.05), {})
+        open(path.join(self.sub, "file"), "w").close()
+        self.assertEqual(watcher.read(1), {self.sub: False})
+        self.assertEqual(watcher.read(0.05), {})
+
+    def test_coalesce(self):
+        """
+        Tests that a burst of changes is gathered into one set of changes
+        """
+        watcher = Mock()
+        watcher.read.side_effect = [{}, {"a": False}, {"b": False}, {"a": True}, {}]
+        self.assertEqual(wait_for_changes(watcher), {"a": True, "b": False})
+        self.assertEqual(watcher.read.call_count, 5)
+
+
+class TestWatch(TestCase):
+    def test_watch(self):
+        """
+        Tests that the tree is printed again after a change, scanning only the directory that
+        changed
+        """
+        with TemporaryDirectory() as root:
+            mkdir(path.join(root, "sub"))
+
+            def change(watcher):
+                if stream.getvalue().count("directories") > 1:
+                    raise KeyboardInterrupt
+                open(path.join(root, "sub", "new"), "w").close()
+                return {path.join(root, "sub"): False}
+
+            stream = StringIO()
+            with patch("gdtree.watch.wait_for_changes", side_effect=change), patch(
+                "gdtree.traverse.scandir", wraps=scandir
+            ) as mocked_scandir:
+                watch(
+                    root,
+                    lambda retained: generate_output(
+                        root, Settings(0), Options(), None, retained
+                    ),
+                    stream=stream,
+                )
+        name = path.basename(root)
+        self.assertEqual(
+            stream.getvalue(),
+            "%s\n└── sub\n1 directories, 0 files\n%s\n└── sub\n    └── new\n"
+            "1 directories, 1 files\n" % (name, name),
+        )
+        self.assertEqual(
+            [call.args[0] for call in mocked_scandir.call_args_list],
+            [root, path.join(root, "sub"), path.join(root, "sub")],
+        )
+
+
+if __name__ == "__main__":
+    main()